@@ -480,7 +480,7 @@ def scf_phonons_inputs(structure, pseudos, kppa,
 
     # Get the qpoints in the IBZ. Note that here we use a q-mesh with ngkpt=(4,4,4) and shiftk=(0,0,0)
     # i.e. the same parameters used for the k-mesh in gs_inp.
-    qpoints = gs_inp.abiget_ibz(ngkpt=(4,4,4), shiftk=(0,0,0), kptopt=1).points
+    qpoints = gs_inp.get_ibz(ngkpt=(4,4,4), shiftk=(0,0,0), kptopt=1).points
     #print("get_ibz qpoints:", qpoints)
 
     # Build the input files for the q-points in the IBZ.
@@ -499,7 +499,7 @@ def scf_phonons_inputs(structure, pseudos, kppa,
             #rfdir   1 0 0   # Along the first reduced coordinate axis
             #kptopt   2      # Automatic generation of k points, taking
 
-        irred_perts = ph_inp.abiget_irred_phperts()
+        irred_perts = ph_inp.get_irred_phperts()
 
         #for pert in irred_perts:
         #    #print(pert)
@@ -528,13 +528,16 @@ def phonons_from_gsinput(gs_inp):
     Returns a :class:`AbinitInput` for performing phonon calculations.
     GS input + the input files for the phonon calculation.
     """
-    qpoints = gs_inp.abiget_ibz(ngkpt=(4,4,4), shiftk=(0,0,0), kptopt=1).points
+    qpoints = gs_inp.get_ibz(ngkpt=(4,4,4), shiftk=(0,0,0), kptopt=1).points
     #print("get_ibz qpoints:", qpoints)
 
+    # The irreducible perturbations of all the q-points are computed at once.
+    perts_q = gs_inp.get_irred_phperts_qpoints(qpoints)
+
     # Build the input files for the q-points in the IBZ.
     # Response-function calculation for phonons.
     ph_inputs = []
-    for qpt in qpoints:
+    for qpt, irred_perts in zip(qpoints, perts_q):
         q_inp = gs_inp.deepcopy()
         #q_inp.pop_tolerances()
         q_inp.set_vars(
@@ -548,7 +551,6 @@ def phonons_from_gsinput(gs_inp):
             #rfdir   1 0 0   # Along the first reduced coordinate axis
             #kptopt   2      # Automatic generation of k points, taking
         #print(tmp_inp)
-        irred_perts = q_inp.abiget_irred_phperts()
 
         for pert in irred_perts:
             #print(pert)
@@ -16,7 +16,7 @@ import json
 import numpy as np
 
 from collections import OrderedDict, MutableMapping
-from monty.collections import dict2namedtuple
+from monty.collections import AttrDict, dict2namedtuple
 from monty.string import is_string, list_strings
 from monty.json import MontyEncoder, MontyDecoder
 from pymatgen.core.units import Energy
@@ -586,8 +586,8 @@ class AbinitInput(six.with_metaclass(abc.ABCMeta, AbstractInput, PMGSONable, Has
         if len(tolerance) != 1 or any(k not in _TOLVARS for k in tolerance):
             raise self.Error("Invalid tolerance: %s" % tolerance)
 
-        # Call Abinit to get the list of irred perts.
-        perts = self.abiget_irred_phperts(qpt=qpt)
+        # Get the list of irred perts from the symmetries of the structure.
+        perts = self.get_irred_phperts(qpt=qpt)
 
         # Build list of datasets (one input per perturbation)
         ph_inputs = MultiDataset.replicate_input(input=self, ndtset=len(perts))
@@ -665,10 +665,10 @@ class AbinitInput(six.with_metaclass(abc.ABCMeta, AbstractInput, PMGSONable, Has
         if len(tolerance) != 1 or any(k not in _TOLVARS for k in tolerance):
             raise self.Error("Invalid tolerance: %s" % tolerance)
 
-        # Call Abinit to get the list of irred perts.
+        # Get the list of irred perts from the symmetries of the structure.
         # TODO:
         # Check that one can use the same list of irred perts as in phonons
-        perts = self.abiget_irred_phperts(qpt=(0, 0, 0))
+        perts = self.get_irred_phperts(qpt=(0, 0, 0))
 
         # Build list of datasets (one input per perturbation)
         multi = MultiDataset.replicate_input(input=self, ndtset=len(perts))
@@ -772,6 +772,80 @@ class AbinitInput(six.with_metaclass(abc.ABCMeta, AbstractInput, PMGSONable, Has
             if report and report.errors: raise self.Error(str(report))
             raise self.Error("Problem in temp Task executed in %s\n%s" % (task.workdir, exc))
 
+    def get_spacegroup(self):
+        """
+        :class:`SpaceGroup` of the structure. Taken from the structure if available
+        else computed with spglib.
+        """
+        if self.structure.has_spacegroup:
+            return self.structure.spacegroup
+
+        from abipy.core.symmetries import SpaceGroup
+        return SpaceGroup.from_structure(self.structure)
+
+    def get_ibz(self, ngkpt=None, shiftk=None, kptopt=None):
+        """
+        Python version of :meth:`abiget_ibz`: compute the list of points in the IBZ and the corresponding weights
+        from the symmetries of the structure without running ABINIT.
+
+        Args:
+            ngkpt: Number of divisions for the k-mesh (default None i.e. use ngkpt from self)
+            shiftk: Shiftks (default None i.e. use shiftk from self)
+            kptopt: Option for k-point generation. If None, the value in self is used.
+
+        Returns:
+            `namedtuple` with attributes:
+                points: `ndarray` with points in the IBZ in reduced coordinates.
+                weights: `ndarray` with weights of the points.
+        """
+        from abipy.core.kpoints import ibz_from_kmesh
+        ngkpt = self.get("ngkpt") if ngkpt is None else ngkpt
+        if ngkpt is None:
+            raise ValueError("ngkpt is not in the input and therefore it must be passed explicitly")
+
+        # Use the ABINIT defaults if the variables are not specified.
+        shiftk = self.get("shiftk", [0.5, 0.5, 0.5]) if shiftk is None else shiftk
+        kptopt = self.get("kptopt", 1) if kptopt is None else kptopt
+
+        points, weights = ibz_from_kmesh(ngkpt, shiftk, self.get_spacegroup().symrec, kptopt=kptopt)
+        ibz = collections.namedtuple("ibz", "points weights")
+        return ibz(points=points, weights=weights)
+
+    def get_irred_phperts(self, qpt=None, with_efield=False):
+        """
+        Python version of :meth:`abiget_irred_phperts`: compute the list of irreducible perturbations
+        for DFPT from the little group of qpt and the site symmetries of the atoms without running ABINIT.
+
+        Args:
+            qpt: qpoint of the phonon in reduced coordinates.
+                if qpt is not passed, self must already contain "qpt" otherwise an exception is raised.
+            with_efield: True if the electric field perturbation (ipert = natom + 2) should be
+                included. Used only if qpt is Gamma.
+
+        Returns:
+            List of dictionaries with the Abinit variables defining the irreducible perturbation
+            (same format as :meth:`abiget_irred_phperts`).
+        """
+        qpt = self.get("qpt") if qpt is None else qpt
+        if qpt is None:
+            raise ValueError("qpt is not in the input and therefore it must be passed explicitly")
+
+        return self.get_irred_phperts_qpoints([qpt], with_efield=with_efield)[0]
+
+    def get_irred_phperts_qpoints(self, qpoints, with_efield=False):
+        """
+        Compute the irreducible perturbations for all the q-points in qpoints in a single pass.
+
+        Returns:
+            List of lists. Each item has the same format as the output of :meth:`get_irred_phperts`.
+        """
+        qpoints = np.reshape(qpoints, (-1, 3))
+        perts_q = self.get_spacegroup().find_irred_perts(self.structure.frac_coords, qpoints,
+                                                         with_efield=with_efield)
+
+        return [[AttrDict(idir=int(idir), ipert=int(ipert), qpt=qpt.tolist()) for ipert, idir in perts]
+                for qpt, perts in zip(qpoints, perts_q)]
+
     def abiget_irred_phperts(self, qpt=None, ngkpt=None, shiftk=None, kptopt=None, workdir=None, manager=None):
         """
         This function, computes the list of irreducible perturbations for DFPT.
@@ -10,6 +10,7 @@ import pandas as pd
 from collections import OrderedDict, deque 
 from monty.string import is_string, list_strings
 from monty.functools import lazy_property
+from abipy.tools.parallel import map_parallel
 from pymatgen.util.plotting_utils import add_fig_kwargs, get_ax_fig_plt
 from pymatgen.io.abinitio.eos import EOS
 from pymatgen.io.abinitio.flows import Flow
@@ -64,6 +65,10 @@ class Robot(object):
     # 2) should __iter__  return (label, ncfile) or ncfile (not __getitem__ returns ncfiles.__getitem__ !!!
     # 3) replace ncfiles with files just to be consistent since we have DdbRobot!
 
+    # True if add_file should store the path and open the file only when the robot is iterated.
+    # Subclasses that read the data with worker processes set it to True to avoid reading the files twice.
+    _DEFER_OPEN = False
+
     def __init__(self, *args):
         """args is a list of tuples (label, filepath)"""
         self._ncfiles, self._do_close = OrderedDict(), OrderedDict()
@@ -152,16 +157,27 @@ class Robot(object):
                 raised if label is already present.
             ncfile: Specify the file to be added. Accepts strings (filepath) or abipy file-like objects.
         """
-        if is_string(ncfile):
-            from abipy.abilab import abiopen
-            ncfile = abiopen(ncfile)
-            self._do_close[ncfile.filepath] = True
-
         if label in self._ncfiles:
             raise ValueError("label %s is already present!")
 
+        if is_string(ncfile) and not self._DEFER_OPEN:
+            ncfile = self._abiopen(ncfile)
+
         self._ncfiles[label] = ncfile
 
+    def _abiopen(self, filepath):
+        """Open filepath with abiopen. The file will be closed by the robot."""
+        from abipy.abilab import abiopen
+        ncfile = abiopen(filepath)
+        self._do_close[ncfile.filepath] = True
+        return ncfile
+
+    def _open_deferred(self):
+        """Open the files whose opening has been deferred by add_file."""
+        for label, ncfile in list(self._ncfiles.items()):
+            if is_string(ncfile):
+                self._ncfiles[label] = self._abiopen(ncfile)
+
     @property
     def exceptions(self):
         """List of exceptions."""
@@ -171,6 +187,7 @@ class Robot(object):
         return len(self._ncfiles)
 
     def __iter__(self):
+        self._open_deferred()
         return iter(self._ncfiles.items())
 
     def __getitem__(self, key):
@@ -184,13 +201,13 @@ class Robot(object):
         self.close()
 
     def show_files(self, stream=sys.stdout):
-        s = "\n".join(["%s --> %s" % (label, ncfile.filepath) for label, ncfile in self])
+        s = "\n".join(["%s --> %s" % (label, path) for label, path in zip(self._ncfiles.keys(), self.filepaths)])
         stream.write(s)
 
     def __repr__(self):
-        lines = ["%s with %d files in memory" % (self.__class__.__name__, len(self.ncfiles))]
-        for i, f in enumerate(self.ncfiles):
-            lines.append("\t[%d]  %s" % (i, f.relpath))
+        lines = ["%s with %d files in memory" % (self.__class__.__name__, len(self))]
+        for i, f in enumerate(self._ncfiles.values()):
+            lines.append("\t[%d]  %s" % (i, f if is_string(f) else f.relpath))
         return "\n".join(lines)
 
     __str__ = __repr__
@@ -198,11 +215,18 @@ class Robot(object):
     @property
     def ncfiles(self):
         """List of netcdf files."""
+        self._open_deferred()
         return list(self._ncfiles.values())
 
+    @property
+    def filepaths(self):
+        """List of file paths. The files whose opening has been deferred are not opened."""
+        return [f if is_string(f) else f.filepath for f in self._ncfiles.values()]
+
     def close(self):
         """Close all the files that have been opened by the Robot"""
-        for ncfile in self.ncfiles:
+        for ncfile in self._ncfiles.values():
+            if is_string(ncfile): continue
             if self._do_close.pop(ncfile.filepath, False): 
                 try:
                     ncfile.close()
@@ -228,6 +252,10 @@ class Robot(object):
             # We have a Flow. smeth is the name of the Task method used to open the file.
             smeth = "open_" + cls.EXT.lower()
             for task in obj.iflat_tasks(nids=nids, status=obj.S_OK):
+                if cls._DEFER_OPEN:
+                    filepath = task.outdir.has_abiext(cls.EXT)
+                    if filepath: items.append((task.pos_str, filepath))
+                    continue
                 open_method = getattr(task, smeth, None)
                 if open_method is None: continue
                 ncfile = open_method()
@@ -241,7 +269,11 @@ class Robot(object):
             for dirpath, dirnames, filenames in os.walk(obj):
                 filenames = [f for f in filenames if f.endswith(cls.EXT + ".nc")]
                 for f in filenames:
-                    ncfile = abiopen(f)
+                    path = os.path.join(dirpath, f)
+                    if cls._DEFER_OPEN:
+                        items.append((path, path))
+                        continue
+                    ncfile = abiopen(path)
                     if ncfile is not None: items.append((ncfile.filepath, ncfile))
 
         new = cls(*items)
@@ -375,49 +407,154 @@ class GsrRobot(Robot):
             return fits, frame
 
 
+def _read_sigres_summary(filepath):
+    """
+    Read the results needed by :class:`SigresRobot` from the SIGRES file filepath.
+    Executed by the worker processes: returns a dictionary with numpy arrays (no netcdf handle).
+    """
+    from abipy.electrons.gw import SigresReader, QPState
+    with SigresReader(filepath) as r:
+        qps_spin = []
+        for qptable in r.read_allqps():
+            d = {f: qptable.get_field(f) for f in QPState._fields if f != "kpoint"}
+            d["kcoords"] = qptable.get_kcoords()
+            qps_spin.append(d)
+
+        return dict(
+            nsppol=r.nsppol,
+            params=dict(r.read_params()),
+            qpgaps=np.asarray(r.read_qpgaps()),
+            ibz=r.ibz.frac_coords,
+            gwkpoints=r.gwkpoints.frac_coords,
+            qps_spin=qps_spin,
+            geo=Robot._get_geodict(r.structure),
+        )
+
+
+def _find_kindex(frac_coords, kpoint):
+    """Index of kpoint in the array frac_coords. k-points are defined modulo G."""
+    frac_coords = np.reshape(frac_coords, (-1, 3))
+    diff = frac_coords - np.reshape(getattr(kpoint, "frac_coords", kpoint), (1, 3))
+    found = np.flatnonzero(np.all(np.abs(diff - np.round(diff)) < 1e-6, axis=1))
+    if not len(found):
+        raise ValueError("Cannot find k-point %s" % str(kpoint))
+    return found[0]
+
+
 class SigresRobot(Robot):
-    """This robot analyzes the results contained in multiple SIGRES files."""
+    """
+    This robot analyzes the results contained in multiple SIGRES files.
+
+    The files are not opened by add_file: the data used to build the tables is read file by file
+    (optionally by a pool of worker processes) and stored in compact numpy arrays that are cached by the robot.
+    The files are opened in the parent process only if the robot is iterated or if attrs/funcs are requested.
+    """
     EXT = "SIGRES"
 
-    def merge_dataframes_sk(self, spin, kpoint, **kwargs):
-        for i, (label, sigr) in enumerate(self):
-            frame = sigr.get_dataframe_sk(spin, kpoint, index=label)
-            if i == 0:
-                table = frame
+    _DEFER_OPEN = True
+
+    def __init__(self, *args):
+        # Cache of summaries. Key: (abspath, mtime)
+        self._summaries = {}
+        super(SigresRobot, self).__init__(*args)
+
+    def get_summaries(self, num_cpus=1):
+        """
+        Return list of (label, summary) where summary is a dictionary with the results read from the file.
+        The files that are not in the cache are read with num_cpus processes (autodetected if None).
+        """
+        labels, paths = list(self._ncfiles.keys()), self.filepaths
+        keys = [(os.path.abspath(path), os.path.getmtime(path)) for path in paths]
+
+        missing = [(key, path) for key, path in zip(keys, paths) if key not in self._summaries]
+        if missing:
+            args = [path for _, path in missing]
+            for (key, _), summary in zip(missing, map_parallel(_read_sigres_summary, args, num_cpus=num_cpus)):
+                self._summaries[key] = summary
+
+        return [(label, self._summaries[key]) for label, key in zip(labels, keys)]
+
+    def merge_dataframes_sk(self, spin, kpoint, num_cpus=1, **kwargs):
+        """
+        Return a pandas DataFrame with the QP results for the given spin and GW k-point
+        (:class:`Kpoint`, reduced coordinates or index in gwkpoints) computed in the different files.
+        """
+        frames = []
+        for label, summary in self.get_summaries(num_cpus=num_cpus):
+            if isinstance(kpoint, int):
+                ikgw = kpoint
             else:
-                table = table.append(frame)
-        
-        return table
+                ikgw = _find_kindex(summary["gwkpoints"], kpoint)
+            kcoords = summary["gwkpoints"][ikgw]
+            qps = summary["qps_spin"][spin]
+            mask = np.all(np.abs(qps["kcoords"] - kcoords) < 1e-8, axis=1)
+
+            # Build the columns with the QP results and add the parameters of the calculation.
+            nb = np.count_nonzero(mask)
+            cols = OrderedDict()
+            cols["spin"] = qps["spin"][mask]
+            cols["kpoint"] = nb * [kcoords]
+            for name in ("band", "e0", "qpe", "qpe_diago", "vxcme", "sigxme", "sigcmee0", "vUme", "ze0"):
+                cols[name] = qps[name][mask]
+            cols["qpeme0"] = cols["qpe"] - cols["e0"]
+            for pname, value in summary["params"].items():
+                cols[pname] = nb * [value]
+
+            frames.append(pd.DataFrame(cols, index=nb * [label], columns=list(cols.keys())))
+
+        return pd.concat(frames)
+
+    def get_qpgaps_dataframe(self, spin=None, kpoint=None, num_cpus=1, **kwargs):
+        """
+        Return a pandas DataFrame with the QP gaps at the given spin and k-point
+        and the convergence parameters of the different calculations.
+
+        Args:
+            spin: Spin index (default 0).
+            kpoint: :class:`Kpoint`, reduced coordinates or index in gwkpoints (default 0).
+            num_cpus: Number of processes used to read the files (default: serial). Autodetected if None.
 
-    def get_qpgaps_dataframe(self, spin=None, kpoint=None, **kwargs):
+        kwargs:
+            attrs:
+                List of additional attributes of the :class:`SigresFile` to add to the DataFrame.
+            funcs:
+                Function or list of functions to execute to add more data to the DataFrame.
+                Each function receives a SigresFile object and returns a tuple (key, value).
+        """
         # TODO: Ideally one should select the k-point for which we have the fundamental gap for the given spin
         if spin is None: spin = 0
         if kpoint is None: kpoint = 0
 
-        attrs = [
-            "nsppol", #"nspinor", "nspden", #"ecut", "pawecutdg",
-            #"tsmear", "nkibz",
-        ] + kwargs.pop("attrs", [])
+        attrs, funcs = kwargs.pop("attrs", []), kwargs.get("funcs", [])
+        # attrs and funcs need the SigresFile objects: open them only in this case.
+        if attrs or funcs: self._open_deferred()
 
         rows, row_names = [], []
-        for label, sigr in self:
+        for label, summary in self.get_summaries(num_cpus=num_cpus):
             row_names.append(label)
-            d = {aname: getattr(sigr, aname) for aname in attrs}
-            d.update({"qpgap": sigr.get_qpgap(spin, kpoint)})
+            kcoords = summary["gwkpoints"][kpoint] if isinstance(kpoint, int) else kpoint
+            ik = _find_kindex(summary["ibz"], kcoords)
+
+            d = OrderedDict(nsppol=summary["nsppol"])
+            if attrs:
+                sigr = self._ncfiles[label]
+                d.update({aname: getattr(sigr, aname) for aname in attrs})
+            d.update({"qpgap": summary["qpgaps"][spin, ik]})
 
             # Add convergence parameters
-            d.update(sigr.params)
-                                                        
+            d.update(summary["params"])
+
             # Add info on structure.
             if kwargs.get("with_geo", False):
-                d.update(self._get_geodict(sigr.structure))
+                d.update(summary["geo"])
 
             # Execute funcs.
-            d.update(self._exec_funcs(kwargs.get("funcs", []), sigr))
+            if funcs:
+                d.update(self._exec_funcs(funcs, self._ncfiles[label]))
 
             rows.append(d)
 
-        return pd.DataFrame(rows, index=row_names, columns=rows[0].keys())
+        return pd.DataFrame(rows, index=row_names, columns=list(rows[0].keys()))
 
     def plot_conv_qpgap(self, x_vars, **kwargs):
         """
@@ -438,28 +575,43 @@ class MdfRobot(Robot):
     """This robot analyzes the results contained in multiple MDF files."""
     EXT = "MDF.nc"
 
-    def get_mdf_plotter(self):
+    # Mapping between the names used in the dataframe and the mdf_type used in MdfFile.
+    _MDF_COLUMNS = OrderedDict([("exc_mdf", "exc"), ("rpa_mdf", "rpa"), ("gwrpa_mdf", "gwrpa")])
+
+    def get_mdf_plotter(self, mdf_type="exc"):
+        """Return :class:`MdfPlotter` with the MDFs of type mdf_type read from the files."""
         from abipy.electrons.bse import MdfPlotter
         plotter = MdfPlotter()
         for label, mdf in self:
-            plotter.add_mdf(label, mdf.exc_mdf)
+            plotter.add_mdf(label, mdf.get_mdf(mdf_type))
         return plotter
 
-    def get_dataframe(self, **kwargs):
+    def get_dataframe(self, mdf_types=("exc",), with_mdfs=False, **kwargs):
+        """
+        Build a pandas dataframe with the convergence parameters and a summary of the MDFs
+        (position and height of the main peak, integrated spectral weight). The summaries are
+        computed from the imaginary part of the MDFs without building the full arrays in memory.
+
+        Args:
+            mdf_types: List of MDF types ("exc", "rpa", "gwrpa") to summarize.
+            with_mdfs: True if the :class:`DielectricFunction` objects should be added to the frame
+                (columns "exc_mdf", "rpa_mdf", "gwrpa_mdf"). Requires reading the full arrays.
+        """
         rows, row_names = [], []
         for i, (label, mdf) in enumerate(self):
             row_names.append(label)
-            d = dict(
-                exc_mdf=mdf.exc_mdf,
-                rpa_mdf=mdf.rpanlf_mdf,
-                gwrpa_mdf=mdf.gwnlf_mdf,
-            )
-            #d = {aname: getattr(mdf, aname) for aname in attrs}
-            #d.update({"qpgap": mdf.get_qpgap(spin, kpoint)})
+            d = OrderedDict()
+            for mdf_type in mdf_types:
+                summary = mdf.get_mdf_summary(mdf_type)
+                d.update((mdf_type + "_" + k, v) for k, v in sorted(summary.items()))
+
+            if with_mdfs:
+                for colname, mdf_type in self._MDF_COLUMNS.items():
+                    d[colname] = mdf.get_mdf(mdf_type)
 
             # Add convergence parameters
             d.update(mdf.params)
-                                                        
+
             # Add info on structure.
             if kwargs.get("with_geo", False):
                 d.update(self._get_geodict(mdf.structure))
@@ -469,23 +621,27 @@ class MdfRobot(Robot):
 
             rows.append(d)
 
-        return pd.DataFrame(rows, index=row_names, columns=rows[0].keys())
+        return pd.DataFrame(rows, index=row_names, columns=list(rows[0].keys()))
 
     @add_fig_kwargs
     def plot_conv_mdf(self, hue, mdf_type="exc_mdf", **kwargs):
+        """
+        Plot the MDFs grouped by the value of the parameter hue.
+        Only the MDFs of type mdf_type are read from file.
+        """
         import matplotlib.pyplot as plt
-        frame = self.get_dataframe()
+        frame = self.get_dataframe(mdf_types=())
         grouped = frame.groupby(hue)
+        mdf_type = self._MDF_COLUMNS.get(mdf_type, mdf_type)
 
-        fig, ax_list = plt.subplots(nrows=len(grouped), ncols=1, sharex=True, sharey=True, squeeze=True)
+        fig, ax_list = plt.subplots(nrows=len(grouped), ncols=1, sharex=True, sharey=True, squeeze=False)
+        ax_list = ax_list.ravel()
 
         for i, (hue_val, group) in enumerate(grouped):
-            #print(group)
-            mdfs = group[mdf_type] 
             ax = ax_list[i]
             ax.set_title("%s = %s" % (hue, hue_val))
-            for mdf in mdfs:
-                mdf.plot_ax(ax)
+            for label in group.index:
+                self._ncfiles[label].get_mdf(mdf_type).plot_ax(ax)
 
         return fig
 
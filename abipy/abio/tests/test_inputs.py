@@ -132,8 +132,43 @@ class TestAbinitInput(AbipyTest):
         inp = AbinitInput(structure=abidata.cif_file("si.cif"), pseudos=abidata.pseudos("14si.pspnc"))
         inp.set_kmesh(ngkpt=(2, 2, 2), shiftk=(0, 0, 0))
 
+        # Python version of abiget_ibz.
+        ibz = inp.get_ibz()
+        self.assert_almost_equal(ibz.points, [[0. , 0. , 0.], [0.5, 0. , 0.], [0.5, 0.5, 0.]])
+        self.assert_almost_equal(ibz.weights, [0.125, 0.5, 0.375])
+        self.assertEqual(len(inp.get_ibz(kptopt=3).points), 8)
+
+        # Python version of abiget_irred_phperts.
+        # [{'idir': 1, 'ipert': 1, 'qpt': [0.0, 0.0, 0.0]}]
+        irred_perts = inp.get_irred_phperts(qpt=(0, 0, 0))
+        assert len(irred_perts) == 1
+        pert = irred_perts[0]
+        assert (pert.idir, pert.ipert) == (1, 1) and all(c == 0 for c in pert.qpt)
+        efield_perts = inp.get_irred_phperts(qpt=(0, 0, 0), with_efield=True)
+        assert [(p.ipert, p.idir) for p in efield_perts] == [(1, 1), (4, 1)]
+        qpoints = [[0, 0, 0], [0.5, 0, 0], [0.25, 0, 0]]
+        perts_q = inp.get_irred_phperts_qpoints(qpoints)
+        assert [len(perts) for perts in perts_q] == [1, 1, 2]
+
         # The code below invokes Abinit.
         if self.has_abinit():
+            # Compare the python IBZ with the one computed by Abinit for the reference structures.
+            cif_pseudos = {"al.cif": ["13al.981214.fhi"], "gan.cif": ["31ga.pspnc", "7n.pspnc"],
+                           "gan2.cif": ["31ga.pspnc", "7n.pspnc"], "si.cif": ["14si.pspnc"]}
+            for cif, pseudos in cif_pseudos.items():
+                cif_inp = AbinitInput(structure=abidata.cif_file(cif), pseudos=abidata.pseudos(*pseudos))
+                cif_inp.set_vars(ecut=2)
+                for ngkpt in [(2, 2, 2), (4, 4, 4)]:
+                    cif_inp.set_kmesh(ngkpt=ngkpt, shiftk=(0, 0, 0))
+                    ref, ibz = cif_inp.abiget_ibz(), cif_inp.get_ibz()
+                    self.assertEqual(len(ref.points), len(ibz.points))
+                    self.assert_almost_equal(np.sort(ref.weights), np.sort(ibz.weights))
+
+                # Compare the irreducible perturbations for a set of q-points.
+                qpoints = cif_inp.get_ibz(ngkpt=(2, 2, 2), shiftk=(0, 0, 0)).points
+                for qpt, perts in zip(qpoints, cif_inp.get_irred_phperts_qpoints(qpoints)):
+                    ref = cif_inp.abiget_irred_phperts(qpt=qpt)
+                    self.assertEqual([(p.ipert, p.idir) for p in ref], [(p.ipert, p.idir) for p in perts])
 
             # Test validate with wrong input
             inp.set_vars(ecut=-1)
@@ -39,8 +39,49 @@ class RobotTest(AbipyTest):
         #eos = robot.eos_fit()
         #frame = robot.get_dataframe()
 
-    #def test_sigres_robot(self):
-    #def test_mdf_robot(self):
+    def test_sigres_robot(self):
+        """Testing SIGRES robot"""
+        robot = Robot.for_ext("SIGRES")()
+        for nband in (10, 20, 30):
+            robot.add_file("nband%d" % nband, abidata.ref_file("si_g0w0ppm_nband%d_SIGRES.nc" % nband))
+
+        # Serial and parallel reading must give the same tables.
+        frame = robot.get_qpgaps_dataframe(num_cpus=2, with_geo=True)
+        assert len(frame) == 3 and "qpgap" in frame and "ecuteps" in frame and "volume" in frame
+        # The files are read from the paths, the robot opens them only when needed.
+        assert not robot._do_close and len(robot.filepaths) == 3
+        robot.show_files()
+        print(robot)
+
+        for label, sigr in robot:
+            self.assert_almost_equal(frame.loc[label, "qpgap"], sigr.get_qpgap(0, sigr.gwkpoints[0]))
+        assert len(robot._do_close) == 3
+
+        robot._summaries.clear()
+        # attrs and funcs are evaluated with the SigresFile objects (lambdas are allowed).
+        serial = robot.get_qpgaps_dataframe(attrs=["gwcalctyp"], funcs=lambda sigr: ("nkibz", len(sigr.ibz)))
+        assert "gwcalctyp" in serial and "nkibz" in serial and not robot.exceptions
+        self.assert_equal(serial["qpgap"].values, frame["qpgap"].values)
+
+        kpoint = robot.ncfiles[0].gwkpoints[0]
+        table = robot.merge_dataframes_sk(spin=0, kpoint=kpoint)
+        nb = len(robot.ncfiles[0].get_qplist(0, kpoint))
+        assert len(table) == 3 * nb and "qpeme0" in table
+        robot.close()
+
+    def test_mdf_robot(self):
+        """Testing MDF robot"""
+        robot = Robot.for_ext("MDF.nc")()
+        robot.add_file("mdf0", abidata.ref_file("tbs_4o_DS2_MDF.nc"))
+
+        frame = robot.get_dataframe(mdf_types=("exc", "rpa"))
+        assert "exc_peak_energy" in frame and "rpa_weight" in frame
+        assert "exc_mdf" not in frame
+        frame = robot.get_dataframe(with_mdfs=True)
+        assert "exc_mdf" in frame and "gwrpa_mdf" in frame
+        robot.get_mdf_plotter(mdf_type="rpa")
+        robot.close()
+
     #def test_ddb_robot(self):
 
 
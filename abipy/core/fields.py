@@ -154,6 +154,69 @@ class ScalarField(Has_Structure):
         else:
             return self.datag.std(axis=0)
 
+    def symmetrize(self, space="g", spacegroup=None, max_nbytes=2**27):
+        """
+        Symmetrize the field with the spatial operations of the space group:
+
+            f_sym(r) = 1/N sum_{R,t} f(R r + t)
+
+        The rotation table of the FFT mesh is computed once per (mesh, group) and cached.
+        The average over the operations is done with a single gather followed by a sum
+        (operations are processed in chunks so that the temporary array uses at most max_nbytes).
+
+        Args:
+            space: "g" to symmetrize in reciprocal space, where the fractional translations
+                enter via the phases e^{i(SG).t}. "r" to symmetrize in real space (faster, requires
+                a mesh compatible with the fractional translations).
+                In G-space, the components whose star is not contained in the FFT box are set to zero.
+            spacegroup: :class:`SpaceGroup`. None to use the space group of the structure.
+            max_nbytes: Max size of the temporary array.
+
+        Returns:
+            New object of the same class with the symmetrized data.
+        """
+        space = self._check_space(space)
+        if self.nspden == 4:
+            raise NotImplementedError("Symmetrization of non-collinear magnetization is not implemented")
+
+        spgrp = self.structure.spacegroup if spacegroup is None else spacegroup
+        if spgrp is None:
+            raise ValueError("Structure does not contain the spacegroup")
+
+        # The field is real so time-reversal is not needed. AFM operations are not used.
+        sel = (spgrp.time_signs == 1) & (spgrp.afm_signs == 1)
+        rot_r, tau = spgrp.rot_r[sel], spgrp.tau[sel]
+        table = self.mesh.rotation_table(rot_r, tau, space=space)
+        nsym = len(table)
+
+        data = self.datar if space == "r" else self.datag
+        flat = np.reshape(data, (len(data), -1))
+        if space == "g":
+            gvecs = self.mesh.gvecs
+            rot_g = np.rint(np.linalg.inv(rot_r)).astype(int).transpose(0, 2, 1)
+            flat = flat.astype(complex)
+
+        out = np.zeros_like(flat)
+        keep = np.ones(flat.shape[-1], dtype=bool)
+        chunk = max(1, max_nbytes // flat.nbytes)
+        for start in range(0, nsym, chunk):
+            stop = start + chunk
+            vals = flat[:, table[start:stop]]
+            if space == "g":
+                # Phase e^{2 pi i (SG).t} computed with the rotated G-vectors before folding.
+                sgs = np.einsum("sij,gj->sgi", rot_g[start:stop], gvecs)
+                vals *= np.exp(2j * np.pi * np.einsum("sgi,si->sg", sgs, tau[start:stop]))
+                # Stars that are not inside the FFT box (rotated G-vectors folded back into the box)
+                # would alias onto other G-vectors: these components are set to zero.
+                keep &= np.all(2 * np.abs(sgs) < self.mesh.shape, axis=(0, 2))
+            out += vals.sum(axis=1)
+
+        out[:, ~keep] = 0
+        out = np.reshape(out / nsym, data.shape)
+        datar = out if space == "r" else self.mesh.fft_g2r(out).real
+
+        return self.__class__(self.nspinor, self.nsppol, self.nspden, datar, self.structure, iorder="c")
+
     #def braket_waves(self, bra_wave, ket_wave):
     #    """
     #    Compute the matrix element of <bra_wave|datar|ket_wave> in real space
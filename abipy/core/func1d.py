@@ -17,6 +17,9 @@ from abipy.tools.derivatives import finite_diff
 
 __all__ = [
     "Function1D",
+    "Function1DStack",
+    "kramers_kronig",
+    "fsum_integrals",
 ]
 
 
@@ -120,11 +123,11 @@ class Function1D(object):
     @property
     def imag(self):
         """Return new :class:`Function1D` with the imaginary part of self."""
-        return self.__class__(self.mesh, self.values.real)
+        return self.__class__(self.mesh, self.values.imag)
 
     def conjugate(self):
         """Return new :class:`Function1D` with the complex conjugate."""
-        return self.__class__(self.mesh, self.values.conjugate)
+        return self.__class__(self.mesh, self.values.conjugate())
 
     def abs(self):
         """Return the absolute value."""
@@ -340,24 +343,48 @@ class Function1D(object):
 
         return self.__class__(mesh, fft_vals)
 
-    #def convolve(self, other):
-    #    ""Convolution with FFT."""
-    #    assert self.has_same_mesh(other)
-    #    from scipy.signal import convolve
-    #    conv = convolve(self.values, other.values, mode="same") * self.h
-    #    return self.__class__(self.mesh, conv)
-
-    #def gauss_convolve(self, width):
-    #   """Convolve self with a gaussian of standard deviation width."""
-    #    from abipy.tools import gauss_ufunc
-    #    gauss = gauss_ufunc(width, center=0.0, height=None)
-    #    gdata = Function1D(self.mesh, gauss(self.mesh))
-    #    return self.convolve(gdata)
-
-    #def lorentz_convolve(self, gamma):
-    #   """Convolve self with a Lorentzian."""
-    #    lorentz = lorentz_ufunc(gamma, center=0.0, height=None)
-    #    return self.convolve(Function1D.from_func(self.mesh, lorentz))
+    def kramers_kronig(self, part="imag", const=1.0, pad=4, tail=True):
+        """
+        Use the Kramers-Kronig relations to reconstruct a causal response function
+        from its imaginary (or real) part given on a homogeneous mesh of positive frequencies.
+        See :func:`kramers_kronig` for the meaning of the arguments.
+
+        Returns:
+            new complex :class:`Function1D`.
+        """
+        return self.__class__(self.mesh, kramers_kronig(self.mesh, self.values, part=part,
+                                                        const=const, pad=pad, tail=tail))
+
+    def fsum(self):
+        """
+        Cumulative f-sum integral :math:`\int_0^w w' Im f(w') dw'`.
+        If f is real, the values are interpreted as the imaginary part.
+
+        Returns:
+            :class:`Function1D`
+        """
+        return self.__class__(self.mesh, fsum_integrals(self.mesh, self.values))
+
+    def effective_electrons(self, volume):
+        """
+        Effective number of electrons per unit cell contributing to the absorption up to w:
+
+            N_eff(w) = V / (2 pi^2) \int_0^w w' Im eps(w') dw'
+
+        Atomic units: mesh in Hartree and volume in Bohr^3.
+
+        Returns:
+            :class:`Function1D`
+        """
+        return self.__class__(self.mesh, volume / (2 * np.pi ** 2) * fsum_integrals(self.mesh, self.values))
+
+    def gauss_convolve(self, width):
+        """Convolve self with a normalized gaussian of standard deviation width."""
+        return Function1DStack(self.mesh, self.values[None, :]).gauss_convolve(width)[0]
+
+    def lorentz_convolve(self, gamma):
+        """Convolve self with a normalized Lorentzian of half-width gamma."""
+        return Function1DStack(self.mesh, self.values[None, :]).lorentz_convolve(gamma)[0]
 
     #def smooth(self, window_len=21, window="hanning"):
     #    from abipy.tools import smooth
@@ -426,3 +453,355 @@ class Function1D(object):
         self.plot_ax(ax, exchange_xy=exchange_xy, **kwargs)
 
         return fig
+
+
+class Function1DStack(object):
+    """
+    Immutable object storing nfunc (real|complex) functions defined on the same mesh.
+    The values are stored in a (nfunc, len(mesh)) array so that arithmetic, integration,
+    interpolation and convolutions are performed for all the functions with array operations.
+    """
+    def __init__(self, mesh, values):
+        """
+        Args:
+            mesh: array-like object with the real points of the grid.
+            values: (nfunc, len(mesh)) array-like object with the values of the functions.
+        """
+        self._mesh = np.ascontiguousarray(mesh)
+        self._values = np.ascontiguousarray(np.atleast_2d(values))
+        assert self._values.ndim == 2 and self._values.shape[1] == len(self._mesh)
+
+    @classmethod
+    def from_funcs(cls, funcs, mesh=None, kind="linear"):
+        """
+        Build the object from a list of :class:`Function1D`.
+
+        If mesh is None and the functions are defined on the same mesh, the values are just stacked.
+        Otherwise the functions are interpolated on mesh (default: linear mesh covering all the input
+        meshes whose step is given by the smallest step). Values outside the input mesh are set to zero.
+        kind is passed to :meth:`resample`.
+        """
+        funcs = list(funcs)
+        first = funcs[0]
+        if mesh is None:
+            if all(first.has_same_mesh(other) for other in funcs[1:]):
+                return cls(first.mesh, np.array([f.values for f in funcs]))
+
+            xmin = min(f.mesh[0] for f in funcs)
+            xmax = max(f.mesh[-1] for f in funcs)
+            step = min(np.min(f.dx) for f in funcs)
+            mesh = np.linspace(xmin, xmax, num=int(np.ceil((xmax - xmin) / step)) + 1)
+
+        mesh = np.asarray(mesh)
+        return cls(mesh, np.array([cls(f.mesh, f.values[None, :]).resample(mesh, kind=kind).values[0]
+                                   for f in funcs]))
+
+    @property
+    def mesh(self):
+        """Array with the mesh points"""
+        return self._mesh
+
+    @property
+    def values(self):
+        """(nfunc, len(mesh)) array with the values of the functions."""
+        return self._values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        for values in self.values:
+            yield Function1D(self.mesh, values)
+
+    def __getitem__(self, index):
+        """Integer --> :class:`Function1D`, slices or arrays --> :class:`Function1DStack`."""
+        if isinstance(index, (int, np.integer)):
+            return Function1D(self.mesh, self.values[index])
+        return self.__class__(self.mesh, self.values[index])
+
+    def __repr__(self):
+        return "%s at %s, nfunc = %d, size = %d" % (self.__class__.__name__, id(self), len(self), len(self.mesh))
+
+    def __eq__(self, other):
+        if other is None: return False
+        return (self.values.shape == other.values.shape and self.has_same_mesh(other) and
+                np.allclose(self.values, other.values))
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def has_same_mesh(self, other):
+        """True if self and other (:class:`Function1D` or :class:`Function1DStack`) have the same mesh."""
+        return len(self.mesh) == len(other.mesh) and np.allclose(self.mesh, other.mesh)
+
+    def _other_values(self, other):
+        """Values of other that can be broadcast against self.values."""
+        if isinstance(other, (Function1D, Function1DStack)):
+            assert self.has_same_mesh(other)
+            return other.values
+        other = np.asarray(other)
+        # A 1D array with one entry per function is broadcast along the mesh.
+        if other.ndim == 1 and len(other) == len(self) and len(other) != len(self.mesh):
+            return other[:, None]
+        return other
+
+    def __neg__(self):
+        return self.__class__(self.mesh, -self.values)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return self.__class__(self.mesh, np.abs(self.values))
+
+    def __add__(self, other):
+        return self.__class__(self.mesh, self.values + self._other_values(other))
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self.__class__(self.mesh, self.values - self._other_values(other))
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        return self.__class__(self.mesh, self.values * self._other_values(other))
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return self.__class__(self.mesh, self.values / self._other_values(other))
+
+    def __rtruediv__(self, other):
+        return self.__class__(self.mesh, self._other_values(other) / self.values)
+
+    def __pow__(self, other):
+        return self.__class__(self.mesh, self.values ** other)
+
+    @property
+    def real(self):
+        """Return new :class:`Function1DStack` with the real part of self."""
+        return self.__class__(self.mesh, self.values.real)
+
+    @property
+    def imag(self):
+        """Return new :class:`Function1DStack` with the imaginary part of self."""
+        return self.__class__(self.mesh, self.values.imag)
+
+    def conjugate(self):
+        """Return new :class:`Function1DStack` with the complex conjugate."""
+        return self.__class__(self.mesh, self.values.conjugate())
+
+    def abs(self):
+        """Return the absolute value."""
+        return abs(self)
+
+    @lazy_property
+    def dx(self):
+        """Array with the distance between consecutive points of the mesh."""
+        return np.diff(self.mesh)
+
+    @lazy_property
+    def h(self):
+        """The spacing of the mesh. None if mesh is not homogeneous."""
+        return self.dx[0] if np.allclose(self.dx[0], self.dx) else None
+
+    def integral(self):
+        """
+        Cumulatively integrate the functions using the composite trapezoidal rule.
+
+        Returns:
+            :class:`Function1DStack` with :math:`\int y(x) dx`
+        """
+        integ = np.zeros(self.values.shape, dtype=self.values.dtype)
+        integ[:, 1:] = np.cumsum(0.5 * (self.values[:, 1:] + self.values[:, :-1]) * self.dx, axis=1)
+        return self.__class__(self.mesh, integ)
+
+    def integrate(self):
+        """Array with the definite integrals of the functions (trapezoidal rule)."""
+        return np.sum(0.5 * (self.values[:, 1:] + self.values[:, :-1]) * self.dx, axis=1)
+
+    @property
+    def l1_norms(self):
+        """Array with :math:`\int |f(x)| dx` for each function."""
+        return abs(self).integrate()
+
+    def resample(self, mesh, kind="linear"):
+        """
+        Interpolate the functions on a new mesh. Values outside the range of self.mesh are set to zero.
+
+        Args:
+            mesh: New mesh.
+            kind: "linear" for linear interpolation, "cubic" for cubic splines.
+
+        Returns:
+            :class:`Function1DStack`
+        """
+        mesh = np.asarray(mesh)
+        if kind == "linear":
+            # Indices and weights are shared by all the functions.
+            i = np.clip(np.searchsorted(self.mesh, mesh) - 1, 0, len(self.mesh) - 2)
+            t = (mesh - self.mesh[i]) / (self.mesh[i+1] - self.mesh[i])
+            new = (1 - t) * self.values[:, i] + t * self.values[:, i+1]
+
+        elif kind == "cubic":
+            from scipy.interpolate import interp1d
+            new = interp1d(self.mesh, self.values, kind="cubic", axis=1, copy=False, assume_sorted=True,
+                           bounds_error=False, fill_value=0.0)(mesh)
+
+        else:
+            raise ValueError("Wrong value for kind: %s" % kind)
+
+        outside = (mesh < self.mesh[0]) | (mesh > self.mesh[-1])
+        new[:, outside] = 0.0
+        return self.__class__(mesh, new)
+
+    def spline_on_mesh(self, mesh):
+        """Spline the functions on the given mesh, returns :class:`Function1DStack` object."""
+        return self.resample(mesh, kind="cubic")
+
+    def convolve(self, kernel):
+        """
+        Convolve the functions with kernel (a function of x, centered at x = 0)
+        using FFTs on the (homogeneous) mesh. The output is defined on the same mesh.
+        """
+        if self.h is None:
+            raise ValueError("Convolutions with inhomogeneous meshes are not supported")
+
+        n = len(self.mesh)
+        kvals = kernel(np.arange(-(n - 1), n) * self.h)
+        m = 2
+        while m < 3 * n - 2: m *= 2
+
+        fft, ifft = (np.fft.fft, np.fft.ifft) if (np.iscomplexobj(self.values) or
+                                                   np.iscomplexobj(kvals)) else (np.fft.rfft, np.fft.irfft)
+        conv = ifft(fft(self.values, n=m, axis=1) * fft(kvals, n=m), n=m, axis=1)
+        return self.__class__(self.mesh, conv[:, n-1:2*n-1] * self.h)
+
+    def gauss_convolve(self, width):
+        """Convolve the functions with a normalized gaussian of standard deviation width."""
+        return self.convolve(lambda x: np.exp(-0.5 * (x / width) ** 2) / (width * np.sqrt(2 * np.pi)))
+
+    def lorentz_convolve(self, gamma):
+        """Convolve the functions with a normalized Lorentzian of half-width gamma."""
+        return self.convolve(lambda x: gamma / np.pi / (x ** 2 + gamma ** 2))
+
+
+def _hilbert_halfaxis(values, parity, pad):
+    """
+    Hilbert transform :math:`H[f](w) = 1/pi P \int f(t) / (w - t) dt` of the functions
+    given on the points w_i = i h, i = 0, ..., n-1 (last axis of values) and extended
+    to negative frequencies with the given parity ("odd" or "even").
+    The transform is computed with FFTs on a zero-padded mesh to avoid spurious periodic images.
+    """
+    n = values.shape[-1]
+    m = 2
+    while m < pad * (2 * n - 1): m *= 2
+
+    work = np.zeros(values.shape[:-1] + (m,))
+    work[..., :n] = values
+    work[..., m-n+1:] = (-1 if parity == "odd" else 1) * values[..., :0:-1]
+
+    spec = np.fft.rfft(work, axis=-1)
+    spec *= -1j
+    spec[..., 0] = spec[..., -1] = 0
+
+    return np.fft.irfft(spec, n=m, axis=-1)[..., :n]
+
+
+def _kk_tail(x, edge, parity):
+    """
+    Contribution to the transform due to the part of the spectrum beyond wmax,
+    assuming the asymptotic behavior C/w^3 (odd) or C/w^2 (even) for w > wmax.
+    x is the mesh divided by wmax, edge the values at wmax.
+    """
+    x = np.minimum(x, 1 - 1e-8)
+    small = x < 1e-3
+    xs = np.where(small, 0.5, x)
+
+    if parity == "odd":
+        # Correction to -H[f]
+        r = np.where(small, 1/3 + x**2 / 5, (np.arctanh(xs) - xs) / xs**3)
+        return 2 * edge[..., None] / np.pi * r
+    else:
+        # Correction to H[f]
+        r = np.where(small, -x / 3 - x**3 / 5, (1 - np.arctanh(xs) / xs) / xs)
+        return 2 * edge[..., None] / np.pi * r
+
+
+def kramers_kronig(mesh, values, part="imag", const=1.0, pad=4, tail=True):
+    """
+    Reconstruct a causal response function eps(w) (e.g. the dielectric function)
+    from its imaginary or real part with the Kramers-Kronig relations:
+
+        Re eps(w) - const = 2/pi P \int_0^inf w' Im eps(w') / (w'^2 - w^2) dw'
+        Im eps(w) = -2w/pi P \int_0^inf (Re eps(w') - const) / (w'^2 - w^2) dw'
+
+    The principal values are computed with FFT-based Hilbert transforms, O(N log N)
+    for all the functions in values.
+
+    Args:
+        mesh: Homogeneous mesh of positive frequencies. If mesh[0] > 0, it must be a multiple of the step.
+            The missing points are filled with 0 (Im) or with the first value (Re).
+        values: (..., len(mesh)) array. If complex, only the part selected by part is used.
+        part: "imag" to compute Re from Im, "real" to compute Im from Re.
+        const: Value of eps at infinite frequency (1 for the dielectric function).
+        pad: The functions are zero-padded to (at least) pad times the length of the full frequency axis.
+        tail: True if the contribution of the frequencies beyond mesh[-1] should be estimated
+            assuming the asymptotic behaviours Im ~ 1/w^3 and Re - const ~ 1/w^2.
+
+    Returns:
+        (..., len(mesh)) complex array with eps(w).
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    values = np.asarray(values)
+    if part not in ("imag", "real"):
+        raise ValueError("Wrong value for part: %s" % part)
+    if np.iscomplexobj(values):
+        values = values.imag if part == "imag" else values.real
+    values = np.asarray(values, dtype=float)
+
+    h = mesh[1] - mesh[0]
+    if not np.allclose(np.diff(mesh), h):
+        raise ValueError("Kramers-Kronig transform requires a homogeneous mesh")
+    nstart = int(round(mesh[0] / h))
+    if nstart < 0 or abs(nstart * h - mesh[0]) > 1e-6 * h:
+        raise ValueError("mesh[0] must be a non-negative multiple of the step, got %s" % mesh[0])
+
+    # Extend the functions down to w = 0.
+    fill = 0.0 if part == "imag" else values[..., :1]
+    head = np.broadcast_to(fill, values.shape[:-1] + (nstart,))
+    fvals = np.concatenate((head, values), axis=-1) if nstart else values
+
+    wmax = mesh[-1]
+    x = (np.arange(fvals.shape[-1]) * h) / wmax
+
+    if part == "imag":
+        other = const - _hilbert_halfaxis(fvals, "odd", pad)
+        if tail: other += _kk_tail(x, fvals[..., -1], "odd")
+        eps = other + 1j * fvals
+    else:
+        fvals = fvals - const
+        other = _hilbert_halfaxis(fvals, "even", pad)
+        if tail: other += _kk_tail(x, fvals[..., -1], "even")
+        eps = const + fvals + 1j * other
+
+    return eps[..., nstart:]
+
+
+def fsum_integrals(mesh, values):
+    """
+    Cumulative f-sum integrals :math:`\int_{mesh[0]}^w w' Im f(w') dw'` computed with the
+    trapezoidal rule for all the functions in values (last axis). Real values are interpreted
+    as the imaginary part.
+
+    Returns:
+        Real array with the same shape as values.
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    values = np.asarray(values)
+    if np.iscomplexobj(values): values = values.imag
+
+    wim = mesh * values
+    out = np.zeros(wim.shape)
+    out[..., 1:] = np.cumsum(0.5 * (wim[..., 1:] + wim[..., :-1]) * np.diff(mesh), axis=-1)
+    return out
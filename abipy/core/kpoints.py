@@ -23,6 +23,7 @@ __all__ = [
     "IrredZone",
     "rc_list",
     "kmesh_from_mpdivs",
+    "ibz_from_kmesh",
 ]
 
 # Tolerance used to compare k-points.
@@ -151,6 +152,71 @@ def kmesh_from_mpdivs(mpdivs, shifts, pbc=False, order="bz"):
     return np.array(kbz)
 
 
+def _kpoint_keys(frac_coords, ndiv=10**6):
+    """
+    Integer keys identifying k-points modulo a reciprocal lattice vector.
+    The three reduced coordinates are rounded to multiples of 1/ndiv and packed in a single int64.
+    """
+    ik = np.rint(np.asarray(frac_coords) * ndiv).astype(np.int64) % ndiv
+    return (ik[..., 0] * ndiv + ik[..., 1]) * ndiv + ik[..., 2]
+
+
+def _index_kpoints(ref_keys, keys):
+    """Return the index in ref_keys of each entry of keys (-1 if not found)."""
+    order = np.argsort(ref_keys)
+    sorted_keys = ref_keys[order]
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(ref_keys) - 1)
+
+    return np.where(sorted_keys[pos] == keys, order[pos], -1)
+
+
+def ibz_from_kmesh(ngkpt, shiftk, symrec, kptopt=1):
+    """
+    Compute the k-points in the irreducible wedge and the corresponding weights
+    for the Monkhorst-Pack mesh defined by ngkpt and shiftk.
+    This is the python version of the IBZ computed by ABINIT (see AbinitInput.abiget_ibz).
+
+    The points of the mesh are ordered with the first reduced coordinate running fastest
+    (one shift after the other) and the representative of each orbit is the first point of the orbit.
+    All the orbits are computed at once: the images of the mesh are mapped back to the mesh
+    with integer keys. Only the operations that map the mesh onto itself are used.
+
+    Args:
+        ngkpt: Number of divisions of the mesh.
+        shiftk: Shift(s) of the mesh in reduced coordinates.
+        symrec: (nsym, 3, 3) array with the rotations in reciprocal space (reduced coordinates).
+        kptopt: 1 to use spatial symmetries and time-reversal, 2 for time-reversal only,
+            3 for no symmetry, 4 for spatial symmetries without time-reversal.
+
+    Returns:
+        points: (nibz, 3) array with the reduced coordinates in ]-1/2, 1/2].
+        weights: (nibz,) array with the weights (normalized to one).
+    """
+    if kptopt not in (1, 2, 3, 4):
+        raise ValueError("kptopt %s is not supported" % kptopt)
+
+    ngkpt = np.reshape(ngkpt, (3,))
+    shiftk = np.reshape(shiftk, (-1, 3))
+    kmesh = kmesh_from_mpdivs(ngkpt, shiftk, order="unit_cell")
+
+    # Fortran order for each shift (first index runs fastest).
+    kmesh = np.reshape(kmesh, (len(shiftk),) + tuple(ngkpt) + (3,)).transpose(0, 3, 2, 1, 4).reshape(-1, 3)
+
+    rots = np.reshape(symrec, (-1, 3, 3)) if kptopt in (1, 4) else np.eye(3, dtype=int)[None]
+    if kptopt in (1, 2): rots = np.concatenate((rots, -rots))
+
+    # Index of S k in the mesh for all the operations. Keep the operations that map the mesh onto itself.
+    keys = _kpoint_keys(kmesh)
+    images = _index_kpoints(keys, _kpoint_keys(np.einsum("sij,kj->ski", rots, kmesh)))
+    images = images[np.all(images >= 0, axis=1)]
+
+    # The representative of each orbit is the point with the smallest index.
+    reps = images.min(axis=0)
+    ibz_inds, counts = np.unique(reps, return_counts=True)
+
+    return wrap_to_ws(kmesh[ibz_inds]), counts / len(kmesh)
+
+
 class KpointsError(Exception):
     """Base error class for KpointList exceptions."""
 
@@ -384,17 +450,14 @@ class Kpoint(object):
         
     def compute_star(self, symmops, wrap_tows=True):
         """Return the star of the kpoint (tuple of `Kpoint` objects)."""
-        frac_coords = [self.frac_coords]
-
-        for sym in symmops:
-            sk_coords = sym.rotate_k(self.frac_coords, wrap_tows=wrap_tows)
-
-            # Add it only if it's not already in the list.
-            for prev_coords in frac_coords:
-                if issamek(sk_coords, prev_coords, atol=self.ATOL_KDIFF):
-                    break
-            else:
-                frac_coords.append(sk_coords)
+        rots = np.array([sym.rot_g * sym.time_sign for sym in symmops]).reshape(-1, 3, 3)
+        sk_coords = np.dot(rots, self.frac_coords)
+        if wrap_tows: sk_coords = wrap_to_ws(sk_coords)
+
+        # Remove duplicated images (the base point comes first) keeping the order of the operations.
+        frac_coords = np.concatenate(([self.frac_coords], sk_coords))
+        _, first = np.unique(_kpoint_keys(frac_coords), return_index=True)
+        frac_coords = frac_coords[np.sort(first)]
 
         return KpointStar(self.lattice, frac_coords, weights=None, names=len(frac_coords) * [self.name])
 
@@ -3,7 +3,6 @@
 from __future__ import print_function, division, unicode_literals
 
 import numpy as np
-from itertools import product as iproduct
 
 from monty.functools import lazy_property
 from numpy.random import random
@@ -13,6 +12,14 @@ __all__ = [
     "Mesh3D",
 ]
 
+# Number of divisions used to compare fractional translations.
+_TAU_NDIV = 10**6
+
+# Rotation tables computed so far (see Mesh3D.rotation_table).
+# Tables are large so only few of them are kept in memory.
+_ROTATION_TABLES = {}
+_ROTATION_TABLES_MAXSIZE = 8
+
 
 class Mesh3D(object):
     """
@@ -246,32 +253,23 @@ class Mesh3D(object):
     @lazy_property
     def gvecs(self):
         """Array with the reduced coordinates of the G-vectors."""
-        gx_list = np.rint(fftfreq(self.nx) * self.nx)
-        gy_list = np.rint(fftfreq(self.ny) * self.ny)
-        gz_list = np.rint(fftfreq(self.nz) * self.nz)
-        #print(gz_list, gy_list, gx_list)
-                                                      
-        gvecs = np.empty((self.size,3), dtype=np.int)
-                                                      
-        idx = -1
-        for gx in gx_list:
-            for gy in gy_list:
-                for gz in gz_list:
-                    idx += 1
-                    gvecs[idx,:] = gx, gy, gz
-
-        return gvecs
+        gx_list = np.rint(fftfreq(self.nx) * self.nx).astype(int)
+        gy_list = np.rint(fftfreq(self.ny) * self.ny).astype(int)
+        gz_list = np.rint(fftfreq(self.nz) * self.nz).astype(int)
+
+        grids = np.meshgrid(gx_list, gy_list, gz_list, indexing="ij")
+        return np.reshape(np.stack(grids, axis=-1), (self.size, 3))
 
     @lazy_property
     def rpoints(self):
         """Array with the points in real space in reduced coordinates."""
-        nx, ny, nz = self.nx, self.ny, self.nz
-        rpoints = np.empty((self.size,3))
+        return self._ipoints / np.array(self.shape, dtype=float)
 
-        for ifft, p1_fft in enumerate(iproduct(range(nx), range(ny), range(nz))):
-            rpoints[ifft,:] = p1_fft[0]/nx, p1_fft[1]/ny, p1_fft[2]/nz
-
-        return rpoints
+    @lazy_property
+    def _ipoints(self):
+        """(size, 3) integer array with the indices of the points of the FFT box (C order)."""
+        grids = np.meshgrid(*[np.arange(n) for n in self.shape], indexing="ij")
+        return np.reshape(np.stack(grids, axis=-1), (self.size, 3))
 
     #def ogrid_rfft(self):
     #    return np.ogrid[0:1:1/self.nx, 
@@ -322,43 +320,61 @@ class Mesh3D(object):
             raise ValueError("Wrong plane %s" % plane)
 
     def irottable(self, symmops):
-        nsym = len(symmops)
-        nx, ny, nz = self.nx, self.ny, self.nz
+        """
+        (nsym, nfft) table with the indices of the points R^{-1}(r - tau) in the FFT box
+        for the symmetry operations symmops.
+        """
+        rotsm1 = np.array([symmop.rotm1_r for symmop in symmops])
+        taus = -np.einsum("sij,sj->si", rotsm1, [symmop.tau for symmop in symmops])
+        return self.rotation_table(rotsm1, taus, space="r")
+
+    def rotation_table(self, rot_r, tau, space="r"):
+        """
+        Build the (nsym, nfft) index table used to symmetrize functions defined on the mesh.
+        The table is computed with integer arithmetic and cached (per mesh and set of operations).
 
-        red2fft = np.diag([nx, ny, nz])
-        fft2red = np.diag([1/nx, 1/ny, 1/nz])
-
-        # For a fully compatible mesh, each mat in rotsm1_fft should be integer 
-        rotsm1_fft, tnons_fft = np.empty((nsym,3,3)), np.empty((nsym,3)) 
-
-        for isym, symmop in enumerate(symmops):
-            rotm1_r, tau = symmop.rotm1_r, symmop.tau
-            rotsm1_fft[isym] = np.dot(np.dot(red2fft, rotm1_r), fft2red)
-            tnons_fft[isym] = np.dot(red2fft, tau)
-
-        # Indeces of $R^{-1}(r-\tau)$ in the FFT box.
-        irottable = np.empty((nsym, nx*ny*nz), dtype=np.int) 
-
-        #max_err = 0.0
-        nxyz = np.array((nx, ny, nz), np.int)
-        for isym in range(nsym):
-            rm1_fft = rotsm1_fft[isym]
-            tau_fft = tnons_fft[isym]
-            for ifft, p1_fft in enumerate(iproduct(range(nx), range(ny), range(nz))):
-                # Form R^-1 (r-\tau) in the FFT basis.
-                p1_fft = np.array(p1_fft)
-                prot_fft = np.dot(rm1_fft, p1_fft - tau_fft)
-                #err = ABS(prot_fft - (ix, iy, iz)) / (nx, ny, nz)
-                prot_fft = np.round(prot_fft)
-                jx, jy, jz = prot_fft % nxyz
-                irottable[isym, ifft] = jz + (jy * nz) + (jx * nx * ny)
-
-        # Test
-        #for isym in range(nsym):
-        #    irottable[isym, ifft]
-        #    rm1_fft = rotsm1_fft[isym]
-        #    tau_fft = tnons_fft[isym]
-        #    for ifft, p1_fft in enumerate(itertools.product(range(nx), range(ny), range(nz))):
-        #        irot_fft == irottable[isym, ifft]
-
-        return irottable
+        Args:
+            rot_r: (nsym, 3, 3) integer array with the rotations in real space (reduced coordinates).
+            tau: (nsym, 3) array with the fractional translations.
+            space: "r" for real space: table[s, i] is the index of the point R_s r_i + tau_s.
+                "g" for reciprocal space: table[s, i] is the index of the G-vector S_s G_i with S = R^{-1 T}
+                (G-vectors are folded into the FFT box, fractional translations are not used).
+
+        Raises:
+            ValueError if the mesh is not compatible with the operations.
+        """
+        rot_r = np.asarray(rot_r, dtype=np.int64).reshape(-1, 3, 3)
+        tau = np.reshape(tau, (-1, 3))
+        space = space.lower()
+        key = (self.shape, space, rot_r.tobytes(), np.rint(tau * _TAU_NDIV).astype(np.int64).tobytes())
+        if key in _ROTATION_TABLES:
+            return _ROTATION_TABLES[key]
+
+        ndivs = np.array(self.shape)
+        if space == "r":
+            # R and tau in units of the FFT divisions must be integer.
+            rots_fft = rot_r * ndivs[None, :, None] / ndivs[None, None, :]
+            taus_fft = tau * ndivs
+            if not (np.allclose(rots_fft, np.rint(rots_fft)) and np.allclose(taus_fft, np.rint(taus_fft), atol=1e-6)):
+                raise ValueError("FFT mesh %s is not compatible with the symmetry operations" % str(self.shape))
+            rots_fft, taus_fft = np.rint(rots_fft).astype(np.int64), np.rint(taus_fft).astype(np.int64)
+            points = self._ipoints
+
+        elif space == "g":
+            rots_fft = np.rint(np.linalg.inv(rot_r)).astype(np.int64).transpose(0, 2, 1)
+            taus_fft = np.zeros((len(rot_r), 3), dtype=np.int64)
+            points = self.gvecs
+
+        else:
+            raise ValueError("Wrong space %s" % space)
+
+        # Strides of the C-ordered FFT box.
+        strides = np.array([self.ny * self.nz, self.nz, 1], dtype=np.int64)
+        dtype = np.int32 if self.size < 2**31 else np.int64
+        table = np.empty((len(rot_r), self.size), dtype=dtype)
+        for isym, (rot, tfft) in enumerate(zip(rots_fft, taus_fft)):
+            table[isym] = np.dot((np.dot(points, rot.T) + tfft) % ndivs, strides)
+
+        if len(_ROTATION_TABLES) >= _ROTATION_TABLES_MAXSIZE: _ROTATION_TABLES.clear()
+        _ROTATION_TABLES[key] = table
+        return table
@@ -340,13 +340,28 @@ class Structure(pymatgen.Structure):
         """Orders the structure according to increasing Z of the elements"""
         return self.__class__.from_sites(sorted(self.sites, key=lambda site: site.specie.Z))
 
+    @lazy_property
+    def _hsym_names(self):
+        """Dictionary mapping the keys of the high-symmetry stars to the name of the special k-point."""
+        star_keys = self.spacegroup.analyze_kpoints(self.hsym_kpoints.frac_coords).star_keys
+        names = {}
+        for key, kpoint in zip(star_keys, self.hsym_kpoints):
+            names.setdefault(key, kpoint.name)
+        return names
+
     def findname_in_hsym_stars(self, kpoint):
         """Returns the name of the special k-point, None if kpoint is unknown.""" 
-        for star in self.hsym_stars:
-            if star.find(kpoint) != -1:
-                return star.name
-        else:
-            return None
+        return self.findnames_in_hsym_stars([getattr(kpoint, "frac_coords", kpoint)])[0]
+
+    def findnames_in_hsym_stars(self, kpoints):
+        """
+        Vectorized version of :meth:`findname_in_hsym_stars`.
+        kpoints is a :class:`KpointList` or an array with reduced coordinates.
+        Returns the list with the names of the special k-points (None if the k-point is unknown).
+        """
+        frac_coords = getattr(kpoints, "frac_coords", kpoints)
+        star_keys = self.spacegroup.analyze_kpoints(frac_coords).star_keys
+        return [self._hsym_names.get(key) for key in star_keys]
 
     def get_symbol2coords(self):
         """Return a dictionary mapping chemical symbols to coordinates."""
@@ -546,72 +561,35 @@ class Structure(pymatgen.Structure):
         l = max_supercell
 
         # Inspired from Exciting Fortran code phcell.F90
-        # It should be possible to improve this code taking advantage of python !
-        scale_matrix = np.zeros((3,3),dtype=np.int)
-        dmin = np.inf
-        found = False
-
-        # Try to reduce the matrix
-        rprimd = self.lattice.matrix
-        for l1 in np.arange(-l[0], l[0]+1):
-            for l2 in np.arange(-l[1], l[1]+1):
-                for l3 in np.arange(-l[2], l[2]+1):
-                    lnew = np.array([l1, l2, l3])
-                    ql = np.dot(lnew, qpoint)
-                    # Check if integer and non zero !
-                    if np.abs(ql - np.round(ql)) < 1e-6:
-                        Rl = np.dot(lnew, rprimd)
-                        # Normalize the displacement so that the maximum atomic displacement is 1 Angstrom.
-                        dnorm = np.sqrt(np.dot(Rl,Rl))
-                        if dnorm < (dmin-1e-6) and dnorm > 1e-6:
-                            found = True
-                            scale_matrix[:, 0] = lnew
-                            dmin = dnorm
-        if not found:
-            raise ValueError('max_supercell is not large enough for this q-point')
-
-        found = False
-        dmin = np.inf
-        for l1 in np.arange(-l[0], l[0]+1):
-            for l2 in np.arange(-l[1], l[1]+1):
-                for l3 in np.arange(-l[2], l[2]+1):
-                    lnew = np.array([l1, l2, l3])
-                    # Check if not parallel !
-                    cp = np.cross(lnew, scale_matrix[:,0])
-                    if np.dot(cp,cp) > 1e-6:
-                        ql = np.dot(lnew, qpoint)
-                        # Check if integer and non zero !
-                        if np.abs(ql - np.round(ql)) < 1e-6:
-                            Rl = np.dot(lnew, rprimd)
-                            dnorm = np.sqrt(np.dot(Rl, Rl))
-                            if dnorm < (dmin-1e-6) and dnorm > 1e-6:
-                                found = True
-                                scale_matrix[:, 1] = lnew
-                                dmin = dnorm
-        if not found:
-            raise ValueError('max_supercell is not large enough for this q-point')
-
-        dmin = np.inf
-        found = False
-        for l1 in np.arange(-l[0], l[0]+1):
-            for l2 in np.arange(-l[1], l[1]+1):
-                for l3 in np.arange(-l[2], l[2]+1):
-                    lnew = np.array([l1, l2, l3])
-                    # Check if not parallel !
-                    cp = np.dot(np.cross(lnew, scale_matrix[:, 0]), scale_matrix[:, 1])
-                    if cp > 1e-6:
-                        # Should be positive as (R3 X R1).R2 > 0 for abinit !
-                        ql = np.dot(lnew, qpoint)
-                        # Check if integer and non zero !
-                        if np.abs(ql - np.round(ql)) < 1e-6:
-                            Rl = np.dot(lnew, rprimd)
-                            dnorm = np.sqrt(np.dot(Rl,Rl))
-                            if dnorm < (dmin-1e-6) and dnorm > 1e-6:
-                                found = True
-                                scale_matrix[:, 2] = lnew
-                                dmin = dnorm
-        if not found:
-            raise ValueError('max_supercell is not large enough for this q-point')
+        # Build all the candidate lattice vectors at once. The vectors are ordered as in
+        # a triple loop over (l1, l2, l3) with l1 as the slowest index so that, in the case of 
+        # vectors with the same length, we select the first one in this order.
+        grids = np.meshgrid(*[np.arange(-l[i], l[i]+1) for i in range(3)], indexing="ij")
+        lvecs = np.reshape(grids, (3, -1)).T
+
+        # Keep the vectors for which q.l is integer.
+        ql = np.dot(lvecs, qpoint)
+        lvecs = lvecs[np.abs(ql - np.round(ql)) < 1e-6]
+        rvecs = np.dot(lvecs, self.lattice.matrix)
+        dnorms = np.sqrt(np.sum(rvecs * rvecs, axis=1))
+
+        def find_shortest(mask):
+            # Exclude the null vector.
+            mask = mask & (dnorms > 1e-6)
+            if not np.any(mask):
+                raise ValueError('max_supercell is not large enough for this q-point')
+            dmin = dnorms[mask].min()
+            return lvecs[np.flatnonzero(mask & (dnorms < dmin + 1e-6))[0]]
+
+        scale_matrix = np.zeros((3,3), dtype=int)
+        scale_matrix[:, 0] = find_shortest(np.ones(len(lvecs), dtype=bool))
+
+        # Check if not parallel !
+        cp = np.cross(lvecs, scale_matrix[:, 0])
+        scale_matrix[:, 1] = find_shortest(np.sum(cp * cp, axis=1) > 1e-6)
+
+        # Should be positive as (R3 X R1).R2 > 0 for abinit !
+        scale_matrix[:, 2] = find_shortest(np.dot(cp, scale_matrix[:, 1]) > 1e-6)
 
         # Fortran 2 python!!!
         return scale_matrix.T
@@ -709,23 +687,17 @@ class Structure(pymatgen.Structure):
 
                 xyz_file.write(fmtstr.format(site.specie, coords[0], coords[1], coords[2], new_displ[0], new_displ[1], new_displ[2]))
 
-    def frozen_2phonon(self, qpoint, displ1, displ2, do_real1=True, do_real2=True, frac_coords=True, scale_matrix=None, max_supercell=None):
+    def _get_supercell_table(self, qpoint, scale_matrix=None, max_supercell=None):
         """
-        Compute the supercell needed for a given qpoint and add the displacement.
+        Compute the quantities that depend only on the q-point and on the supercell.
 
-        Args:
-            qpoint:
-                q vector in reduced coordinate in reciprocal space.
-            displ:
-                displacement in real space of the atoms, will be normalized to 1 Angstrom.
-            eta:
-                pre-factor multiplying the displacement.
-            do_real:
-                true if we want only the real part of the displacement.
+        Returns:
+            new_lattice: :class:`Lattice` of the supercell.
+            iatom: Index of the atom in the unit cell for each site of the supercell.
+            frac_coords: (nsites, 3) array with the reduced coordinates (wrt the unit cell) of the sites 
+                of the supercell. Sites are ordered by atom and then by translation vector.
+            phases: (ntrans,) array with the phases exp(2 pi i q.t) for the translation vectors.
         """
-        # I've copied code from make_supercell since the loop over supercell images
-        # is inside make_supercell and I don't want to create a mapping
-
         if scale_matrix is None:
             if max_supercell is None:
                 raise ValueError("If scale_matrix is not provided, please provide max_supercell !")
@@ -736,43 +708,75 @@ class Structure(pymatgen.Structure):
         if scale_matrix.shape != (3, 3):
             scale_matrix = np.array(scale_matrix * np.eye(3), np.int16)
 
-        old_lattice = self._lattice
-        new_lattice = Lattice(np.dot(scale_matrix, old_lattice.matrix))
-
+        new_lattice = Lattice(np.dot(scale_matrix, self._lattice.matrix))
         tvects = self.get_trans_vect(scale_matrix)
+        natom, ntrans = len(self), len(tvects)
 
-        new_displ1 = np.zeros(3, dtype=np.float)
-        new_displ2 = np.zeros(3, dtype=np.float)
-        new_sites = []
-        for at,site in enumerate(self):
-            for t in tvects:
-                if(do_real1):
-                    new_displ1[:] = np.real(np.exp(2*1j*np.pi*(np.dot(qpoint,t)))*displ1[at,:])
-                else:
-                    new_displ1[:] = np.imag(np.exp(2*1j*np.pi*(np.dot(qpoint,t)))*displ1[at,:])
-                if not frac_coords:
-                    # Convert to fractional coordinates.
-                    new_displ1 = self.lattice.get_fractional_coords(new_displ1)
+        iatom = np.repeat(np.arange(natom), ntrans)
+        frac_coords = (self.frac_coords[:, None, :] + tvects[None, :, :]).reshape(natom * ntrans, 3)
+        phases = np.exp(2j * np.pi * np.dot(tvects, qpoint))
 
-                if(do_real2):
-                    new_displ2[:] = np.real(np.exp(2*1j*np.pi*(np.dot(qpoint,t)))*displ2[at,:])
-                else:
-                    new_displ2[:] = np.imag(np.exp(2*1j*np.pi*(np.dot(qpoint,t)))*displ2[at,:])
-                if not frac_coords:
-                    # Convert to fractional coordinates.
-                    new_displ2 = self.lattice.get_fractional_coords(new_displ2)
+        return new_lattice, iatom, frac_coords, phases
 
+    def _get_supercell_displ(self, phases, displ, do_real=True, frac_coords=True):
+        """
+        Compute the displacements of the sites of the supercell from the phonon displacements.
 
-                # We don't normalize here !!!
-                fcoords = site.frac_coords + t + new_displ1 + new_displ2
-                coords = old_lattice.get_cartesian_coords(fcoords)
-                new_site = PeriodicSite(
-                    site.species_and_occu, coords, new_lattice,
-                    coords_are_cartesian=True, properties=site.properties,
-                    to_unit_cell=True)
-                new_sites.append(new_site)
+        Args:
+            phases: Phases returned by _get_supercell_table.
+            displ: (..., natom, 3) array with one or more displacement patterns.
+            do_real: True to take the real part of the displacement, False for the imaginary part.
+            frac_coords: False if displ is given in Cartesian coordinates.
+
+        Returns:
+            (..., nsites, 3) array with the displacements in reduced coordinates of the unit cell.
+        """
+        displ = np.asarray(displ)
+        natom = displ.shape[-2]
+        new_displ = phases[:, None] * displ[..., :, None, :]
+        new_displ = new_displ.real if do_real else new_displ.imag
+        new_displ = new_displ.reshape(displ.shape[:-2] + (natom * len(phases), 3))
+
+        if not frac_coords:
+            # Convert to fractional coordinates.
+            new_displ = np.dot(new_displ, self.lattice.inv_matrix)
+
+        return new_displ
+
+    def _get_supercell_fcoords(self, new_lattice, frac_coords):
+        """
+        Convert the reduced coordinates wrt the unit cell to reduced coordinates in the supercell
+        new_lattice. The coordinates are mapped into the unit cell of the supercell.
+        """
+        cart_coords = np.dot(frac_coords, self._lattice.matrix)
+        return np.mod(np.dot(cart_coords, new_lattice.inv_matrix), 1)
+
+    def frozen_2phonon(self, qpoint, displ1, displ2, do_real1=True, do_real2=True, frac_coords=True, scale_matrix=None, max_supercell=None):
+        """
+        Compute the supercell needed for a given qpoint and add the displacement.
+
+        Args:
+            qpoint:
+                q vector in reduced coordinate in reciprocal space.
+            displ:
+                displacement in real space of the atoms, will be normalized to 1 Angstrom.
+            eta:
+                pre-factor multiplying the displacement.
+            do_real:
+                true if we want only the real part of the displacement.
+        """
+        # I've copied code from make_supercell since the loop over supercell images
+        # is inside make_supercell and I don't want to create a mapping
+        new_lattice, iatom, fcoords, phases = self._get_supercell_table(
+            qpoint, scale_matrix=scale_matrix, max_supercell=max_supercell)
+
+        # We don't normalize here !!!
+        fcoords = fcoords + self._get_supercell_displ(phases, displ1, do_real=do_real1, frac_coords=frac_coords) + \
+                  self._get_supercell_displ(phases, displ2, do_real=do_real2, frac_coords=frac_coords)
+        new_fcoords = self._get_supercell_fcoords(new_lattice, fcoords)
 
-        self._sites = new_sites
+        self._sites = [PeriodicSite(self[i].species_and_occu, new_fcoords[isite], new_lattice, properties=self[i].properties)
+                       for isite, i in enumerate(iatom)]
         self._lattice = new_lattice
 
     def frozen_phonon(self, qpoint, displ, do_real=True, frac_coords=True, scale_matrix=None, max_supercell=None):
@@ -787,45 +791,94 @@ class Structure(pymatgen.Structure):
         """
         # I've copied code from make_supercell since the loop over supercell images
         # is inside make_supercell and I don't want to create a mapping
+        new_lattice, iatom, fcoords, phases = self._get_supercell_table(
+            qpoint, scale_matrix=scale_matrix, max_supercell=max_supercell)
 
-        if scale_matrix is None:
-            if max_supercell is None:
-                raise ValueError("If scale_matrix is not provided, please provide max_supercell !")
+        # We don't normalize here !!!
+        fcoords = fcoords + self._get_supercell_displ(phases, displ, do_real=do_real, frac_coords=frac_coords)
+        new_fcoords = self._get_supercell_fcoords(new_lattice, fcoords)
 
-            scale_matrix = self.get_smallest_supercell(qpoint, max_supercell=max_supercell)
+        self._sites = [PeriodicSite(self[i].species_and_occu, new_fcoords[isite], new_lattice, properties=self[i].properties)
+                       for isite, i in enumerate(iatom)]
+        self._lattice = new_lattice
 
-        scale_matrix = np.array(scale_matrix, np.int16)
-        if scale_matrix.shape != (3, 3):
-            scale_matrix = np.array(scale_matrix * np.eye(3), np.int16)
+    def iter_frozen_phonons(self, qpoint, displ_list, etas, do_real=True, frac_coords=True, scale_matrix=None, max_supercell=None):
+        """
+        Generator over the supercells obtained by freezing a list of phonon displacements 
+        at the same q-point with different amplitudes. The supercell and the translation 
+        vectors are computed only once and the displacements are added to all the sites 
+        with array operations. The structure is not changed.
 
-        old_lattice = self._lattice
-        new_lattice = Lattice(np.dot(scale_matrix, old_lattice.matrix))
+        Args:
+            qpoint: q vector in reduced coordinate in reciprocal space.
+            displ_list: (nmodes, natom, 3) array with the displacements (e.g. all the branches at this q-point).
+            etas: List of amplitudes multiplying the displacements.
+            do_real: true if we want only the real part of the displacement.
+            frac_coords: False if the displacements are given in Cartesian coordinates.
+            scale_matrix: Scale matrix for supercell. Computed from max_supercell if None.
+            max_supercell: Maximum size of supercell vectors with respect to primitive cell
 
-        tvects = self.get_trans_vect(scale_matrix)
+        Yields:
+            (imode, eta, structure) where structure is a new :class:`Structure` with the displaced supercell.
+        """
+        if not isinstance(etas, collections.Iterable):
+            etas = [etas]
 
-        new_displ = np.zeros(3, dtype=np.float)
-        new_sites = []
-        for at,site in enumerate(self):
-            for t in tvects:
-                if do_real:
-                    new_displ[:] = np.real(np.exp(2*1j*np.pi*(np.dot(qpoint,t)))*displ[at,:])
-                else:
-                    new_displ[:] = np.imag(np.exp(2*1j*np.pi*(np.dot(qpoint,t)))*displ[at,:])
-                if not frac_coords:
-                    # Convert to fractional coordinates.
-                    new_displ = self.lattice.get_fractional_coords(new_displ)
+        new_lattice, iatom, fcoords, phases = self._get_supercell_table(
+            qpoint, scale_matrix=scale_matrix, max_supercell=max_supercell)
 
-                # We don't normalize here !!!
-                fcoords = site.frac_coords + t + new_displ
-                coords = old_lattice.get_cartesian_coords(fcoords)
-                new_site = PeriodicSite(
-                    site.species_and_occu, coords, new_lattice,
-                    coords_are_cartesian=True, properties=site.properties,
-                    to_unit_cell=True)
-                new_sites.append(new_site)
+        displ_list = np.reshape(displ_list, (-1, len(self), 3))
+        new_displ = self._get_supercell_displ(phases, displ_list, do_real=do_real, frac_coords=frac_coords)
 
-        self._sites = new_sites
-        self._lattice = new_lattice
+        species = [self[i].species_and_occu for i in iatom]
+        site_properties = {k: [v[i] for i in iatom] for k, v in self.site_properties.items()}
+
+        for imode, mode_displ in enumerate(new_displ):
+            # All the amplitudes at once: (neta, nsites, 3)
+            all_fcoords = self._get_supercell_fcoords(
+                new_lattice, fcoords[None, :, :] + np.reshape(etas, (-1, 1, 1)) * mode_displ[None, :, :])
+
+            for eta, new_fcoords in zip(etas, all_fcoords):
+                yield imode, eta, self.__class__(new_lattice, species, new_fcoords, site_properties=site_properties)
+
+    def write_frozen_phonons(self, dirpath, qpoints, displ_list, etas, do_real=True, frac_coords=True, 
+                             scale_matrix=None, max_supercell=None, fmt="abivars"):
+        """
+        Generate the supercells with the frozen phonons for a list of q-points and write them to dirpath.
+        The structures are produced by :meth:`iter_frozen_phonons` and written as soon as they are 
+        generated so that memory does not grow with the number of structures.
+
+        Args:
+            dirpath: Directory where the files are written. Created if it does not exist.
+            qpoints: List of q-points in reduced coordinates.
+            displ_list: List with the (nmodes, natom, 3) displacements for each q-point.
+            etas: List of amplitudes multiplying the displacements.
+            do_real: true if we want only the real part of the displacement.
+            frac_coords: False if the displacements are given in Cartesian coordinates.
+            scale_matrix: Scale matrix for supercell (same for all the q-points). Computed from max_supercell if None.
+            max_supercell: Maximum size of supercell vectors with respect to primitive cell
+            fmt: "abivars" to write the ABINIT variables defining the structure, 
+                else any format supported by :meth:`pymatgen.Structure.to` e.g. "cif" or "poscar".
+
+        Returns:
+            List of paths of the files produced.
+        """
+        if not os.path.exists(dirpath): os.makedirs(dirpath)
+        ext = "abi" if fmt == "abivars" else fmt.lower()
+
+        filepaths = []
+        for iq, (qpoint, qdispl) in enumerate(zip(qpoints, displ_list)):
+            for imode, eta, structure in self.iter_frozen_phonons(qpoint, qdispl, etas, do_real=do_real, frac_coords=frac_coords,
+                                                                  scale_matrix=scale_matrix, max_supercell=max_supercell):
+                path = os.path.join(dirpath, "q%d_mode%d_eta%s.%s" % (iq, imode, eta, ext))
+                if fmt == "abivars":
+                    with open(path, "w") as fh:
+                        fh.write(structure.abi_string)
+                else:
+                    structure.to(fmt=fmt, filename=path)
+                filepaths.append(path)
+
+        return filepaths
 
     def calc_kptbounds(self):
         """Returns the suggested value for the ABINIT variable `kptbounds`."""
@@ -2,9 +2,11 @@
 """Objects used to deal with symmetry operations in crystals."""
 from __future__ import print_function, division, unicode_literals
 
+import os
 import sys
 import abc
 import warnings
+import itertools
 import collections
 import six
 import numpy as np
@@ -15,7 +17,7 @@ from monty.itertools import iuptri
 from monty.pprint import pprint_table
 from pymatgen.symmetry.finder import SymmetryFinder
 from pymatgen.symmetry.analyzer import get_point_group
-from abipy.core.kpoints import wrap_to_ws, issamek
+from abipy.core.kpoints import wrap_to_ws, issamek, _kpoint_keys
 from abipy.iotools import as_etsfreader
 
 
@@ -339,12 +341,135 @@ class SymmOp(Operation):
         Returns:
             rot_gvecs: `ndarray` with shape [ng, 3] containing the result of self(G).
         """
-        rot_gvecs = np.empty_like(gvecs)
+        return np.dot(gvecs, self.rot_g.T) * self.time_sign
 
-        for ig, gvec in enumerate(gvecs):
-            rot_gvecs[ig] = np.dot(self.rot_g, gvec) * self.time_sign
 
-        return rot_gvecs
+# Number of divisions used to encode the fractional translations as integers.
+_TAU_NDIV = 10**6
+
+
+def _encode_ops(rots, taus, signs):
+    """
+    Encode operations as rows of integers that can be compared exactly:
+    the 9 elements of the rotation, the signs (time-reversal, AFM) and the fractional translation
+    reduced modulo a lattice vector and expressed in units of 1/_TAU_NDIV.
+
+    Args:
+        rots: (..., 3, 3) integer array.
+        taus: (..., 3) array with the fractional translations.
+        signs: (..., 2) array with time_sign and afm_sign.
+
+    Returns:
+        (..., 14) int64 array.
+    """
+    rots = np.asarray(rots, dtype=np.int64)
+    taus = np.rint(np.asarray(taus, dtype=float) * _TAU_NDIV).astype(np.int64) % _TAU_NDIV
+    signs = np.asarray(signs, dtype=np.int64)
+
+    return np.concatenate((rots.reshape(rots.shape[:-2] + (9,)), signs, taus), axis=-1)
+
+
+def _lookup_rows(table, rows):
+    """
+    Return the index of each row of rows in the 2D array table (-1 if not found).
+    All the rows are mapped to compact integer keys with a single np.unique.
+    """
+    table, rows = np.asarray(table), np.asarray(rows)
+    n = len(table)
+    _, keys = np.unique(np.concatenate((table, rows)), axis=0, return_inverse=True)
+    keys = np.ravel(keys)
+
+    pos = np.full(keys.max() + 1, -1, dtype=int)
+    pos[keys[:n][::-1]] = np.arange(n)[::-1]
+    return pos[keys[n:]]
+
+
+def _mult_table(rots, taus, signs, codes=None):
+    """
+    Multiplication table of the operations described by the arrays (rots, taus, signs).
+    All the products {R_i,t_i} {R_j,t_j} = {R_i R_j, R_i t_j + t_i} are computed at once.
+    mtable[i,j] is the index of the product (-1 if the product is not in the set).
+    """
+    rots, taus, signs = np.asarray(rots), np.asarray(taus), np.asarray(signs)
+    if codes is None: codes = _encode_ops(rots, taus, signs)
+
+    nops = len(rots)
+    prod_rots = np.einsum("iab,jbc->ijac", rots, rots)
+    prod_taus = taus[:, None, :] + np.einsum("iab,jb->ija", rots, taus)
+    prod_signs = signs[:, None, :] * signs[None, :, :]
+    prod_codes = _encode_ops(prod_rots, prod_taus, prod_signs).reshape(nops * nops, -1)
+
+    return _lookup_rows(codes, prod_codes).reshape(nops, nops)
+
+
+def _class_constants(mtable, class_indices):
+    """
+    Class multiplication constants c[i,j,k] i.e. the number of pairs (a, b) with a in class i
+    and b in class j whose product is a given element of class k.
+    The constants do not depend on the order of the operations and are used to map the classes
+    of isomorphic groups onto each other.
+    """
+    mtable = np.asarray(mtable)
+    nops, ncls = len(mtable), len(class_indices)
+    cls = np.empty(nops, dtype=int)
+    for icls, inds in enumerate(class_indices):
+        cls[inds] = icls
+
+    counts = np.zeros((ncls, ncls, nops), dtype=int)
+    np.add.at(counts, (cls[:, None], cls[None, :], mtable), 1)
+
+    return counts[:, :, [inds[0] for inds in class_indices]]
+
+
+def _class_invariants(rotations, class_indices):
+    """
+    (nclass, 3) integer array with the invariants (determinant, trace, size) of each class.
+    The invariants do not depend on the basis used to express the rotations.
+    """
+    rots = np.asarray(rotations)[[inds[0] for inds in class_indices]]
+    dets = np.rint(np.linalg.det(rots)).astype(int)
+    traces = np.rint(np.trace(rots, axis1=1, axis2=2)).astype(int)
+
+    return np.column_stack((dets, traces, [len(inds) for inds in class_indices]))
+
+
+# Multiplication tables and classes computed so far, indexed by the encoded operations.
+# LittleGroup objects are created for each k-point but there are only few distinct groups.
+_GROUP_TABLES = {}
+_GROUP_TABLES_MAXSIZE = 256
+
+
+# Space groups computed by SpaceGroup.from_structure, indexed by the fingerprint of the structure.
+# Robots open many files with the same structure so the symmetry analysis is performed only once.
+_SPACEGROUPS = {}
+_SPACEGROUPS_MAXSIZE = 128
+
+
+def _structure_fingerprint(structure, ndiv=10**8):
+    """
+    Hashable fingerprint of the structure: lattice vectors, species and fractional coordinates
+    reduced to [0, 1[ and rounded to multiples of 1/ndiv.
+    """
+    lattice = np.rint(np.asarray(structure.lattice.matrix) * ndiv).astype(np.int64)
+    coords = np.rint(np.reshape(structure.frac_coords, (-1, 3)) * ndiv).astype(np.int64) % ndiv
+    species = tuple(site.species_string for site in structure)
+
+    return lattice.tobytes(), coords.tobytes(), species
+
+
+def _irred_dirs(rots):
+    """
+    Find the directions e_idir that cannot be obtained as linear combinations of the images
+    R e_j of the directions selected before (R in rots). Returns list of 1-based indices.
+    """
+    images, dirs = np.zeros((0, 3)), []
+    for idir in range(3):
+        rank = np.linalg.matrix_rank(images) if len(images) else 0
+        if np.linalg.matrix_rank(np.vstack((images, np.eye(3)[idir]))) > rank:
+            dirs.append(idir + 1)
+            images = np.vstack((images, rots[:, :, idir]))
+
+    return dirs
 
 
 class OpSequence(collections.Sequence):
@@ -427,18 +552,17 @@ class OpSequence(collections.Sequence):
         if [op.isE for op in self].count(True) != 1:
             check += 1
 
-        # The inverse must be in the set.
-        if [op.inverse() in self for op in self].count(True) != len(self):
-            check += 2
-
         # The product of two members must be in the set.
-        op_prods = [op1 * op2 for op1 in self for op2 in self]
+        mtable = self.mult_table
+        for i, j in zip(*np.nonzero(mtable < 0)):
+            print("op12 not in group\n %s" % str(self[i] * self[j]))
+            check += 1
 
-        d = self.asdict()
-        for op12 in op_prods:
-            if op12 not in d:
-                print("op12 not in group\n %s" % str(op12)) 
-                check += 1
+        # The inverse must be in the set i.e. each row of the table must contain the identity.
+        if check == 0:
+            ie = [op.isE for op in self].index(True)
+            if not np.all(np.any(mtable == ie, axis=1)):
+                check += 2
 
         return check == 0
 
@@ -463,32 +587,48 @@ class OpSequence(collections.Sequence):
         assert len(d) == len(self)
         return d
 
+    def _op_arrays(self):
+        """
+        Return the arrays (rotations, translations, signs) describing the operations in self.
+        signs is a (nops, 2) array with time_sign and afm_sign.
+        """
+        ops = list(self)
+        if ops and hasattr(ops[0], "rot_r"):
+            return (np.array([op.rot_r for op in ops]), np.array([op.tau for op in ops]),
+                    np.array([(op.time_sign, op.afm_sign) for op in ops]))
+        else:
+            # Pure rotations.
+            return (np.reshape([np.asarray(op.mat) for op in ops], (-1, 3, 3)),
+                    np.zeros((len(ops), 3)), np.ones((len(ops), 2), dtype=int))
+
+    def _get_tables(self):
+        """
+        Compute the multiplication table and the classes from the integer encoding of the operations.
+        Results are cached per group.
+        """
+        rots, taus, signs = self._op_arrays()
+        codes = _encode_ops(rots, taus, signs)
+        key = (codes.shape, codes.tobytes())
+        if key in _GROUP_TABLES:
+            return _GROUP_TABLES[key]
+
+        tables = dict(mult_table=_mult_table(rots, taus, signs, codes=codes), class_indices=None)
+        if len(_GROUP_TABLES) >= _GROUP_TABLES_MAXSIZE: _GROUP_TABLES.clear()
+        _GROUP_TABLES[key] = tables
+        return tables
+
     @property
     def mult_table(self):
         """
         Given a set of nsym 3x3 operations which are supposed to form a group, 
         this routine constructs the multiplication table of the group.
-        mtable[i,j] gives the index of the product S_i * S_j.
+        mtable[i,j] gives the index of the product S_i * S_j (-1 if the product is not in self).
         """
         try:
             return self._mult_table
 
         except AttributeError:
-            mtable = np.empty((len(self), len(self)), dtype=np.int)
-    
-            d = self.asdict()
-            for (i, op1) in enumerate(self):
-                for (j, op2) in enumerate(self):
-                    op12 = op1 * op2 
-                    # Save the index of op12 in self
-                    try:
-                        index = d[op12]
-                    except KeyError:
-                        index = None
-
-                    mtable[i,j] = index
-
-            self._mult_table = mtable
+            self._mult_table = self._get_tables()["mult_table"]
             return self._mult_table
 
     @property
@@ -511,25 +651,29 @@ class OpSequence(collections.Sequence):
             return self._class_indices
 
         except AttributeError:
-            found, class_indices = len(self) * [False], [[] for i in range(len(self))]
-
-            num_classes = -1
-            for (ii, op1) in enumerate(self):
-                if found[ii]: continue
-                num_classes += 1
-
-                for (jj, op2) in enumerate(self):
-                    # Form conjugate and search it among the operations 
-                    # that have not been found yet.
-                    op1_conj = op1.opconj(op2)
-
-                    for (kk, op3) in enumerate(self):
-                        if not found[kk] and op1_conj == op3:
-                            found[kk] = True
-                            class_indices[num_classes].append(kk)
-
-            self._class_indices = class_indices[:num_classes+1]
-
+            tables = self._get_tables()
+            if tables["class_indices"] is None:
+                mtable = tables["mult_table"]
+                if np.any(mtable < 0):
+                    raise ValueError("Cannot compute classes: operations do not form a group")
+
+                # conj[x, s] is the index of X^-1 S X computed from the multiplication table.
+                ie = [op.isE for op in self].index(True)
+                inv = np.argmax(mtable == ie, axis=1)
+                conj = mtable[mtable[inv, :], np.arange(len(self))[:, None]]
+
+                found, class_indices = np.zeros(len(self), dtype=bool), []
+                for ii in range(len(self)):
+                    if found[ii]: continue
+                    # Keep the order in which the conjugates are found.
+                    _, first = np.unique(conj[:, ii], return_index=True)
+                    inds = conj[np.sort(first), ii]
+                    found[inds] = True
+                    class_indices.append([int(i) for i in inds])
+
+                tables["class_indices"] = class_indices
+
+            self._class_indices = tables["class_indices"]
             assert sum(len(c) for c in self._class_indices) == len(self)
             return self._class_indices
 
@@ -604,6 +748,17 @@ class SpaceGroup(OpSequence):
                                        rot_g=self.symrec[isym]))
         self._ops = tuple(all_syms)
 
+        # Stacked arrays with the operations in self._ops (same order).
+        ntime = len(self._time_signs)
+        self.rot_r = np.tile(self.symrel, (ntime, 1, 1))
+        self.rot_g = np.tile(self.symrec, (ntime, 1, 1))
+        self.tau = np.tile(self.tnons, (ntime, 1))
+        self.time_signs = np.repeat(self._time_signs, len(self.symrel))
+        self.afm_signs = np.tile(self.symafm, ntime)
+
+    def _op_arrays(self):
+        return self.rot_r, self.tau, np.stack((self.time_signs, self.afm_signs), axis=1)
+
     @classmethod
     def from_file(cls, file, inord="F"):
         """Initialize the object from a Netcdf file."""
@@ -637,22 +792,34 @@ class SpaceGroup(OpSequence):
             symprec: Tolerance for symmetry finding
             angle_tolerance: Angle tolerance for symmetry finding.
 
+        The results are cached: structures with the same lattice, species and positions
+        (and the same parameters) return the same object.
+
         .. warning::
 
             AFM symmetries are not supported.
         """
+        # Structures with the same fingerprint share the same object.
+        key = (cls, _structure_fingerprint(structure), has_timerev, symprec, angle_tolerance)
+        if key in _SPACEGROUPS:
+            return _SPACEGROUPS[key]
+
         # Call spglib to get the list of symmetry operations.
         finder = SymmetryFinder(structure, symprec=symprec, angle_tolerance=angle_tolerance)
         data = finder.get_symmetry_dataset()
 
-        symrel = data["rotations"],
+        symrel = data["rotations"]
 
-        return cls(spgid=data["number"],
-                   symrel=symrel,
-                   tnons=data["translations"],
-                   symafm=len(symrel) * [1],
-                   has_timerev=has_timerev,
-                   inord="C")
+        new = cls(spgid=data["number"],
+                  symrel=symrel,
+                  tnons=data["translations"],
+                  symafm=len(symrel) * [1],
+                  has_timerev=has_timerev,
+                  inord="C")
+
+        if len(_SPACEGROUPS) >= _SPACEGROUPS_MAXSIZE: _SPACEGROUPS.clear()
+        _SPACEGROUPS[key] = new
+        return new
 
     def __repr__(self):
         return str(self)
@@ -750,6 +917,53 @@ class SpaceGroup(OpSequence):
     #        timrev = 2 if self.has_timerev else 1
     #    )
 
+    def rotate_k_all(self, kpts, wrap_tows=False):
+        """
+        Apply all the operations of the group to the k-points kpts given in reduced coordinates.
+
+        Returns:
+            (len(self), nk, 3) array with the rotated points S_i(k_j).
+            The points are wrapped to the first Brillouin zone if wrap_tows is True.
+        """
+        kpts = np.reshape(kpts, (-1, 3))
+        sks = np.matmul(kpts, np.transpose(self.rot_g * self.time_signs[:, None, None], (0, 2, 1)))
+
+        return wrap_to_ws(sks) if wrap_tows else sks
+
+    def rotate_gvecs_all(self, gvecs):
+        """
+        Apply all the operations of the group to the G-vectors gvecs given in reduced coordinates.
+
+        Returns:
+            (len(self), ng, 3) array with the rotated vectors S_i(G_j).
+        """
+        gvecs = np.reshape(gvecs, (-1, 3))
+        return np.einsum("sij,gj->sgi", self.rot_g, gvecs) * self.time_signs[:, None, None]
+
+    def little_group_mask(self, kpts, atol=1e-8, ret_g0=False):
+        """
+        Find the operations that preserve the k-points kpts modulo a reciprocal lattice vector
+        i.e. S k = k + G0. AFM operations are excluded.
+
+        Args:
+            kpts: (nk, 3) array with the reduced coordinates of the k-points.
+            atol: Absolute tolerance used to compare k-points.
+            ret_g0: True if the G0 vectors should be returned.
+
+        Returns:
+            (nk, len(self)) boolean array. If ret_g0, (mask, g0vecs) where g0vecs is a
+            (nk, len(self), 3) integer array with G0 = S k - k.
+        """
+        kpts = np.reshape(kpts, (-1, 3))
+        diff = self.rotate_k_all(kpts) - kpts
+        g0vecs = np.rint(diff)
+        mask = np.all(np.abs(diff - g0vecs) <= atol, axis=-1) & (self.afm_signs == 1)[:, None]
+
+        if not ret_g0:
+            return mask.T
+        else:
+            return mask.T, np.transpose(g0vecs, (1, 0, 2)).astype(int)
+
     def find_little_group(self, kpoint):
         """
         Find the little group of the kpoint
@@ -762,18 +976,115 @@ class SpaceGroup(OpSequence):
         """
         frac_coords = getattr(kpoint, "frac_coords", kpoint)
 
-        to_spgrp, g0vecs = [], []
-
         # Exclude AFM operations.
-        for isym, symmop in enumerate(self.fm_symmops):
-            is_same, g0 = symmop.preserve_k(frac_coords)
-            if is_same:
-                to_spgrp.append(isym)
-                g0vecs.append(g0)
+        mask, g0vecs = self.little_group_mask(frac_coords, ret_g0=True)
+        to_spgrp = np.nonzero(mask[0])[0]
 
         # List with the symmetry operation that preserve the kpoint.
         k_symmops = [self[i] for i in to_spgrp]
-        return LittleGroup(kpoint, k_symmops, g0vecs)
+        return LittleGroup(kpoint, k_symmops, g0vecs[0, to_spgrp])
+
+    def analyze_kpoints(self, kpts, atol=1e-8):
+        """
+        Symmetry analysis of a set of k-points performed in a single vectorized pass.
+        AFM operations are excluded.
+
+        Args:
+            kpts: (nk, 3) array with the reduced coordinates of the k-points.
+            atol: Absolute tolerance used to compare k-points.
+
+        Returns:
+            `namedtuple` with the following attributes::
+
+                mask: (nk, len(self)) boolean array. True if the operation belongs to the little group of k.
+                star_sizes: (nk,) array with the number of points in the star of k.
+                weights: star_sizes normalized to one (weights of the points if kpts is an irreducible set).
+                reps: (nk, 3) array with the canonical representative of the star in ]-1/2, 1/2].
+                star_keys: (nk,) integer array. Two k-points belong to the same star if they have the same key.
+        """
+        kpts = np.reshape(kpts, (-1, 3))
+        fm = self.afm_signs == 1
+        mask = self.little_group_mask(kpts, atol=atol)
+
+        # Orbit-stabilizer theorem.
+        star_sizes = fm.sum() // mask.sum(axis=1)
+
+        # The canonical representative is the image with the smallest integer key.
+        images = self.rotate_k_all(kpts)[fm]
+        keys = _kpoint_keys(images)
+        imin, ik = np.argmin(keys, axis=0), np.arange(len(kpts))
+
+        analysis = collections.namedtuple("KpointsAnalysis", "mask star_sizes weights reps star_keys")
+        return analysis(mask=mask, star_sizes=star_sizes, weights=star_sizes / star_sizes.sum(),
+                        reps=wrap_to_ws(images[imin, ik]), star_keys=keys[imin, ik])
+
+    def map_atoms(self, frac_coords, atol=1e-4):
+        """
+        Find the images of the atoms under the spatial operations R x + t.
+
+        Args:
+            frac_coords: (natom, 3) array with the reduced coordinates of the atoms.
+            atol: Absolute tolerance used to compare positions.
+
+        Returns:
+            (nsym, natom) integer array where nsym is the number of spatial symmetries.
+            indsym[isym, iat] is the index of the atom obtained by applying isym to iat.
+        """
+        frac_coords = np.reshape(frac_coords, (-1, 3))
+        images = np.einsum("sij,aj->sai", self.symrel, frac_coords) + self.tnons[:, None, :]
+        diff = images[:, :, None, :] - frac_coords[None, None, :, :]
+        dist = np.abs(diff - np.rint(diff)).max(axis=-1)
+
+        if np.any(dist.min(axis=-1) > atol):
+            raise ValueError("The positions of the atoms are not compatible with the symmetry operations")
+
+        return np.argmin(dist, axis=-1)
+
+    def find_irred_perts(self, frac_coords, qpoints, with_efield=False, atol=1e-4):
+        """
+        Find the irreducible atomic-displacement perturbations for all the q-points in qpoints
+        with the little group of q (S q = q + G) and the site symmetry of the atoms.
+        Perturbations follow the ABINIT conventions: ipert in [1, natom] is the displacement of atom ipert
+        along the primitive vector idir, ipert = natom + 2 is the electric field along the reciprocal
+        lattice vector idir. The electric field is considered only at q = 0 and only if with_efield.
+
+        The result depends only on the little group so the reduction is done once for each
+        distinct little group found in qpoints.
+
+        Args:
+            frac_coords: (natom, 3) array with the reduced coordinates of the atoms.
+            qpoints: (nq, 3) array with the reduced coordinates of the q-points.
+            with_efield: True if the electric-field perturbation should be included.
+            atol: Absolute tolerance used to compare atomic positions.
+
+        Returns:
+            List of nq (npert, 2) integer arrays with (ipert, idir) (1-based indices).
+        """
+        qpoints = np.reshape(qpoints, (-1, 3))
+        indsym = self.map_atoms(frac_coords, atol=atol)
+        nsym, natom = indsym.shape
+
+        # Spatial operations (no time-reversal) of the little group of each q.
+        masks = self.little_group_mask(qpoints)[:, :nsym]
+        efield = with_efield & np.all(np.abs(qpoints) < 1e-8, axis=1)
+        groups, inverse = np.unique(np.column_stack((masks, efield)), axis=0, return_inverse=True)
+
+        perts_group = []
+        for group in groups:
+            ops = np.nonzero(group[:nsym])[0]
+            perts = []
+            for iat in range(natom):
+                # All the directions are known if iat is the image of an atom treated before.
+                if np.any(indsym[ops, iat] < iat): continue
+                site_ops = ops[indsym[ops, iat] == iat]
+                perts.extend((iat + 1, idir) for idir in _irred_dirs(self.symrel[site_ops]))
+
+            if group[nsym]:
+                perts.extend((natom + 2, idir) for idir in _irred_dirs(self.symrec[ops]))
+
+            perts_group.append(np.array(perts, dtype=int).reshape(-1, 2))
+
+        return [perts_group[ig] for ig in np.ravel(inverse)]
 
 
 class LittleGroup(OpSequence):
@@ -1070,19 +1381,13 @@ class Irrep(object):
         self.name = name
         self._mats = np.reshape(np.array(mats), (-1, dim, dim))
 
-        self.traces = [m.trace() for m in self.mats]
+        self.traces = np.trace(self._mats, axis1=1, axis2=2)
 
         self.class_range = class_range
         self.nclass = len(class_range)
-        
-        # Compute character table.
-        character = self.nclass * [None]
-        for icls, (start, stop) in enumerate(self.class_range):
-            t0 = self.traces[start]
-            isok = all(t0 == self.traces[i] for i in range(start, stop))
-            character[icls] = t0
 
-        self._character = character
+        # Character table: trace of the first element of each class.
+        self._character = self.traces[[start for (start, _) in class_range]]
 
     @property
     def mats(self):
@@ -1093,19 +1398,77 @@ class Irrep(object):
         return self._character
 
 
+# Class mappings computed by BilbaoPointGroup.find_class_mappings.
+_CLASS_MAPPINGS = {}
+
+# Packed version of the irreps database (see pack_irrepsdb) and BilbaoPointGroup objects built so far.
+_IRREPSDB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "irrepsdb.npz")
+_BILBAO_PTGROUPS = {}
+
+
 def bilbao_ptgroup(sch_symbol):
     """
     Returns an instance of :class:`BilbaoPointGroup` from a string with the point group symbol
-    or a number with the spacegroup ID.
+    or a number with the spacegroup ID. Objects are memoized, the data of the point group
+    is read from the packed database only the first time the group is requested.
     """
     sch_symbol = any2sch(sch_symbol)
+    if sch_symbol in _BILBAO_PTGROUPS:
+        return _BILBAO_PTGROUPS[sch_symbol]
 
-    from abipy.core.irrepsdb import _PTG_IRREPS_DB
-    entry = _PTG_IRREPS_DB[sch_symbol].copy()
-    entry.pop("nclass")
+    entry = _read_irrepsdb_entry(sch_symbol)
     entry["sch_symbol"] = sch_symbol
+    ptg = _BILBAO_PTGROUPS[sch_symbol] = BilbaoPointGroup(**entry)
+
+    return ptg
+
+
+def _read_irrepsdb_entry(sch_symbol, filepath=_IRREPSDB_PATH):
+    """
+    Read the entry of point group sch_symbol from the packed database.
+    Returns a dictionary with the arguments of :class:`BilbaoPointGroup` (but sch_symbol).
+    Only the arrays of the given point group are loaded from the archive.
+    """
+    prefix = sch_symbol + "."
+    with np.load(filepath) as npz:
+        rotations = npz[prefix + "rotations"].astype(int)
+        class_range = [tuple(r) for r in npz[prefix + "class_range"].tolist()]
+        class_names = npz[prefix + "class_names"].tolist()
+        irrep_names = npz[prefix + "irrep_names"].tolist()
+        irrep_dims = npz[prefix + "irrep_dims"].tolist()
+        matrices = npz[prefix + "matrices"]
+
+    # Matrices of all the irreps are stored in a single complex array.
+    nrots, irreps, start = len(rotations), collections.OrderedDict(), 0
+    for name, dim in zip(irrep_names, irrep_dims):
+        stop = start + nrots * dim * dim
+        mats = matrices[start:stop].reshape(nrots, dim, dim)
+        if not np.any(mats.imag): mats = mats.real
+        irreps[name] = dict(dim=dim, matrices=mats)
+        start = stop
+
+    return dict(rotations=rotations, class_names=class_names, class_range=class_range, irreps=irreps)
+
+
+def pack_irrepsdb(filepath=_IRREPSDB_PATH):
+    """
+    Write the packed version of the irreps database (abipy.core.irrepsdb) in the NumPy archive filepath.
+    Must be called when the python dictionary is changed.
+    """
+    from abipy.core.irrepsdb import _PTG_IRREPS_DB
+    arrays = {}
+    for sch_symbol, entry in _PTG_IRREPS_DB.items():
+        prefix = sch_symbol + "."
+        irreps = entry["irreps"]
+        arrays[prefix + "rotations"] = np.array(entry["rotations"], dtype=np.int8)
+        arrays[prefix + "class_range"] = np.array(entry["class_range"], dtype=np.int8)
+        arrays[prefix + "class_names"] = np.array(entry["class_names"])
+        arrays[prefix + "irrep_names"] = np.array(list(irreps.keys()))
+        arrays[prefix + "irrep_dims"] = np.array([d["dim"] for d in irreps.values()], dtype=np.int8)
+        arrays[prefix + "matrices"] = np.concatenate(
+            [np.ravel(np.array(d["matrices"], dtype=complex)) for d in irreps.values()])
 
-    return BilbaoPointGroup(**entry)
+    np.savez_compressed(filepath, **arrays)
 
 
 class BilbaoPointGroup(object):
@@ -1134,6 +1497,9 @@ class BilbaoPointGroup(object):
             self.irreps.append(irrep)
             self.irreps_by_name[name] = irrep
 
+        # (num_irreps, nclass) array with the characters.
+        self.character_array = np.array([irrep.character for irrep in self.irreps], dtype=complex)
+
     @property
     def herm_symbol(self):
         """Hermann-Mauguin symbol."""
@@ -1159,6 +1525,112 @@ class BilbaoPointGroup(object):
         """List with the names of the irreps."""
         return list(self.irreps_by_name.keys())
 
+    @property
+    def irrep_dims(self):
+        """List with the dimensions of the irreps."""
+        return [irrep.mats.shape[1] for irrep in self.irreps]
+
+    @property
+    def class_invariants(self):
+        """(nclass, 3) integer array with determinant, trace and size of each class."""
+        try:
+            return self._class_invariants
+
+        except AttributeError:
+            self._class_invariants = _class_invariants(self.rotations, self._class_inds())
+            return self._class_invariants
+
+    @property
+    def class_constants(self):
+        """(nclass, nclass, nclass) array with the class multiplication constants."""
+        try:
+            return self._class_constants
+
+        except AttributeError:
+            nrots = self.num_rots
+            mtable = _mult_table(self.rotations, np.zeros((nrots, 3)), np.ones((nrots, 2), dtype=int))
+            self._class_constants = _class_constants(mtable, self._class_inds())
+            return self._class_constants
+
+    def _class_inds(self):
+        return [list(range(start, stop)) for (start, stop) in self.class_range]
+
+    def find_class_mappings(self, kgroup):
+        """
+        Find the correspondence between the classes of the point group kgroup and the classes
+        in the Bilbao table. Classes are first matched by their invariants (determinant, trace, size).
+        Classes with the same invariants are disambiguated by requiring the same class multiplication
+        constants. Results are cached.
+
+        Args:
+            kgroup: :class:`LatticePointGroup` isomorphic to self.
+
+        Returns:
+            List of integer arrays. Each array gives, for each Bilbao class, the index of the class in kgroup.
+            More than one mapping is returned if the classes cannot be distinguished
+            (e.g. the two mirror classes of C2v).
+
+        Raises:
+            ValueError if the classes cannot be mapped.
+        """
+        rots = np.reshape([np.asarray(op.mat) for op in kgroup], (-1, 3, 3))
+        key = (self.sch_symbol, rots.astype(np.int64).tobytes())
+        if key in _CLASS_MAPPINGS:
+            return _CLASS_MAPPINGS[key]
+
+        class_indices = kgroup.class_indices
+        if len(class_indices) != self.nclass:
+            raise ValueError("Found %d classes while the Bilbao table of %s has %d classes" % (
+                len(class_indices), self.sch_symbol, self.nclass))
+
+        my_invs, ref_invs = _class_invariants(rots, class_indices), self.class_invariants
+
+        # Group the classes with the same invariants.
+        blocks = []
+        for inv in np.unique(ref_invs, axis=0):
+            ref_cls = np.nonzero(np.all(ref_invs == inv, axis=1))[0]
+            my_cls = np.nonzero(np.all(my_invs == inv, axis=1))[0]
+            if len(ref_cls) != len(my_cls):
+                raise ValueError("Class invariants of %s do not match the Bilbao table" % self.sch_symbol)
+            blocks.append((ref_cls, my_cls))
+
+        # Try the permutations inside each block and keep the ones preserving the class constants.
+        my_consts = _class_constants(kgroup.mult_table, class_indices)
+        mappings = []
+        for perms in itertools.product(*[itertools.permutations(my_cls) for (_, my_cls) in blocks]):
+            mapping = np.empty(self.nclass, dtype=int)
+            for (ref_cls, _), perm in zip(blocks, perms):
+                mapping[ref_cls] = perm
+            if np.array_equal(my_consts[np.ix_(mapping, mapping, mapping)], self.class_constants):
+                mappings.append(mapping)
+
+        if not mappings:
+            raise ValueError("Cannot map the classes onto the Bilbao table of %s" % self.sch_symbol)
+
+        if len(_CLASS_MAPPINGS) >= _GROUP_TABLES_MAXSIZE: _CLASS_MAPPINGS.clear()
+        _CLASS_MAPPINGS[key] = mappings
+        return mappings
+
+    def decompose_character(self, character, mapping=None):
+        """
+        Decompose a (possibly reducible) character with the orthogonality relations:
+
+            n_i = 1/h sum_c n_c conj(chi_i(c)) chi(c)
+
+        Args:
+            character: Array with the character of the representation. The last axis runs over the classes.
+            mapping: Index of each Bilbao class in the last axis of character (see :meth:`find_class_mappings`).
+                None if character is already ordered as in the Bilbao table.
+
+        Returns:
+            Array with the (real) multiplicity of each irrep in self.irreps. The last axis runs over the irreps.
+        """
+        character = np.asarray(character)
+        if mapping is not None: character = character[..., mapping]
+        mults = np.dot(character * self.class_len, self.character_array.conj().T) / self.num_rots
+
+        return mults.real
+
     @property
     def character_table(self):
         """Return a table of strings with the character of the irreps."""
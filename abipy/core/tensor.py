@@ -7,8 +7,8 @@ from __future__ import print_function, division, unicode_literals
 import itertools
 import numpy as np
 
-from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 from abipy.core import Structure
+from abipy.core.symmetries import SpaceGroup
 
 
 __all__ = [
@@ -23,6 +23,107 @@ def from_cart_to_red(cartesian_tensor,lattice):
     return red_tensor
 
 
+def directions_design_matrix(qpoints, lattice):
+    """
+    Return the (nq, 6) matrix relating the 6 independent components of a symmetric tensor
+    in reduced coordinates to the values (q^T E q)/(q^T q) along the directions qpoints.
+    """
+    qpoints = np.reshape(qpoints, (-1, 3))
+    mat = lattice.matrix
+    metric = np.dot(np.transpose(mat), mat)
+
+    metq = np.dot(qpoints, metric)
+    norms = np.einsum("qi,qi->q", metq, qpoints)
+    coeffs = np.column_stack([metq[:,0]**2, metq[:,1]**2, metq[:,2]**2,
+                              2*metq[:,0]*metq[:,1], 2*metq[:,0]*metq[:,2], 2*metq[:,1]*metq[:,2]])
+
+    return coeffs / norms[:, None]
+
+
+def red_tensors_from_directions(qpoints, values, lattice):
+    """
+    Build the symmetric tensors in reduced coordinates from the values computed along 6 directions.
+    The linear systems for all the sets of values are solved at once with the same design matrix.
+
+    Args:
+        qpoints: fractional coordinates of 6 independent q-directions
+        values: (6, ...) array with the values of (q^T E q)/(q^T q) along the 6 qpoints
+        lattice: `Lattice` object defining the reference system
+
+    Returns:
+        (..., 3, 3) array.
+    """
+    values = np.asarray(values)
+    assert len(qpoints) == 6 and len(values) == len(qpoints)
+
+    red_symm = np.linalg.solve(directions_design_matrix(qpoints, lattice), values.reshape(6, -1))
+    tensors = red_symm[[[0, 3, 4], [3, 1, 5], [4, 5, 2]]]
+
+    return np.moveaxis(tensors, -1, 0).reshape(values.shape[1:] + (3, 3))
+
+
+def symmetrize_cartesian_tensors(tensors, rotations, rank=2):
+    """
+    Symmetrize the cartesian tensors of rank `rank` (shape (..., 3, ..., 3)) with the rotations (nsym, 3, 3):
+
+        T_sym[i1..ir] = 1/nsym sum_S S[j1,i1] ... S[jr,ir] T[j1..jr]
+
+    i.e. S^T T S for rank 2. The rotations are first combined in a (3,) * 2 * rank operator
+    so that the cost does not depend on the number of symmetries.
+    """
+    rotations = np.asarray(rotations, dtype=float)
+    symop = rotations
+    for r in range(1, rank):
+        symop = np.einsum("s...,sji->s...ji", symop, rotations)
+    symop = symop.sum(axis=0) / len(rotations)
+
+    return np.tensordot(tensors, symop, axes=(list(range(-rank, 0)), list(range(0, 2 * rank, 2))))
+
+
+def symmetrize_site_tensors(tensors, rotations, indsym, rank=2):
+    """
+    Symmetrize tensors associated to the atoms (e.g. Born effective charges) taking into account
+    the permutation of the atoms induced by the symmetry operations:
+
+        T_sym[iat] = 1/nsym sum_S S^T T[S(iat)] S    (rank 2)
+
+    All the operations and all the atoms are treated in a single einsum.
+
+    Args:
+        tensors: (..., natom, 3, ..., 3) array with the cartesian tensors.
+        rotations: (nsym, 3, 3) array with the cartesian rotations.
+        indsym: (nsym, natom) array. indsym[isym, iat] is the image of atom iat (see SpaceGroup.map_atoms).
+        rank: Rank of the tensors.
+    """
+    rotations = np.asarray(rotations, dtype=float)
+    images = np.take(tensors, indsym, axis=-rank - 1)
+    ins, outs = "abc"[:rank], "xyz"[:rank]
+    subscripts = ",".join("s" + j + i for j, i in zip(ins, outs)) + ",...sn%s->...n%s" % (ins, outs)
+
+    return np.einsum(subscripts, *((rotations,) * rank + (images,))) / len(rotations)
+
+
+def cartesian_rotations(symrel, lattice):
+    """
+    Convert the rotations symrel (nsym, 3, 3) given in reduced coordinates to cartesian coordinates.
+    lattice is the real-space `Lattice`.
+    """
+    mat = lattice.matrix
+    return np.matmul(np.matmul(mat.T, symrel), lattice.inv_matrix.T)
+
+
+def structure_symmetries(structure):
+    """
+    Return the :class:`SpaceGroup` of the structure (computed with spglib if not available)
+    and the (nsym, 3, 3) array with the cartesian rotations of its FM operations.
+    """
+    spacegroup = getattr(structure, "spacegroup", None)
+    if spacegroup is None: spacegroup = SpaceGroup.from_structure(structure)
+
+    symrel = spacegroup.symrel[spacegroup.symafm == 1]
+    return spacegroup, cartesian_rotations(symrel, structure.lattice)
+
+
 class Tensor(object):
     """Representation of a 3x3 tensor"""
     def __init__(self, red_tensor, lattice, space="r"):
@@ -100,29 +201,9 @@ class Tensor(object):
         return cls(red_tensor, lattice,space)
 
     def symmetrize(self, structure):
-        tensor = self._reduced_tensor
-
-        if self._is_real_space:
-            real_lattice = self._lattice
-        else:
-            real_lattice = self._lattice.reciprocal_lattice
-
-        real_finder = SpacegroupAnalyzer(structure)
-
-        real_symmops = real_finder.get_point_group_operations(cartesian=True)
-
-        cartesian_tensor = self.cartesian_tensor
-
-        sym_tensor = np.zeros((3,3))
-
-        my_tensor = cartesian_tensor
-
-        for real_sym in real_symmops:
-             mat = real_sym.rotation_matrix
-             prod_sym = np.dot(np.transpose(mat),np.dot(cartesian_tensor,mat))
-             sym_tensor = sym_tensor + prod_sym
-
-        sym_tensor = sym_tensor/len(real_symmops)
+        """Symmetrize the tensor with the point group of the structure."""
+        _, rotations = structure_symmetries(structure)
+        sym_tensor = symmetrize_cartesian_tensors(self.cartesian_tensor, rotations)
 
         self._reduced_tensor = from_cart_to_red(sym_tensor,self._lattice)
 
@@ -141,27 +222,6 @@ class SymmetricTensor(Tensor):
             space: "r" if the lattice is a real space lattice
                    "g" if the lattice is a reciprocal space lattice
         """
-        assert len(qpoints) == 6 and len(values) == len(qpoints)
-
-        mat = lattice.matrix
-        metric = np.dot(np.transpose(mat),mat)
-
-        coeffs_red = np.zeros((6,6))
-
-        for (iqpt,qpt) in enumerate(qpoints):
-            metqpt = np.dot(metric,qpt)
-
-            coeffs_red[iqpt,:] = [metqpt[0]**2,metqpt[1]**2,metqpt[2]**2,
-                                  2*metqpt[0]*metqpt[1],2*metqpt[0]*metqpt[2],2*metqpt[1]*metqpt[2]]
-
-            normqpt_red = np.dot(np.transpose(qpt),np.dot(metric,qpt))
-
-            coeffs_red[iqpt,:] = coeffs_red[iqpt,:] / normqpt_red
-
-        red_symm = np.linalg.solve(coeffs_red,values)
-
-        red_tensor = [[red_symm[0],red_symm[3],red_symm[4]],
-                      [red_symm[3],red_symm[1],red_symm[5]],
-                      [red_symm[4],red_symm[5],red_symm[2]]]
+        red_tensor = red_tensors_from_directions(qpoints, values, lattice)
 
         return cls(red_tensor, lattice, space)
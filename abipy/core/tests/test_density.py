@@ -2,6 +2,7 @@
 """Tests for core.density module"""
 from __future__ import print_function, division
 
+import numpy as np
 import abipy.data as abidata 
 
 from abipy.core import Density
@@ -35,6 +36,16 @@ class TestDensity(AbipyTest):
             self.assert_almost_equal(nelect_calc, nelect_file)
             self.assert_almost_equal(rhog_tot[0,0,0] * structure.volume, nelect_file)
 
+            # Symmetrization in G-space removes the noise and preserves the number of electrons.
+            noisy = Density(den.nspinor, den.nsppol, den.nspden, den.datar + 1e-4 * np.random.rand(*den.datar.shape),
+                            structure)
+            symden = noisy.symmetrize(space="g")
+            assert isinstance(symden, Density)
+            self.assert_almost_equal(den.symmetrize(space="g").datar, den.datar)
+            self.assert_almost_equal(symden.get_nelect().sum(), noisy.get_nelect().sum())
+            self.assert_almost_equal(symden.symmetrize(space="g").datar, symden.datar)
+            assert np.abs(symden.datar - den.datar).max() < np.abs(noisy.datar - den.datar).max()
+
             if self.which("xcrysden") is not None:
                 # Export data in xsf format.
                 visu = den.export(".xsf")
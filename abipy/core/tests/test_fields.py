@@ -5,6 +5,7 @@ from __future__ import print_function, division
 import numpy as np
 import abipy.data as data 
 
+from abipy.core import Structure
 from abipy.core.fields import *
 from abipy.core.testing import *
 
@@ -27,6 +28,26 @@ class TestScalarField(AbipyTest):
         print(field)
         atrue(field.is_collinear)
 
+        # Symmetrization in real space on a mesh compatible with the fractional translations.
+        den_structure = Structure.from_file(data.ref_file("si_DEN-etsf.nc"))
+        spgrp = den_structure.spacegroup
+        field = ScalarField(1, 1, 1, np.random.rand(1, 12, 12, 12), den_structure)
+        symr = field.symmetrize(space="r")
+        self.assert_almost_equal(symr.symmetrize(space="r").datar, symr.datar)
+
+        # f(R r + t) == f(r) for all the operations.
+        table = symr.mesh.rotation_table(spgrp.rot_r, spgrp.tau, space="r")
+        flat = symr.datar.reshape(-1)
+        for irot in table:
+            self.assert_almost_equal(flat[irot], flat)
+
+        # 18 is not compatible with t = (1/4, 1/4, 1/4)
+        field = ScalarField(1, 1, 1, np.random.rand(1, 18, 18, 18), den_structure)
+        with self.assertRaises(ValueError):
+            field.symmetrize(space="r")
+        symg = field.symmetrize(space="g")
+        self.assert_almost_equal(symg.symmetrize(space="g").datar, symg.datar)
+
         #aequal(field.datar.ndim, 2)
         #aequal(field.datar_xyz.ndim, 4)
         #aequal(field.datar_xyz.shape[-3:], xyz_shape)
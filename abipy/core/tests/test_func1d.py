@@ -85,6 +85,79 @@ class TestFunction1D(AbipyTest):
         self.assert_almost_equal(same_sinf.values, sinf.values)
         self.assert_almost_equal(same_sinf.mesh, sinf.mesh)
 
+    def test_kramers_kronig(self):
+        """Test Kramers-Kronig transforms and f-sum rule."""
+        # Lorentz oscillator.
+        wp, w0, gamma = 10., 5., 0.5
+        mesh = np.linspace(0, 40, 4001)
+        eps = Function1D(mesh, 1 + wp**2 / (w0**2 - mesh**2 - 1j * gamma * mesh))
+
+        half = len(mesh) // 2
+        eps_kk = eps.kramers_kronig(part="imag")
+        self.assert_almost_equal(eps_kk.values[:half], eps.values[:half], decimal=2)
+        self.assert_almost_equal(eps_kk.imag.values, eps.imag.values)
+        eps_kk = eps.kramers_kronig(part="real")
+        self.assert_almost_equal(eps_kk.values[:half], eps.values[:half], decimal=2)
+
+        # Batched version.
+        batch = kramers_kronig(mesh, np.array([eps.values, 2 * eps.values]), const=0.0)
+        self.assert_almost_equal(batch[1], 2 * batch[0])
+
+        with self.assertRaises(ValueError):
+            kramers_kronig(mesh ** 2, eps.values)
+
+        # f-sum rule: int_0^inf w Im eps(w) dw = pi/2 wp^2
+        self.assertAlmostEqual(eps.fsum().values[-1] / (np.pi / 2 * wp**2), 1, places=1)
+        neff = eps.effective_electrons(volume=2 * np.pi ** 2)
+        self.assert_almost_equal(neff.values, eps.fsum().values)
+
+
+class TestFunction1DStack(AbipyTest):
+    """Test Function1DStack."""
+
+    def test_stack(self):
+        """Arithmetic, integration and interpolation with Function1DStack."""
+        mesh = np.linspace(0, 2*np.pi, 500)
+        sinf, cosf = Function1D.from_func(np.sin, mesh), Function1D.from_func(np.cos, mesh)
+        stack = Function1DStack.from_funcs([sinf, cosf])
+        assert len(stack) == 2 and stack[1] == cosf
+        assert list(stack)[0] == sinf
+        assert stack[:1] == Function1DStack(mesh, [sinf.values])
+
+        self.assertTrue(stack * 2 == Function1DStack(mesh, 2 * stack.values))
+        self.assertTrue(stack - cosf == Function1DStack(mesh, [sinf.values - cosf.values, np.zeros(500)]))
+        self.assert_almost_equal((stack * [1, 2]).values[1], 2 * cosf.values)
+        self.assertTrue(1 - stack**2 == Function1DStack.from_funcs([cosf**2, sinf**2]))
+
+        self.assert_almost_equal(stack.integral()[1].values, sinf.values, decimal=5)
+        self.assert_almost_equal(stack.integrate(), [0, 0])
+        self.assert_almost_equal(stack.l1_norms, [sinf.l1_norm, cosf.l1_norm])
+
+        # Resampling and splines.
+        new_mesh = np.linspace(0, 2*np.pi, 333)
+        self.assert_almost_equal(stack.spline_on_mesh(new_mesh)[0].values, np.sin(new_mesh), decimal=6)
+        self.assert_almost_equal(stack.resample(new_mesh).values[1], np.cos(new_mesh), decimal=4)
+
+        # Functions on different meshes are interpolated on a common mesh.
+        other = Function1D.from_func(np.sin, np.linspace(0, np.pi, 100))
+        merged = Function1DStack.from_funcs([sinf, other])
+        assert merged.mesh[-1] == mesh[-1] and np.all(merged.values[1][merged.mesh > np.pi] == 0)
+
+    def test_convolve(self):
+        """Gaussian and Lorentzian convolutions."""
+        mesh = np.linspace(-10, 10, 2001)
+        delta = np.zeros(len(mesh))
+        delta[1000] = 1 / (mesh[1] - mesh[0])
+        stack = Function1DStack(mesh, [delta, 2 * delta])
+
+        gauss = stack.gauss_convolve(0.5)
+        ref = np.exp(-0.5 * (mesh / 0.5)**2) / (0.5 * np.sqrt(2 * np.pi))
+        self.assert_almost_equal(gauss.values, [ref, 2 * ref])
+        self.assert_almost_equal(Function1D(mesh, delta).gauss_convolve(0.5).values, ref)
+
+        lorentz = stack.lorentz_convolve(0.2)
+        self.assert_almost_equal(lorentz.values[0], 0.2 / np.pi / (mesh**2 + 0.2**2))
+
 
 if __name__ == "__main__": 
     import unittest
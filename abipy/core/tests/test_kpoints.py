@@ -9,7 +9,7 @@ import abipy.data as data
 
 from pymatgen.core.lattice import Lattice
 from abipy.core.kpoints import (wrap_to_ws, wrap_to_bz, Kpoint, KpointList, KpointsReader, 
-                                as_kpoints, rc_list, kmesh_from_mpdivs,)
+                                as_kpoints, rc_list, kmesh_from_mpdivs, ibz_from_kmesh)
 from abipy.core.testing import *
 
 class TestWrapWS(AbipyTest):
@@ -237,6 +237,26 @@ class KmeshTest(AbipyTest):
         rc = rc_list(mp=3, sh=0.5, pbc=True, order="bz")
         self.assert_almost_equal(rc, [-0.5, -0.16666667,  0.16666667,  0.5])
 
+    def test_ibz_from_kmesh(self):
+        """Testing the python version of the IBZ."""
+        from abipy.core.structure import Structure
+        symrec = Structure.from_file(data.ref_file("si_scf_WFK-etsf.nc")).spacegroup.symrec
+
+        points, weights = ibz_from_kmesh((2, 2, 2), (0, 0, 0), symrec)
+        self.assert_almost_equal(points, [[0, 0, 0], [0.5, 0, 0], [0.5, 0.5, 0]])
+        self.assert_almost_equal(weights, [0.125, 0.5, 0.375])
+
+        # Number of points for the different values of kptopt.
+        fcc_shifts = [[0.5, 0.5, 0.5], [0.5, 0.0, 0.0], [0.0, 0.5, 0.0], [0.0, 0.0, 0.5]]
+        for kptopt, nkibz in [(1, 10), (2, 128), (3, 256), (4, 10)]:
+            points, weights = ibz_from_kmesh((4, 4, 4), fcc_shifts, symrec, kptopt=kptopt)
+            self.assertEqual(len(points), nkibz)
+            self.assertAlmostEqual(weights.sum(), 1.0)
+            assert np.all(points > -0.5) and np.all(points <= 0.5)
+
+        with self.assertRaises(ValueError):
+            ibz_from_kmesh((4, 4, 4), (0, 0, 0), symrec, kptopt=0)
+
     def test_unshifted_kmesh(self):
         """Testing the generation of unshifted kmeshes."""
         mpdivs, shifts = [1,2,3], [0,0,0]
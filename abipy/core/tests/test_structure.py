@@ -1,8 +1,12 @@
 """Tests for structure module"""
 from __future__ import print_function, division
 
-import numpy as np
+import os
 import sys
+import shutil
+import tempfile
+import itertools
+import numpy as np
 import abipy.data as data
 
 from abipy.core.structure import *
@@ -28,6 +32,12 @@ class TestStructure(AbipyTest):
             # Call pymatgen machinery to get the high-symmetry stars.
             print(structure.hsym_stars)
 
+            # All the points of a star get the same name.
+            for star in structure.hsym_stars:
+                name = structure.findname_in_hsym_stars(star.base_point)
+                assert name is not None
+                assert structure.findnames_in_hsym_stars(star) == len(star) * [name]
+
             if self.which("xcrysden") is not None:
                 # Export data in Xcrysden format.
                 structure.export(".xsf")
@@ -81,6 +91,79 @@ class TestStructure(AbipyTest):
 
         # We should add some checks here
 
+    def test_iter_frozen_phonons(self):
+        """Testing batch generation of frozen-phonon supercells."""
+        rprimd = np.array([[0.5,0.5,0],[0.5,0,0.5],[0,0.5,0.5]]) * 10.60 * 0.529
+        structure = Structure(Lattice(rprimd), ["Ga", "As"], [[0, 0, 0], [0.25, 0.25, 0.25]])
+        qpoint = [1/2, 1/2, 1/2]
+        displ_list = 0.01 * np.array([[[1,1,1], [-1,-1,-1]], [[1,0,0], [0,1,0]]])
+        etas = [0.5, 1.0]
+
+        results = list(structure.iter_frozen_phonons(qpoint, displ_list, etas, frac_coords=False, max_supercell=[2,2,2]))
+        assert len(results) == 4
+
+        # Compare with frozen_phonon.
+        for imode, eta, new_structure in results:
+            ref = structure.copy()
+            ref.frozen_phonon(qpoint, eta * displ_list[imode], frac_coords=False, max_supercell=[2,2,2])
+            assert len(new_structure) == len(ref) == 4
+            self.assert_almost_equal(new_structure.frac_coords, ref.frac_coords)
+
+        # Independent check with scale_matrix = 2 * I: the site of atom a in the cell t is at
+        # a + t + eta * Re(d_a exp(2 pi i q.t)) i.e. at (a + t + eta * Re(d_a exp(2 pi i q.t))) / 2 in the supercell.
+        displ = 0.01 * np.array([[1, 0, 0], [0, 1, 0]])
+        eta = 0.5
+        results = list(structure.iter_frozen_phonons(qpoint, [displ], [eta], scale_matrix=2 * np.eye(3, dtype=int)))
+        assert len(results) == 1
+        new_structure = results[0][2]
+        assert len(new_structure) == 16
+        for iat, site in enumerate(structure):
+            for t in itertools.product(range(2), repeat=3):
+                expected = (site.frac_coords + t + eta * displ[iat] * np.cos(2 * np.pi * np.dot(qpoint, t))) / 2
+                diff = new_structure.frac_coords - expected
+                diff -= np.round(diff)
+                assert np.any(np.all(np.abs(diff) < 1e-8, axis=1))
+                assert new_structure[np.argmin(np.abs(diff).sum(axis=1))].specie == site.specie
+
+        dirpath = tempfile.mkdtemp()
+        try:
+            paths = structure.write_frozen_phonons(dirpath, [qpoint], [displ_list], etas, frac_coords=False,
+                                                   max_supercell=[2,2,2])
+            assert len(paths) == 4 and all(os.path.exists(p) for p in paths)
+            with open(paths[0]) as fh:
+                assert "xred" in fh.read()
+
+            # Read back one structure and compare with iter_frozen_phonons.
+            paths = structure.write_frozen_phonons(dirpath, [qpoint], [displ_list], etas, frac_coords=False,
+                                                   scale_matrix=2 * np.eye(3, dtype=int), fmt="cif")
+            imode, eta, ref = next(structure.iter_frozen_phonons(qpoint, displ_list, etas, frac_coords=False,
+                                                                 scale_matrix=2 * np.eye(3, dtype=int)))
+            new_structure = Structure.from_file(paths[0], primitive=False)
+            assert len(new_structure) == len(ref) == 16
+            self.assert_almost_equal(new_structure.volume, ref.volume, decimal=3)
+            for fcoords in ref.frac_coords:
+                diff = new_structure.frac_coords - fcoords
+                diff -= np.round(diff)
+                assert np.any(np.all(np.abs(diff) < 1e-5, axis=1))
+        finally:
+            shutil.rmtree(dirpath)
+
+    def test_smallest_supercell(self):
+        """Testing get_smallest_supercell."""
+        rprimd = np.array([[0.5,0.5,0],[0.5,0,0.5],[0,0.5,0.5]]) * 10.60 * 0.529
+        structure = Structure(Lattice(rprimd), ["Ga", "As"], [[0, 0, 0], [0.25, 0.25, 0.25]])
+
+        self.assert_equal(structure.get_smallest_supercell([0, 0, 0], max_supercell=[4,4,4]), np.eye(3))
+        self.assert_equal(structure.get_smallest_supercell([1/2, 1/2, 1/2], max_supercell=[4,4,4]),
+                          [[-1, 0, 1], [-1, 1, 0], [-1, -1, 0]])
+        self.assert_equal(structure.get_smallest_supercell([1/2, 0, 0], max_supercell=[4,4,4]),
+                          [[0, -1, 0], [0, -1, 1], [-2, 0, 1]])
+        self.assert_equal(structure.get_smallest_supercell([1/4, 0, 1/4], max_supercell=[4,4,4]),
+                          [[-1, 0, 1], [0, -1, 0], [2, -2, 2]])
+
+        with self.assertRaises(ValueError):
+            structure.get_smallest_supercell([1/4, 0, 0], max_supercell=[1,1,1])
+
 
 if __name__ == "__main__":
     import unittest
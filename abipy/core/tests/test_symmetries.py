@@ -5,6 +5,7 @@ import numpy as np
 import abipy.data as abidata
 
 from abipy.core import Structure
+from abipy.core.kpoints import Kpoint
 from abipy.core.symmetries import *
 from abipy.core.testing import *
 from abipy.abilab import abiopen
@@ -45,6 +46,13 @@ class TestSymmetries(AbipyTest):
         self.assertTrue(spgrp.num_spatial_symmetries == 48)
 
         self.assertTrue(spgrp.is_group())
+
+        # Multiplication table and classes from the integer encoding of the operations.
+        mtable = spgrp.mult_table
+        for i, j in [(0, 1), (5, 17), (50, 95)]:
+            self.assertTrue(spgrp[mtable[i, j]] == spgrp[i] * spgrp[j])
+        self.assertEqual(spgrp.num_classes, 20)
+        self.assertTrue(mtable is spgrp.mult_table)
         # TODO
         #si_symrel = 
         si_tnons = np.reshape(24 * [0, 0, 0, 0.25, 0.25, 0.25], (48, 3))
@@ -82,6 +90,43 @@ class TestSymmetries(AbipyTest):
 
                 self.assertFalse(err_msg)
 
+        # Stacked arrays and vectorized rotations.
+        assert spgrp.rot_g.shape == (len(spgrp), 3, 3) and len(spgrp.time_signs) == len(spgrp)
+        kpts = np.array([[0, 0, 0], [0.5, 0, 0], [0.1, 0.2, 0.3]])
+        gvecs = np.array([[1, 0, 0], [1, 2, -3]])
+        sks, sgs = spgrp.rotate_k_all(kpts), spgrp.rotate_gvecs_all(gvecs)
+        for isym, symop in enumerate(spgrp):
+            self.assert_equal(spgrp.rot_r[isym], symop.rot_r)
+            self.assert_almost_equal(sks[isym], [symop.rotate_k(k) for k in kpts])
+            self.assert_equal(sgs[isym], symop.rotate_gvecs(gvecs))
+
+        mask = spgrp.little_group_mask(kpts)
+        for ik, kpt in enumerate(kpts):
+            self.assert_equal(mask[ik], [symop.preserve_k(kpt, ret_g0=False) for symop in spgrp])
+        self.assertEqual(mask[0].sum(), len(spgrp))
+        self.assertEqual(len(spgrp.find_little_group(kpts[1])), mask[1].sum())
+
+        # Batched analysis of the k-points.
+        analysis = spgrp.analyze_kpoints(kpts)
+        self.assert_equal(analysis.star_sizes, [1, 4, 24])
+        self.assert_equal(analysis.mask, mask)
+        self.assertAlmostEqual(analysis.weights.sum(), 1)
+        for ik, kpt in enumerate(kpts):
+            star = Kpoint(kpt, structure.reciprocal_lattice).compute_star(structure.fm_symmops)
+            self.assertEqual(len(star), analysis.star_sizes[ik])
+            self.assert_equal(spgrp.analyze_kpoints(star.frac_coords).star_keys, len(star) * [analysis.star_keys[ik]])
+
+        # Atom mapping and irreducible perturbations.
+        indsym = spgrp.map_atoms(ucell_coords)
+        for isym, symop in enumerate(spgrp.symmops(time_sign=+1)):
+            for iat, site in enumerate(structure):
+                self.assert_almost_equal(symop.rotate_r(site.frac_coords, in_ucell=True), ucell_coords[indsym[isym, iat]])
+        perts_q = spgrp.find_irred_perts(ucell_coords, kpts, with_efield=True)
+        self.assert_equal(perts_q[0], [[1, 1], [4, 1]])
+        self.assert_equal(perts_q[1], [[1, 1]])
+        with self.assertRaises(ValueError):
+            spgrp.map_atoms(ucell_coords + 0.1)
+
         # Test little group.
         # TODO
         #ltg_symmops, g0vecs, isyms = spgrp.find_little_group(kpoint=[0,0,0])
@@ -91,6 +136,24 @@ class TestSymmetries(AbipyTest):
         #for o1, o2 in zip(ltg_symmops, spgrp):
         #    self.assertEqual(o1, o2)
 
+    def test_from_structure(self):
+        """Test SpaceGroup.from_structure and its cache."""
+        structure = Structure.from_file(abidata.cif_file("si.cif"))
+        spgrp = SpaceGroup.from_structure(structure)
+        self.assertEqual(spgrp.spgid, 227)
+        self.assertEqual(spgrp.num_spatial_symmetries, 48)
+        assert spgrp.symrel.shape == (48, 3, 3)
+
+        # The same structure read again gives the cached object.
+        assert SpaceGroup.from_structure(Structure.from_file(abidata.cif_file("si.cif"))) is spgrp
+        assert SpaceGroup.from_structure(structure, symprec=1e-3) is not spgrp
+        assert SpaceGroup.from_structure(structure, has_timerev=False) is not spgrp
+
+        # Displacing one atom breaks the symmetry.
+        other = structure.copy()
+        other.translate_sites([0], [0.01, 0, 0])
+        self.assertNotEqual(SpaceGroup.from_structure(other).spgid, 227)
+
 
 class LatticeRotationTest(AbipyTest):
     def test_base(self):
@@ -132,6 +195,37 @@ class BilbaoPointGroupTest(AbipyTest):
             #for irrep_name in ptg.irrep_names: ptg.show_irrep(irrep_name)
             self.assertTrue(ptg.auto_test() == 0)
 
+    def test_packed_database(self):
+        """Packed irreps database and memoized BilbaoPointGroup objects."""
+        from abipy.core.symmetries import bilbao_ptgroup
+        from abipy.core.irrepsdb import _PTG_IRREPS_DB
+        for sch_symbol, entry in _PTG_IRREPS_DB.items():
+            ptg = bilbao_ptgroup(sch_symbol)
+            assert bilbao_ptgroup(sch_symbol) is ptg
+            self.assert_equal(ptg.rotations, entry["rotations"])
+            self.assertEqual(ptg.class_names, entry["class_names"])
+            self.assertEqual(ptg.irrep_names, list(entry["irreps"].keys()))
+            for irrep, d in zip(ptg.irreps, entry["irreps"].values()):
+                self.assert_almost_equal(irrep.mats, np.reshape(d["matrices"], irrep.mats.shape))
+            self.assertEqual(ptg.character_array.shape, (ptg.num_irreps, ptg.nclass))
+
+    def test_class_mappings(self):
+        """Mapping classes onto the Bilbao tables and decomposition of characters."""
+        from abipy.core.symmetries import bilbao_ptgroup, sch_symbols, LatticePointGroup
+        for sch_symbol in sch_symbols:
+            ptg = bilbao_ptgroup(sch_symbol)
+            # Same group with the rotations in reversed order.
+            kgroup = LatticePointGroup(ptg.rotations[::-1])
+            mappings = ptg.find_class_mappings(kgroup)
+            assert mappings
+
+            # The characters of the irreps computed from kgroup are decomposed into single irreps.
+            for irrep in ptg.irreps:
+                traces = irrep.traces[::-1]
+                character = [np.mean([traces[i] for i in inds]) for inds in kgroup.class_indices]
+                mults = ptg.decompose_character(character, mappings[0])
+                self.assert_almost_equal(np.sort(mults), [0] * (ptg.num_irreps - 1) + [1], decimal=4)
+
 
 class LittleGroupTest(AbipyTest):
     def test_silicon_little_group(self):
@@ -8,6 +8,8 @@ from pymatgen.core.structure import Structure
 from pymatgen.core.lattice import Lattice
 from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 from abipy.core.tensor import *
+from abipy.core.tensor import (red_tensors_from_directions, symmetrize_cartesian_tensors, symmetrize_site_tensors,
+                               structure_symmetries)
 from abipy.core.testing import *
 
 class TestTensor(AbipyTest):
@@ -46,6 +48,51 @@ class TestTensor(AbipyTest):
 
         self.serialize_with_pickle(tensor)
 
+    def test_batched_tensors(self):
+        """Batched construction and symmetrization of tensors."""
+        lattice = Lattice.hexagonal(4,6)
+        structure = Structure(lattice, ["Ga", "As"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+        qpoints = [[1,0,0], [0,1,0], [0,0,1], [1,1,0], [1,0,1], [0,1,1]]
+        values = np.random.rand(6, 4)
+
+        red_tensors = red_tensors_from_directions(qpoints, values, lattice.reciprocal_lattice)
+        self.assertTrue(red_tensors.shape == (4, 3, 3))
+        for i in range(4):
+            tensor = SymmetricTensor.from_directions(qpoints, values[:,i], lattice.reciprocal_lattice, space="g")
+            self.assert_almost_equal(tensor.reduced_tensor, red_tensors[i])
+
+            # Compare with the symmetrization of a single tensor.
+            rotations = [op.rotation_matrix for op in
+                         SpacegroupAnalyzer(structure).get_point_group_operations(cartesian=True)]
+            sym_cart = symmetrize_cartesian_tensors(tensor.cartesian_tensor, rotations)
+            tensor.symmetrize(structure)
+            self.assert_almost_equal(tensor.cartesian_tensor, sym_cart)
+
+    def test_site_tensors(self):
+        """Symmetrization of stacks of rank-2 and rank-3 tensors."""
+        # Wurtzite structure (point group C6v).
+        lattice = Lattice.hexagonal(3.19, 5.19)
+        structure = Structure(lattice, ["Ga", "Ga", "N", "N"],
+                              [[1/3, 2/3, 0], [2/3, 1/3, 0.5], [1/3, 2/3, 0.377], [2/3, 1/3, 0.877]])
+        spacegroup, rotations = structure_symmetries(structure)
+        indsym = spacegroup.map_atoms(structure.frac_coords)
+
+        # Born effective charges for 5 different calculations.
+        becs = symmetrize_site_tensors(np.random.rand(5, 4, 3, 3), rotations, indsym)
+        self.assert_almost_equal(symmetrize_site_tensors(becs, rotations, indsym), becs)
+        for rot, images in zip(rotations, indsym):
+            self.assert_almost_equal(becs[:, images], np.einsum("ij,wnjk,lk->wnil", rot, becs, rot))
+        for bec in becs.reshape(-1, 3, 3):
+            self.assert_almost_equal(bec, np.diag([bec[0, 0], bec[0, 0], bec[2, 2]]))
+
+        # Piezoelectric tensor: only e_zxx = e_zyy, e_xxz = e_yyz and e_zzz are independent.
+        piezo = symmetrize_cartesian_tensors(np.random.rand(3, 3, 3), rotations, rank=3)
+        self.assert_almost_equal(symmetrize_cartesian_tensors(piezo, rotations, rank=3), piezo)
+        self.assertAlmostEqual(piezo[2, 0, 0], piezo[2, 1, 1])
+        self.assertAlmostEqual(piezo[0, 0, 2], piezo[1, 1, 2])
+        self.assert_almost_equal(piezo[0, 0, 0], 0)
+        self.assert_almost_equal(piezo[2, 0, 1], 0)
+
 
 if __name__ == "__main__":
     import unittest
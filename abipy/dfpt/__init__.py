@@ -1,3 +1,4 @@
 """This subpackage provides objects and functions for the analysis of DFPT calculatios."""
 from .phonons import *
 from .eph import *
+from .qha import *
@@ -10,13 +10,13 @@ import numpy as np
 from six.moves import map, zip, StringIO
 from monty.collections import AttrDict, dict2namedtuple
 from monty.functools import lazy_property
-from monty.dev import get_ncpus
 from pymatgen.io.abinitio.tasks import AnaddbTask
 from abipy.core.mixins import TextFile, Has_Structure
 from abipy.core.symmetries import SpaceGroup
 from abipy.core.structure import Structure
 from abipy.core.kpoints import KpointList
-from abipy.core.tensor import Tensor
+from abipy.core.tensor import Tensor, structure_symmetries, symmetrize_site_tensors
+from abipy.tools.parallel import map_parallel
 from abipy.iotools import ETSF_Reader
 from abipy.abio.inputs import AnaddbInput
 from abipy.dfpt.phonons import PhononDosPlotter
@@ -227,16 +227,10 @@ class DdbFile(TextFile, Has_Structure):
         points reported in the DDB file.
         """
         # Build the union of the stars of the q-points.
-        all_qpoints = np.empty((len(self.qpoints) * len(self.structure.spacegroup), 3))
-        count = 0
-        for qpoint in self.qpoints:
-            for op in self.structure.spacegroup:
-                all_qpoints[count] = op.rotate_k(qpoint.frac_coords, wrap_tows=False)
-                count += 1
+        all_qpoints = self.structure.spacegroup.rotate_k_all(self.qpoints.frac_coords).reshape(-1, 3)
 
         # Replace zeros with np.inf
-        for q in all_qpoints: 
-            q[q == 0] = np.inf
+        all_qpoints[all_qpoints == 0] = np.inf
 
         # Compute the minimum of the fractional coordinates along the 3 directions and invert
         #print(all_qpoints)
@@ -245,7 +239,7 @@ class DdbFile(TextFile, Has_Structure):
         ngqpt = np.rint(1 / smalls)
         ngqpt[ngqpt == 0] = 1
 
-        return np.array(ngqpt, dtype=np.int)
+        return np.array(ngqpt, dtype=int)
 
     @property
     def params(self):
@@ -375,58 +369,23 @@ class DdbFile(TextFile, Has_Structure):
                 phdoses: List of :class:`PhononDos` objects
                 plotter: :class:`PhononDosPlotter` object. Use plotter.plot() to visualize the results.
         """
-        num_cpus = get_ncpus() if num_cpus is None else num_cpus
-        if num_cpus <= 0: num_cpus = 1
-        num_cpus = min(num_cpus, len(nqsmalls))
-
         # TODO: anaget_phdos
         def do_work(nqsmall):
             _, phdos_file = self.anaget_phbst_and_phdos_files(
                 nqsmall=nqsmall, ndivsm=1, asr=asr, chneut=chneut, dipdip=dipdip, dos_method=dos_method, ngqpt=ngqpt)
-            return phdos_file.phdos                                                                                          
+            return phdos_file.phdos
 
-        if num_cpus == 1:
-            # Sequential version
-            phdoses = [do_work(nqs) for nqs in nqsmalls]
+        phdoses = map_parallel(do_work, list(nqsmalls), num_cpus=num_cpus, threads=True)
 
-        else:
-            # Threads
-            print("Computing %d phonon DOS with %d threads" % (len(nqsmalls), num_cpus) )
-            phdoses = [None] * len(nqsmalls)
-
-            def worker():
-                while True:
-                    nqsm, phdos_index = q.get()
-                    phdos = do_work(nqsm)
-                    phdoses[phdos_index] = phdos
-                    q.task_done()
-
-            from threading import Thread
-            try:
-                from Queue import Queue # py2k
-            except ImportError:
-                from queue import Queue # py3k
-
-            q = Queue()
-            for i in range(num_cpus):
-                 t = Thread(target=worker)
-                 t.daemon = True
-                 t.start()
-
-            for i, nqsmall in enumerate(nqsmalls):
-                q.put((nqsmall, i))
-
-            # block until all tasks are done
-            q.join()       
-    
         # Compute relative difference wrt last phonon DOS. Be careful because the DOSes may be defined 
         # on different frequency meshes ==> spline on the mesh of the last DOS. 
-        last_mesh, converged = phdoses[-1].mesh, False
-        for i, phdos in enumerate(phdoses[:-1]):
-            splined_dos = phdos.spline_on_mesh(last_mesh)
-            abs_diff = (splined_dos - phdoses[-1]).abs()
-            print(" Delta(Phdos[%d] - Phdos[%d]) / Phdos[%d]: %f" % 
-                (i, len(phdoses)-1, len(phdoses)-1, abs_diff.integral().values[-1]), file=stream)
+        if len(phdoses) > 1:
+            from abipy.core.func1d import Function1DStack
+            stack = Function1DStack.from_funcs(phdoses[:-1], mesh=phdoses[-1].mesh, kind="cubic")
+            deltas = (stack - phdoses[-1]).l1_norms
+            for i, delta in enumerate(deltas):
+                print(" Delta(Phdos[%d] - Phdos[%d]) / Phdos[%d]: %f" % 
+                    (i, len(phdoses)-1, len(phdoses)-1, delta), file=stream)
 
         # Fill the plotter.
         plotter = PhononDosPlotter()
@@ -551,6 +510,15 @@ class Becs(Has_Structure):
 
         return "\n".join(lines)
 
+    def symmetrize(self):
+        """
+        Symmetrize the Born effective charges of all the atoms with the space group of the structure.
+        The permutation of the atoms induced by the symmetry operations is taken into account.
+        """
+        spacegroup, rotations = structure_symmetries(self.structure)
+        indsym = spacegroup.map_atoms(self.structure.frac_coords)[spacegroup.symafm == 1]
+        self.becs = symmetrize_site_tensors(self.becs, rotations, indsym)
+
     def check_sumrule(self, stream=sys.stdout):
         stream.write("Born effective charge neutrality sum-rule with chneut: %d\n" % self.chneut)
         becs_atomsum = self.becs.sum(axis=0)
@@ -10,7 +10,7 @@ from monty.collections import AttrDict
 from monty.functools import lazy_property
 from pymatgen.core.units import Ha_to_eV, eV_to_Ha
 from pymatgen.util.plotting_utils import add_fig_kwargs, get_ax_fig_plt
-from abipy.core.func1d import Function1D
+from abipy.core.func1d import Function1D, Function1DStack
 from abipy.core.mixins import AbinitNcFile, Has_Structure, Has_PhononBands
 from abipy.core.kpoints import Kpoint, KpointList
 from abipy.iotools import ETSF_Reader
@@ -91,8 +91,15 @@ class PhononBands(object):
         Frequencies are in eV. Cartesian displacements are in Angstrom.
     """
     @classmethod
-    def from_file(cls, filepath):
-        """Create the object from a netCDF file."""
+    def from_file(cls, filepath, lazy_displ=True):
+        """
+        Create the object from a netCDF file.
+
+        Args:
+            filepath: Path to the PHBST file.
+            lazy_displ: If True, only the frequencies are read, the phonon displacements 
+                are fetched from the file when needed (see :class:`LazyPhdisplCart`).
+        """
         with PHBST_Reader(filepath) as r:
             structure = r.read_structure()
 
@@ -101,11 +108,13 @@ class PhononBands(object):
                                  frac_coords=r.read_qredcoords(),
                                  weights=r.read_qweights(),
                                  names=None)
+
+            phdispl_cart = LazyPhdisplCart(filepath) if lazy_displ else r.read_phdispl_cart()
                                                                                    
             return cls(structure=structure,
                        qpoints=qpoints, 
                        phfreqs=r.read_phfreqs(),
-                       phdispl_cart=r.read_phdispl_cart())
+                       phdispl_cart=phdispl_cart)
 
     def __init__(self, structure, qpoints, phfreqs, phdispl_cart, markers=None, widths=None):
         """
@@ -132,7 +141,7 @@ class PhononBands(object):
         self.phfreqs = phfreqs
 
         #: phonon displacements in Cartesian coordinates.
-        #: `ndarray` of shape (nqpt, 3*natom, 3*natom).
+        #: `ndarray` of shape (nqpt, 3*natom, 3*natom) or :class:`LazyPhdisplCart`.
         #: The last dimension stores the cartesian components.
         self.phdispl_cart = phdispl_cart
 
@@ -183,8 +192,8 @@ class PhononBands(object):
         # We'll use _auto_klabels to label the point in the matplotlib plot
         # if qlabels are not specified by the user.
         _auto_qlabels = OrderedDict()
-        for idx, qpoint in enumerate(self.qpoints):
-            name = self.structure.findname_in_hsym_stars(qpoint)
+        names = self.structure.findnames_in_hsym_stars(self.qpoints)
+        for idx, name in enumerate(names):
             if name is not None:
                 _auto_qlabels[idx] = name
 
@@ -195,6 +204,19 @@ class PhononBands(object):
         """The shape of phdispl_cart."""
         return self.phdispl_cart.shape
 
+    def iter_phdispl_blocks(self, max_bytes=None):
+        """
+        Iterate over blocks of consecutive q-points.
+        Yields (qslice, displ) where displ is the (nq_block, 3*natom, 3*natom) array with
+        the displacements of the q-points in qslice. If the displacements are loaded lazily, 
+        at most max_bytes are read from file at each iteration.
+        """
+        if isinstance(self.phdispl_cart, LazyPhdisplCart):
+            for qslice, displ in self.phdispl_cart.iter_blocks(max_bytes=max_bytes):
+                yield qslice, displ
+        else:
+            yield slice(0, self.num_qpoints), self.phdispl_cart
+
     @property
     def minfreq(self):
         """Minimum phonon frequency."""
@@ -616,34 +638,29 @@ class PhononBands(object):
 
         # Precompute normalization factor
         # d2(q,\nu) = \sum_{i=0}^{3*Nat-1) |d^{q\nu}_i|**2
+        # and the contribution of each atom type. The displacements are processed
+        # in blocks of q-points so that we don't need the full array in memory.
+        symbols = list(structure.symbol_set)
         d2_qnu = np.zeros((self.num_qpoints, self.num_branches))
-        for q in range(self.num_qpoints):
-            for nu in self.branches:
-                cvect = self.phdispl_cart[q, nu, :]
-                d2_qnu[q, nu] = np.vdot(cvect, cvect).real
+        d2_qnut = np.zeros((self.num_qpoints, self.num_branches, len(symbols)))
+
+        for qslice, displ in self.iter_phdispl_blocks():
+            d2_atom = np.sum(np.reshape(np.abs(displ) ** 2, displ.shape[:2] + (-1, 3)), axis=-1)
+            d2_qnu[qslice] = d2_atom.sum(axis=-1)
+            for itype, symbol in enumerate(symbols):
+                d2_qnut[qslice, :, itype] = d2_atom[:, :, structure.indices_from_symbol(symbol)].sum(axis=-1)
 
         # One plot per atom type.
-        for (ax_idx, symbol) in enumerate(structure.symbol_set):
+        for (ax_idx, symbol) in enumerate(symbols):
             ax = ax_list[ax_idx]
 
             self.decorate_ax(ax, qlabels=qlabels)
 
-            # dir_indices lists the coordinate indices for the atoms of the same type.
-            atom_indices = structure.indices_from_symbol(symbol)
-            dir_indices = []
-
-            for aindx in atom_indices:
-                start = 3 * aindx
-                dir_indices.extend([start, start + 1, start + 2])
-
             for nu in self.branches:
                 yy = self.phfreqs[:, nu]
 
-                # Exctract the sub-vector associated to this atom type.
-                displ_type = self.phdispl_cart[:, nu, dir_indices]
-                d2_type = np.zeros(self.num_qpoints)
-                for q in range(self.num_qpoints):
-                    d2_type[q] = np.vdot(displ_type[q], displ_type[q]).real
+                # Contribution of this atom type.
+                d2_type = d2_qnut[:, nu, ax_idx]
 
                 # Normalize and scale by max_stripe_width_mev.
                 # The stripe is centered on the phonon branch hence the factor 2
@@ -735,6 +752,129 @@ class PHBST_Reader(ETSF_Reader):
         """
         return self.read_value("phdispl_cart", cmode="c")
 
+    def read_phdispl_cart_qslice(self, qslice):
+        """
+        Read the Cartesian displacements for the q-points selected by qslice (hyperslab).
+        Returns complex array with shape (len(qslice), mu_mode, cart_direction).
+        """
+        var = self.read_variable("phdispl_cart")
+        data = var[qslice]
+        return data[..., 0] + 1j * data[..., 1]
+
+
+class LazyPhdisplCart(object):
+    """
+    Array-like object with the phonon displacements stored in a PHBST file.
+
+    The displacements of a q-point are read from file only when needed and
+    the last blocks are kept in a LRU cache whose size is bounded by max_cache_bytes.
+    Indexing follows numpy semantics e.g. displ[iq, nu, :] or displ[:, nu, indices].
+    """
+    def __init__(self, filepath, max_cache_bytes=64 * 1024**2):
+        """
+        Args:
+            filepath: Path to the PHBST file.
+            max_cache_bytes: Maximum number of bytes stored in the cache.
+        """
+        self.filepath = filepath
+        self.max_cache_bytes = max_cache_bytes
+
+        with PHBST_Reader(filepath) as r:
+            self.shape = r.read_variable("phdispl_cart").shape[:-1]
+
+        self._cache = OrderedDict()
+
+    def __getstate__(self):
+        # Don't pickle the cache.
+        d = self.__dict__.copy()
+        d["_cache"] = OrderedDict()
+        return d
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def dtype(self):
+        return np.dtype(np.complex128)
+
+    @property
+    def block_nbytes(self):
+        """Number of bytes needed to store the displacements of one q-point."""
+        return int(np.prod(self.shape[1:])) * self.dtype.itemsize
+
+    @property
+    def max_cached_qpoints(self):
+        """Max number of q-points stored in the cache."""
+        return max(1, self.max_cache_bytes // self.block_nbytes)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None):
+        """Read and return the full array (use it with care)."""
+        with PHBST_Reader(self.filepath) as r:
+            return np.asarray(r.read_phdispl_cart(), dtype=dtype)
+
+    def get_qpoint(self, iq):
+        """Return the (3*natom, 3*natom) array with the displacements of the iq-th q-point."""
+        iq = int(iq)
+        if iq < 0: iq += len(self)
+
+        try:
+            displ = self._cache.pop(iq)
+        except KeyError:
+            with PHBST_Reader(self.filepath) as r:
+                displ = r.read_phdispl_cart_qslice(iq)
+
+        # Move to the end (most recently used) and remove the oldest entries.
+        self._cache[iq] = displ
+        while len(self._cache) > self.max_cached_qpoints:
+            self._cache.popitem(last=False)
+
+        return displ
+
+    def iter_blocks(self, max_bytes=None):
+        """
+        Iterate over blocks of consecutive q-points reading at most max_bytes at each step.
+        Yields (qslice, displ) with displ of shape (nq_block, 3*natom, 3*natom).
+        """
+        max_bytes = self.max_cache_bytes if max_bytes is None else max_bytes
+        chunk = max(1, max_bytes // self.block_nbytes)
+
+        with PHBST_Reader(self.filepath) as r:
+            for start in range(0, len(self), chunk):
+                qslice = slice(start, min(start + chunk, len(self)))
+                yield qslice, r.read_phdispl_cart_qslice(qslice)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple): key = (key,)
+        qkey, rest = key[0], key[1:]
+
+        if isinstance(qkey, (int, np.integer)):
+            # Single q-point: use the cache and return a copy so that we don't keep a reference to the block.
+            return np.array(self.get_qpoint(qkey)[rest])
+
+        if isinstance(qkey, slice):
+            # Process the q-points in blocks and apply the other indices to each block.
+            qinds = np.arange(len(self))[qkey]
+            if qkey.step not in (None, 1):
+                return np.array([self.get_qpoint(iq)[rest] for iq in qinds])
+
+            if len(qinds) == 0: 
+                return np.empty((0,) + self.shape[1:], dtype=self.dtype)[(slice(None),) + rest]
+
+            chunk = max(1, self.max_cache_bytes // self.block_nbytes)
+            with PHBST_Reader(self.filepath) as r:
+                return np.concatenate([r.read_phdispl_cart_qslice(slice(start, min(start + chunk, qinds[-1] + 1)))[(slice(None),) + rest]
+                                       for start in range(qinds[0], qinds[-1] + 1, chunk)])
+
+        # Generic index: read the q-points and use numpy indexing.
+        qinds = np.arange(len(self))[qkey]
+        uinds, inverse = np.unique(qinds, return_inverse=True)
+        block = np.array([self.get_qpoint(iq) for iq in uinds])
+        return block[(np.reshape(inverse, np.shape(qinds)),) + rest]
+
 
 class PhbstFile(AbinitNcFile, Has_Structure, Has_PhononBands):
 
@@ -927,41 +1067,113 @@ class PhononDos(Function1D):
         num: int, optional Number of samples to generate. Default is 50.
         """
         tmesh = np.linspace(tstart, tstop, num=num)
+        d = harmonic_thermo_arrays(self.mesh, self.values, tmesh)
+
+        return HarmonicThermo(**{name: Function1D(tmesh, d[name][0]) for name in ("df", "de", "cv", "s")})
 
-        coth = lambda x: 1.0 / np.tanh(x)
-        csch2 = lambda x: 1.0 / (np.sinh(x) ** 2)
-
-        # Boltzmann constant in Ha/K
-        kb_HaK = 8.617343e-5 / Ha_to_eV 
-
-        for i, gw in enumerate(self.values):
-            if gw > 0: break
-        #i = self.dos.find_mesh_index(0.0)
-
-        # Use atomic units
-        w =  self.mesh[i:] * eV_to_Ha
-        gw = self.values[i:] * Ha_to_eV
-
-        from scipy.integrate import cumtrapz
-        def integrate(values):
-            return cumtrapz(values, x=w)[-1]
-
-        #w, gw = w[i:], gw[i:]
-        # TODO
-        # Check for possible numerical instabilities when w ~ 0 or negative
-        # Prefactors are missing!
-        df, de, cv, s = map(np.empty, 4 * (len(tmesh),))
-        for i, temp in enumerate(tmesh):
-            # Equations in Xavier's paper.
-            kt = kb_HaK * temp
-            wd2kt = w / (2 * kt)
-            df[i] = kt * integrate(np.log(2 * np.sinh(wd2kt)) * gw)
-            de[i] = integrate(w * coth(wd2kt) * gw)
-            cv[i] = integrate(wd2kt * wd2kt * csch2(wd2kt) * gw)
-            s[i] = integrate((wd2kt * coth(wd2kt) - np.log(2 * np.sinh(wd2kt))) * gw)
-
-        locvars = locals()
-        return HarmonicThermo(**{name: Function1D(tmesh, locvars[name]) for name in ("df", "de", "cv", "s")})
+    @classmethod
+    def get_harmonic_thermo_stack(cls, phdos_list, tstart, tstop, num=50):
+        """
+        Compute the harmonic thermodinamic properties for a list of phonon DOSes 
+        (e.g. the DOSes of a quasi-harmonic volume scan) in a single batched calculation.
+
+        Args:
+            phdos_list: List of :class:`PhononDos`. DOSes defined on different meshes
+                are linearly interpolated on a common mesh before the integration.
+            tstart: The starting value (in Kelvin) of the temperature mesh. 
+            tstop: The end value (in Kelvin) of the mesh.
+            num: int, optional Number of samples to generate. Default is 50.
+
+        Returns:
+            List of :class:`HarmonicThermo` objects, one for each DOS.
+        """
+        tmesh = np.linspace(tstart, tstop, num=num)
+        wmesh, values = stack_phdos_values(phdos_list)
+        d = harmonic_thermo_arrays(wmesh, values, tmesh)
+
+        return [HarmonicThermo(**{name: Function1D(tmesh, d[name][i]) for name in ("df", "de", "cv", "s")})
+                for i in range(len(values))]
+
+
+def stack_phdos_values(phdos_list):
+    """
+    Return the mesh (eV) and a (ndos, nw) array with the values of the DOSes in phdos_list.
+    If the DOSes are not defined on the same mesh, the values are interpolated on a common 
+    linear mesh that covers all the input meshes. The step is given by the smallest step.
+    """
+    stack = Function1DStack.from_funcs(phdos_list)
+    return stack.mesh, stack.values
+
+
+def harmonic_thermo_arrays(wmesh, values, tmesh, max_nelements=2**22):
+    """
+    Vectorized computation of the thermodinamic properties within the harmonic approximation.
+
+    The integrals over the frequencies are computed for all the temperatures with
+    matrix-vector products. The temperature axis is processed in chunks so that the 
+    temporary (ntemp, nw) arrays contain at most max_nelements entries.
+    Only positive frequencies contribute to the integrals, zero and negative (unstable) 
+    frequencies are ignored. The T --> 0 limits are computed analytically.
+
+    Args:
+        wmesh: Frequency mesh in eV.
+        values: DOS values in states/eV. Either a (nw,) array or a (ndos, nw) array 
+            with a stack of DOSes defined on the same mesh.
+        tmesh: Temperatures in Kelvin.
+        max_nelements: Max number of entries in the temporary arrays.
+
+    Returns:
+        dict with the (ndos, ntemp) arrays "df", "de" (Ha) and "cv", "s" (Ha/K).
+        df and de include the zero-point energy 1/2 int w g(w) dw.
+    """
+    wmesh, tmesh = np.asarray(wmesh, dtype=float), np.atleast_1d(np.asarray(tmesh, dtype=float))
+    values = np.atleast_2d(values)
+    ndos, ntemp = len(values), len(tmesh)
+
+    # Boltzmann constant in Ha/K
+    kb_HaK = 8.617343e-5 / Ha_to_eV 
+
+    # Use atomic units. Select the positive frequencies and build the trapezoidal weights 
+    # so that the integrals become matrix-vector products: int f(w) g(w) dw = f . (weights * g)
+    ipos = wmesh > 0
+    if np.count_nonzero(ipos) < 2:
+        raise ValueError("Need at least two positive frequencies in the phonon DOS.")
+
+    w = wmesh[ipos] * eV_to_Ha
+    weights = np.zeros(len(w))
+    dw = np.diff(w)
+    weights[:-1] += 0.5 * dw
+    weights[1:] += 0.5 * dw
+    gw = values[:, ipos] * Ha_to_eV * weights
+
+    df, de, cv, s = (np.zeros((ndos, ntemp)) for _ in range(4))
+
+    # T <= 0 --> use the analytic limits (zero point motion): F(0) = E(0) = 1/2 int w g(w) dw, Cv(0) = S(0) = 0.
+    izero = tmesh <= 0
+    if np.any(izero):
+        df[:, izero] = de[:, izero] = np.dot(gw, 0.5 * w)[:, None]
+
+    itemps = np.where(~izero)[0]
+    chunk = max(1, max_nelements // len(w))
+    for start in range(0, len(itemps), chunk):
+        its = itemps[start:start+chunk]
+        kt = kb_HaK * tmesh[its][:, None]
+        # Equations in Xavier's paper written in terms of exp(-w/kt) to avoid overflows.
+        # x = w / 2kt, sinh(x) = exp(x) (1 - exp(-2x)) / 2.
+        x = w / (2 * kt)
+        em = np.exp(-2 * x)
+        one_m_em = -np.expm1(-2 * x)
+        log2sinh = x + np.log(one_m_em)
+        coth = (1 + em) / one_m_em
+
+        # F = kT int ln(2 sinh(x)) g, E = 1/2 int w coth(x) g,
+        # Cv = kb int x^2 / sinh^2(x) g, S = kb int (x coth(x) - ln(2 sinh(x))) g
+        df[:, its] = np.dot(gw, (kt * log2sinh).T)
+        de[:, its] = np.dot(gw, (0.5 * w * coth).T)
+        cv[:, its] = kb_HaK * np.dot(gw, (4 * x * x * em / one_m_em ** 2).T)
+        s[:, its] = kb_HaK * np.dot(gw, (x * coth - log2sinh).T)
+
+    return dict(df=df, de=de, cv=cv, s=s)
 
 
 class HarmonicThermo(AttrDict):
@@ -0,0 +1,268 @@
+# coding: utf-8
+"""
+Quasi-harmonic approximation: free energy F(V,T), thermal expansion and bulk modulus
+from a volume series of DDB and GSR files.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import numpy as np
+
+from monty.collections import dict2namedtuple
+from pymatgen.core.units import Ha_to_eV
+from pymatgen.util.plotting_utils import add_fig_kwargs
+from abipy.tools.parallel import map_parallel
+from abipy.dfpt.phonons import stack_phdos_values, harmonic_thermo_arrays
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__all__ = [
+    "QHA",
+]
+
+# 1 eV/Ang^3 in GPa
+eVA3_to_GPa = 160.21766208
+
+
+class QHA(object):
+    """
+    Free energy and thermodinamic properties within the quasi-harmonic approximation.
+
+    The vibrational free energy is computed for all the volumes and all the temperatures
+    in a single vectorized calculation and the equation of state is fitted for all
+    the temperatures at once with the linearized Birch-Murnaghan form:
+
+        E(V) = sum_n a_n V^{-2n/3}   n = 0, ..., order
+
+    so that the fit reduces to one least-squares problem with a design matrix shared by all temperatures.
+
+    .. note::
+
+        Volumes are in Ang^3, energies in eV, bulk moduli in GPa.
+    """
+    def __init__(self, volumes, energies, phdoses):
+        """
+        Args:
+            volumes: List of volumes in Ang^3.
+            energies: List of total energies in eV.
+            phdoses: List of :class:`PhononDos` objects, one for each volume.
+        """
+        if not (len(volumes) == len(energies) == len(phdoses)):
+            raise ValueError("volumes, energies and phdoses must have the same length")
+
+        # Sort by volume.
+        iv = np.argsort(volumes)
+        self.volumes = np.array(volumes, dtype=float)[iv]
+        self.energies = np.array(energies, dtype=float)[iv]
+        self.phdoses = [phdoses[i] for i in iv]
+
+    @classmethod
+    def from_files(cls, ddb_paths, gsr_paths, nqsmall=10, asr=2, chneut=1, dipdip=1,
+                   dos_method="tetra", ngqpt=None, num_cpus=None):
+        """
+        Build the object from a list of DDB files and the corresponding list of GSR files.
+        The phonon DOSes are computed with anaddb, the different anaddb runs are executed in parallel.
+
+        Args:
+            ddb_paths: List of DDB files (one for each volume).
+            gsr_paths: List of GSR files (same order as ddb_paths).
+            nqsmall: Defines the homogeneous q-mesh used for the DOS. Gives the number of divisions
+                used to sample the smallest lattice vector.
+            asr, chneut, dipdp: Anaddb input variable. See official documentation.
+            dos_method: Technique for DOS computation in  Possible choices: "tetra", "gaussian" or "gaussian:0.001 eV".
+            ngqpt: Number of divisions for the q-mesh in the DDB file. Auto-detected if None (default)
+            num_cpus: Number of threads used to run anaddb. Autodetected if None.
+        """
+        from abipy.dfpt.ddb import DdbFile
+        from abipy.electrons.gsr import GsrFile
+
+        if len(ddb_paths) != len(gsr_paths):
+            raise ValueError("Found %d DDB files and %d GSR files" % (len(ddb_paths), len(gsr_paths)))
+
+        volumes, energies = [], []
+        for path in gsr_paths:
+            with GsrFile(path) as gsr:
+                volumes.append(gsr.structure.volume)
+                energies.append(float(gsr.energy))
+
+        def get_phdos(path):
+            ddb = DdbFile(path)
+            try:
+                _, phdos_file = ddb.anaget_phbst_and_phdos_files(
+                    nqsmall=nqsmall, ndivsm=1, asr=asr, chneut=chneut, dipdip=dipdip,
+                    dos_method=dos_method, ngqpt=ngqpt)
+                return phdos_file.phdos
+            finally:
+                ddb.close()
+
+        phdoses = map_parallel(get_phdos, list(ddb_paths), num_cpus=num_cpus, threads=True)
+
+        return cls(volumes, energies, phdoses)
+
+    @classmethod
+    def from_robots(cls, ddb_robot, gsr_robot, **kwargs):
+        """
+        Build the object from a :class:`DdbRobot` and a :class:`GsrRobot` containing the same volume series.
+        kwargs are passed to :meth:`from_files`.
+        """
+        return cls.from_files([ddb.filepath for ddb in ddb_robot.ncfiles],
+                              [gsr.filepath for gsr in gsr_robot.ncfiles], **kwargs)
+
+    def __str__(self):
+        return self.to_string()
+
+    def to_string(self):
+        """String representation."""
+        lines = ["%s with %d volumes" % (self.__class__.__name__, len(self.volumes))]
+        app = lines.append
+        for v, e in zip(self.volumes, self.energies):
+            app("  V = %.4f Ang^3, E = %.6f eV" % (v, e))
+        return "\n".join(lines)
+
+    def get_free_energy(self, tmesh):
+        """
+        Compute F(V,T) = E(V) + F_vib(V,T) for all the volumes and all the temperatures in tmesh (Kelvin).
+        Returns (nvol, ntemp) array in eV.
+        """
+        tmesh = np.atleast_1d(np.asarray(tmesh, dtype=float))
+        wmesh, values = stack_phdos_values(self.phdoses)
+        fvib = harmonic_thermo_arrays(wmesh, values, tmesh)["df"] * Ha_to_eV
+
+        return self.energies[:, None] + fvib
+
+    def fit(self, tstart=0, tstop=800, num=100, order=3):
+        """
+        Fit the equation of state for all the temperatures.
+
+        Args:
+            tstart: The starting value (in Kelvin) of the temperature mesh.
+            tstop: The end value (in Kelvin) of the mesh.
+            num: int, optional Number of samples to generate.
+            order: Order of the linearized Birch-Murnaghan polynomial. 3 gives the third-order BM equation.
+
+        Returns:
+            `namedtuple` with the following attributes::
+
+                tmesh: Temperatures in Kelvin.
+                free_energy: (nvol, ntemp) array with F(V,T) in eV.
+                v0: Equilibrium volume in Ang^3 as function of T.
+                f0: Free energy at the minimum in eV.
+                b0: Bulk modulus in GPa.
+                alpha: Volumetric thermal expansion coefficient 1/V dV/dT in 1/K.
+        """
+        tmesh = np.linspace(tstart, tstop, num=num)
+        fvt = self.get_free_energy(tmesh)
+        coeffs = fit_linear_bm(self.volumes, fvt, order=order)
+        v0, f0, b0 = linear_bm_minimum(coeffs, self.volumes)
+
+        if np.any(np.isnan(v0)):
+            logger.warning("Cannot find the minimum of F(V,T) for some temperatures. Check the volume range.")
+
+        alpha = np.gradient(v0, tmesh[1] - tmesh[0]) / v0 if num > 1 else np.zeros(num)
+
+        return dict2namedtuple(tmesh=tmesh, free_energy=fvt, v0=v0, f0=f0, b0=b0, alpha=alpha)
+
+    @add_fig_kwargs
+    def plot(self, tstart=0, tstop=800, num=100, order=3, **kwargs):
+        """
+        Plot F(V,T) for a selection of temperatures, the equilibrium volume, the thermal expansion
+        and the bulk modulus as function of T.
+
+        Returns:
+            `matplotlib` figure.
+        """
+        import matplotlib.pyplot as plt
+        fit = self.fit(tstart=tstart, tstop=tstop, num=num, order=order)
+
+        fig, ax_list = plt.subplots(nrows=2, ncols=2, squeeze=True)
+        ax_list = ax_list.ravel()
+        for ax in ax_list:
+            ax.grid(True)
+
+        ax = ax_list[0]
+        for it in np.linspace(0, num - 1, num=min(num, 5)).astype(int):
+            ax.plot(self.volumes, fit.free_energy[:, it], marker="o", label="T = %.0f K" % fit.tmesh[it])
+        ax.plot(fit.v0, fit.f0, color="k", linestyle="--")
+        ax.set_xlabel("Volume [Ang^3]")
+        ax.set_ylabel("F(V,T) [eV]")
+        ax.legend(loc="best")
+
+        for ax, values, label in zip(ax_list[1:], (fit.v0, fit.alpha, fit.b0),
+                                     ("V0 [Ang^3]", r"$\alpha$ [1/K]", "B0 [GPa]")):
+            ax.plot(fit.tmesh, values)
+            ax.set_xlabel("Temperature [K]")
+            ax.set_ylabel(label)
+
+        return fig
+
+
+def fit_linear_bm(volumes, energies, order=3):
+    """
+    Least-squares fit of the linearized Birch-Murnaghan equation of state E(x) = sum_n a_n x^n
+    with x = V^{-2/3}. energies can be a (nvol, nfit) array in which case all the columns
+    are fitted in one pass with the same design matrix.
+
+    Returns (order + 1, nfit) array with the coefficients a_n (or (order+1,) if energies is 1D).
+    """
+    volumes = np.asarray(volumes, dtype=float)
+    if len(volumes) < order + 1:
+        raise ValueError("Need at least %d volumes for a fit of order %d" % (order + 1, order))
+
+    x = volumes ** (-2/3)
+    design = np.vander(x, N=order + 1, increasing=True)
+    coeffs, _, _, _ = np.linalg.lstsq(design, energies, rcond=-1)
+
+    return coeffs
+
+
+def linear_bm_minimum(coeffs, volumes):
+    """
+    Find the minimum of the linearized Birch-Murnaghan fits in the interval spanned by volumes.
+
+    Args:
+        coeffs: (order + 1, nfit) array returned by :func:`fit_linear_bm`.
+        volumes: Volumes used for the fit (Ang^3).
+
+    Returns:
+        v0, e0, b0: arrays with the equilibrium volumes (Ang^3), the energies at the minimum (eV)
+        and the bulk moduli (GPa). NaN is returned if the minimum cannot be found inside the interval.
+    """
+    coeffs = np.asarray(coeffs, dtype=float)
+    if coeffs.ndim == 1: coeffs = coeffs[:, None]
+    order = coeffs.shape[0] - 1
+    volumes = np.asarray(volumes, dtype=float)
+    xmin, xmax = volumes.max() ** (-2/3), volumes.min() ** (-2/3)
+
+    # Evaluate E(x) on a dense grid to bracket the minimum for all the fits at once,
+    # then refine with a few vectorized Newton iterations on dE/dx = 0.
+    xgrid = np.linspace(xmin, xmax, num=1001)
+    powers = np.arange(order + 1)
+    egrid = np.dot(xgrid[:, None] ** powers, coeffs)
+    x0 = xgrid[np.argmin(egrid, axis=0)]
+
+    d1 = (powers * coeffs.T)[:, 1:]
+    d2 = (powers[2:] * (powers[2:] - 1) * coeffs[2:].T)
+
+    def polyval(c, x):
+        return np.sum(c * x[:, None] ** np.arange(c.shape[1]), axis=1)
+
+    for i in range(20):
+        der1, der2 = polyval(d1, x0), polyval(d2, x0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = np.where(der2 > 0, der1 / der2, 0.0)
+        x0 = np.clip(x0 - step, xmin, xmax)
+        if np.all(np.abs(step) < 1e-14 * np.abs(x0)): break
+
+    der2 = polyval(d2, x0)
+    v0 = x0 ** (-3/2)
+    e0 = polyval(coeffs.T, x0)
+
+    # B = V d2E/dV2 and at the minimum d2E/dV2 = E''(x) (dx/dV)^2 with dx/dV = -2/3 V^{-5/3}
+    b0 = v0 * der2 * (4/9) * v0 ** (-10/3) * eVA3_to_GPa
+
+    # Minima on the boundary of the interval are not physical.
+    bad = (x0 <= xmin) | (x0 >= xmax) | (der2 <= 0)
+    v0[bad], e0[bad], b0[bad] = np.nan, np.nan, np.nan
+
+    return v0, e0, b0
@@ -108,6 +108,20 @@ class DdbTest(AbipyTest):
 
         ddb.close()
 
+    def test_becs_symmetrize(self):
+        """Symmetrization of the Born effective charges."""
+        from abipy.dfpt.ddb import Becs
+        with DdbFile(os.path.join(test_dir, "AlAs_1qpt_DDB")) as ddb:
+            structure = ddb.structure
+
+        becs = Becs(np.random.rand(len(structure), 3, 3), structure, chneut=0)
+        becs.symmetrize()
+
+        # The charges of the zinc-blende structure are isotropic.
+        for bec in becs.becs:
+            self.assert_almost_equal(bec, bec[0, 0] * np.eye(3))
+        becs.check_sumrule()
+
 if __name__ == "__main__": 
     import unittest
     unittest.main()
@@ -2,9 +2,11 @@
 from __future__ import print_function, division
 
 import tempfile
+import numpy as np
 import abipy.data as abidata
 
-from abipy.dfpt.phonons import PhononBands, PhononDos
+from pymatgen.core.units import Ha_to_eV
+from abipy.dfpt.phonons import PhononBands, PhononDos, LazyPhdisplCart, harmonic_thermo_arrays
 from abipy.core.testing import *
 
 
@@ -29,6 +31,27 @@ class PhononBandsTest(AbipyTest):
         #dos = phbands.get_phdos()
         #print(dos)
 
+    def test_lazy_displ(self):
+        """Testing lazy loading of the phonon displacements."""
+        filename = abidata.ref_file("trf2_5.out_PHBST.nc")
+        lazy = PhononBands.from_file(filename)
+        eager = PhononBands.from_file(filename, lazy_displ=False)
+        assert isinstance(lazy.phdispl_cart, LazyPhdisplCart)
+        assert lazy.displ_shape == eager.displ_shape
+
+        # Cache is bounded.
+        lazy.phdispl_cart.max_cache_bytes = 2 * lazy.phdispl_cart.block_nbytes
+        for key in [0, (3, 2), (-1, 1, slice(None)), (slice(None), 2, [0, 1, 2]), (slice(2, 9),), [1, 4, 1]]:
+            self.assert_almost_equal(lazy.phdispl_cart[key], eager.phdispl_cart[key])
+        assert len(lazy.phdispl_cart._cache) <= 2
+
+        self.assert_almost_equal(np.asarray(lazy.phdispl_cart), eager.phdispl_cart)
+        self.serialize_with_pickle(lazy, protocols=[-1], test_eq=False)
+
+        nq = sum(displ.shape[0] for _, displ in lazy.iter_phdispl_blocks(max_bytes=lazy.phdispl_cart.block_nbytes))
+        assert nq == lazy.num_qpoints
+        lazy.plot_fatbands(show=False)
+
 
 class PhononDosTest(AbipyTest):
 
@@ -42,6 +65,36 @@ class PhononDosTest(AbipyTest):
         h = dos.get_harmonic_thermo(1, 10)
         assert h is not None
 
+    def test_harmonic_thermo_stack(self):
+        """Testing vectorized harmonic thermodinamics with a stack of DOSes."""
+        mesh = np.linspace(-0.005, 0.06, num=300)
+        values = np.where(mesh > 0, mesh**2, 0.0)
+        dos1 = PhononDos(mesh, values)
+        dos2 = PhononDos(mesh, 2 * values)
+
+        h1 = dos1.get_harmonic_thermo(0, 600, num=20)
+        # T = 0 gives the zero-point energy, Cv vanishes.
+        assert h1.df.values[0] > 0 and h1.cv.values[0] == 0
+        assert np.all(np.isfinite(h1.s.values))
+
+        # F(0) = E(0) and F = E - TS.
+        self.assert_almost_equal(h1.df.values[0], h1.de.values[0])
+        tmesh = h1.df.mesh
+        self.assert_almost_equal(h1.df.values, h1.de.values - tmesh * h1.s.values)
+
+        # Classical limit: Cv --> kb int g(w) dw (Dulong-Petit).
+        kb_HaK = 8.617343e-5 / Ha_to_eV
+        d = harmonic_thermo_arrays(mesh, values, [1e6])
+        ipos = mesh > 0
+        w, g = mesh[ipos], values[ipos]
+        nmodes = np.sum(0.5 * (g[1:] + g[:-1]) * np.diff(w))
+        self.assert_almost_equal(d["cv"][0, 0] / (kb_HaK * nmodes), 1.0)
+
+        hlist = PhononDos.get_harmonic_thermo_stack([dos1, dos2], 0, 600, num=20)
+        assert len(hlist) == 2
+        self.assert_almost_equal(hlist[0].cv.values, h1.cv.values)
+        self.assert_almost_equal(hlist[1].df.values, 2 * h1.df.values)
+
 
 if __name__ == "__main__":
     import unittest
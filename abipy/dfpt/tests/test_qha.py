@@ -0,0 +1,51 @@
+"""Tests for the quasi-harmonic approximation"""
+from __future__ import print_function, division
+
+import numpy as np
+
+from abipy.dfpt.phonons import PhononDos
+from abipy.dfpt.qha import QHA, fit_linear_bm, linear_bm_minimum
+from abipy.core.testing import *
+
+
+class QhaTest(AbipyTest):
+
+    def test_linear_bm(self):
+        """Testing batched linearized Birch-Murnaghan fit."""
+        v0, b0, bp, e0 = 40.0, 0.6, 4.5, -10.0
+        def bm3(vols, v0):
+            eta = (v0 / vols) ** (2/3)
+            return e0 + 9 * v0 * b0 / 16 * ((eta - 1)**3 * bp + (eta - 1)**2 * (6 - 4 * eta))
+
+        volumes = np.linspace(36, 44, num=9)
+        energies = np.array([bm3(volumes, v0 + 0.5 * i) for i in range(3)]).T
+        coeffs = fit_linear_bm(volumes, energies, order=3)
+        assert coeffs.shape == (4, 3)
+
+        fit_v0, fit_e0, fit_b0 = linear_bm_minimum(coeffs, volumes)
+        self.assert_almost_equal(fit_v0, [40.0, 40.5, 41.0])
+        self.assert_almost_equal(fit_e0, 3 * [e0])
+        self.assert_almost_equal(fit_b0, 3 * [b0 * 160.21766208], decimal=4)
+
+    def test_qha_api(self):
+        """Testing QHA with fake data."""
+        volumes = np.linspace(38, 42, num=5)
+        energies = 0.05 * (volumes - 40)**2
+        # Phonons soften when the volume increases.
+        mesh = np.linspace(0, 0.06, num=200)
+        phdoses = [PhononDos(mesh, np.exp(-(mesh - 0.03 * (40 / v)) ** 2 / 1e-5)) for v in volumes]
+
+        qha = QHA(volumes, energies, phdoses)
+        print(qha)
+        fvt = qha.get_free_energy([0, 300])
+        assert fvt.shape == (5, 2)
+
+        fit = qha.fit(tstart=0, tstop=300, num=4)
+        assert len(fit.v0) == 4 and not np.any(np.isnan(fit.v0))
+        # Positive thermal expansion.
+        assert fit.v0[-1] > fit.v0[0]
+
+
+if __name__ == "__main__":
+    import unittest
+    unittest.main()
@@ -4,3 +4,4 @@ from .gsr import *
 from .gw import *
 from .bse import *
 from .scissors import *
+from .qpinterp import *
@@ -3,17 +3,19 @@
 from __future__ import print_function, division, unicode_literals
 
 import sys
+import os
 import itertools
 import collections
 import numpy as np
 
 from monty.collections import AttrDict
 from monty.functools import lazy_property
+from pymatgen.core.units import bohr_to_angstrom, eV_to_Ha
 from pymatgen.util.plotting_utils import add_fig_kwargs, get_ax_fig_plt
-from abipy.core.func1d import Function1D
+from abipy.core.func1d import Function1D, kramers_kronig, fsum_integrals
 from abipy.core.kpoints import Kpoint, KpointList
 from abipy.core.mixins import AbinitNcFile, Has_Structure
-from abipy.core.tensor import SymmetricTensor
+from abipy.core.tensor import red_tensors_from_directions, symmetrize_cartesian_tensors, structure_symmetries
 from abipy.iotools import ETSF_Reader
 
 __all__ = [
@@ -22,6 +24,8 @@ __all__ = [
     "MdfFile",
     "MdfReader",
     "MdfPlotter",
+    "clear_mdf_cache",
+    "effective_electrons",
 ]
 
 
@@ -31,53 +35,40 @@ class DielectricTensor(object):
     obtained from the dielectric functions for different q-directions.
     """
     def __init__(self, mdf, structure):
-        nfreq = len(mdf.wmesh)
-
         self._wmesh = mdf.wmesh
+        self._lattice = structure.lattice.reciprocal_lattice
 
-        # Transform mdf emacros_q to numpy array
-        all_emacros = []
-        for emacro in mdf.emacros_q:
-            all_emacros.append(emacro.values)
-
-        all_emacros = np.array(all_emacros)
+        # Transform mdf emacros_q to (nq, nfreq) numpy array
+        all_emacros = np.array([emacro.values for emacro in mdf.emacros_q])
 
-        # One tensor for each frequency
-        all_tensors = []
-        for (ifrq, freq) in enumerate(mdf.wmesh):
-            tensor = SymmetricTensor.from_directions(mdf.qfrac_coords, all_emacros[:,ifrq],
-                                                     structure.lattice.reciprocal_lattice, space="g")
-            all_tensors.append(tensor)
-
-        self._all_tensors = all_tensors
+        # One tensor for each frequency: the linear systems are solved
+        # for all the frequencies at once. Shape is (nfreq, 3, 3)
+        self._red_tensors = red_tensors_from_directions(mdf.qfrac_coords, all_emacros, self._lattice)
 
     def to_array(self, red_coords=True):
-       
-        table = [] 
-        for tensor in self._all_tensors:
-            if red_coords:
-                table.append(tensor.reduced_tensor)
-            else:
-                table.append(tensor.cartesian_tensor)
-
-        return np.array(table)
+        """
+        Return (nfreq, 3, 3) array with the tensors in reduced coordinates
+        if red_coords else in Cartesian coordinates.
+        """
+        if red_coords:
+            return self._red_tensors.copy()
+        else:
+            mat = self._lattice.matrix
+            return np.einsum("ji,wjk,kl->wil", mat, self._red_tensors, mat)
 
     def symmetrize(self, structure):
-     
-        for tensor in self._all_tensors:
-            tensor.symmetrize(structure)
+        """Symmetrize the tensors for all the frequencies with the point group of the structure."""
+        _, rotations = structure_symmetries(structure)
+        sym_tensors = symmetrize_cartesian_tensors(self.to_array(red_coords=False), rotations)
+
+        inv = self._lattice.inv_matrix
+        self._red_tensors = np.einsum("ji,wjk,kl->wil", inv, sym_tensors, inv)
 
     def to_func1d(self, red_coords=True):
 
         table = self.to_array(red_coords)
 
-        all_funcs = []
- 
-        for i in np.arange(3):
-            for j in np.arange(3):
-                all_funcs.append(Function1D(self._wmesh, table[:,i,j]))
-
-        return all_funcs
+        return [Function1D(self._wmesh, table[:,i,j]) for i in range(3) for j in range(3)]
 
     @add_fig_kwargs
     def plot(self, ax=None, *args, **kwargs):
@@ -144,6 +135,20 @@ class DielectricTensor(object):
         return f.plot_ax(ax, *args, **kwargs)
 
 
+def effective_electrons(wmesh, values, volume):
+    """
+    Effective number of electrons per unit cell N_eff(w) = V / (2 pi^2) int_0^w w' Im eps(w') dw'
+    (atomic units) for all the functions in values (last axis).
+
+    Args:
+        wmesh: Frequency mesh in eV.
+        values: (..., nw) array with eps (or Im eps).
+        volume: Volume of the unit cell in Ang^3.
+    """
+    volume = volume / bohr_to_angstrom ** 3
+    return volume / (2 * np.pi ** 2) * fsum_integrals(np.asarray(wmesh) * eV_to_Ha, values)
+
+
 class DielectricFunction(object):
     """
     This object stores the frequency-dependent macroscopic dielectric function
@@ -167,12 +172,13 @@ class DielectricFunction(object):
                     - "calc_type": string defining the calculation type.
 
         """
+        self.structure = structure
         self.wmesh = np.array(wmesh)
         self.qpoints = qpoints 
         assert len(self.qpoints) == len(emacros_q)
         self.info = info
 
-        self.emacros_q, em_avg = [], np.zeros(len(wmesh), dtype=np.complex)
+        self.emacros_q, em_avg = [], np.zeros(len(wmesh), dtype=np.complex128)
         for emq in emacros_q:
             em_avg += emq
             self.emacros_q.append(Function1D(wmesh, emq))
@@ -208,6 +214,25 @@ class DielectricFunction(object):
         """String with the type of calculation."""
         return self.info["calc_type"]
 
+    def kramers_kronig(self, part="imag", const=1.0, **kwargs):
+        """
+        Reconstruct the MDF for all the q-directions from its imaginary (real) part
+        with the Kramers-Kronig relations. kwargs are passed to :func:`kramers_kronig`.
+
+        Returns:
+            (nq, nw) complex array.
+        """
+        values = np.array([emq.values for emq in self.emacros_q])
+        return kramers_kronig(self.wmesh, values, part=part, const=const, **kwargs)
+
+    def get_neff(self):
+        """
+        (nq, nw) array with the effective number of electrons per unit cell
+        N_eff(w) = V / (2 pi^2) int_0^w w' Im eps(w') dw' for all the q-directions.
+        """
+        values = np.array([emq.values for emq in self.emacros_q])
+        return effective_electrons(self.wmesh, values, self.structure.volume)
+
     def show_info(self, stream=sys.stdout):
         """Pretty print of the info."""
         import pprint
@@ -376,13 +401,13 @@ class MdfFile(AbinitNcFile, Has_Structure):
         return self.reader.read_params()
 
     def get_mdf(self, mdf_type="exc"):
-        """"Returns the macroscopic dielectric function."""
-        d = {"exc": self.exc_mdf,
-             "rpa": self.rpanlf_mdf,
-             "gwrpa": self.gwnlf_mdf}
+        """"Returns the macroscopic dielectric function. Only the requested MDF is read from file."""
+        d = {"exc": "exc_mdf",
+             "rpa": "rpanlf_mdf",
+             "gwrpa": "gwnlf_mdf"}
 
         try:
-            return d[mdf_type.lower()]
+            return getattr(self, d[mdf_type.lower()])
         except KeyError:
             raise ValueError("Wrong value for mdf_type: %s" % mdf_type)
 
@@ -438,11 +463,69 @@ class MdfFile(AbinitNcFile, Has_Structure):
         # Plot spectra 
         plotter.plot(cplx_mode=cplx_mode, qpoint=qpoint, **kwargs)
 
+    def get_mdf_summary(self, mdf_type="exc"):
+        """
+        Dictionary with the position of the main peak and the integrated spectral weight
+        of the q-averaged MDF. See :meth:`MdfReader.read_mdf_summary`.
+        """
+        self._mdf_varname(mdf_type)
+        return self.reader.read_mdf_summary(mdf_type.lower())
+
+    def get_kramers_kronig(self, mdf_types=("exc", "rpa", "gwrpa"), part="imag", const=1.0, **kwargs):
+        """
+        Reconstruct the MDFs from their imaginary (real) part with the Kramers-Kronig relations.
+        All the q-directions and MDF types are transformed in one batch.
+        kwargs are passed to :func:`kramers_kronig`.
+
+        Returns:
+            OrderedDict mdf_type --> (nq, nw) complex array.
+        """
+        values = np.array([self.reader.read_mdf_qslice(self._mdf_varname(t)) for t in mdf_types])
+        eps = kramers_kronig(self.reader.wmesh, values, part=part, const=const, **kwargs)
+        return collections.OrderedDict(zip(mdf_types, eps))
+
+    def get_neff(self, mdf_types=("exc", "rpa", "gwrpa")):
+        """
+        Effective number of electrons per unit cell for all the q-directions.
+
+        Returns:
+            OrderedDict mdf_type --> (nq, nw) array.
+        """
+        values = np.array([self.reader.read_mdf_qslice(self._mdf_varname(t)) for t in mdf_types])
+        neff = effective_electrons(self.reader.wmesh, values, self.structure.volume)
+        return collections.OrderedDict(zip(mdf_types, neff))
+
+    @staticmethod
+    def _mdf_varname(mdf_type):
+        try:
+            return MdfReader.MDF_VARNAMES[mdf_type.lower()]
+        except KeyError:
+            raise ValueError("Wrong value for mdf_type: %s" % mdf_type)
+
     def get_tensor(self, mdf_type="exc"):
         """Get the macroscopic dielectric tensor from the MDF."""
         return DielectricTensor(self.get_mdf(mdf_type), self.structure)
         
 
+# Cache shared by all the MdfReader instances (and therefore by the robots).
+# Keys are (filepath, mtime, varname, iq), values are complex arrays with the MDF for one q-point.
+# The oldest entries are removed when the size of the cache exceeds MDF_CACHE_MAX_BYTES.
+MDF_CACHE_MAX_BYTES = 256 * 1024**2
+_MDF_CACHE = collections.OrderedDict()
+
+
+def clear_mdf_cache():
+    """Remove all the entries from the MDF cache."""
+    _MDF_CACHE.clear()
+
+
+def _trim_mdf_cache():
+    nbytes = sum(a.nbytes for a in _MDF_CACHE.values())
+    while nbytes > MDF_CACHE_MAX_BYTES and _MDF_CACHE:
+        _, old = _MDF_CACHE.popitem(last=False)
+        nbytes -= old.nbytes
+
+
 # TODO Add band energies to MDF file.
 #from abipy.electrons import ElectronsReader
 class MdfReader(ETSF_Reader): #ElectronsReader
@@ -480,9 +563,82 @@ class MdfReader(ETSF_Reader): #ElectronsReader
         ]
         return self.read_keys(keys)
 
+    # Mapping mdf_type --> name of the netcdf variable.
+    MDF_VARNAMES = {"exc": "exc_mdf", "rpa": "rpanlf_mdf", "gwrpa": "gwnlf_mdf"}
+
+    @lazy_property
+    def _cache_key(self):
+        return (os.path.abspath(self.path), os.path.getmtime(self.path))
+
+    def read_mdf_qslice(self, varname, qindices=None):
+        """
+        Read the MDF stored in varname for the q-points qindices (None for all the q-points).
+        Only the q-points that are not already in the (shared) cache are read from file.
+
+        Returns:
+            (len(qindices), nw) complex array.
+        """
+        nq = len(self.qpoints)
+        qindices = range(nq) if qindices is None else [int(iq) % nq for iq in qindices]
+        keys = [self._cache_key + (varname, iq) for iq in qindices]
+
+        missing = sorted(set(iq for iq, key in zip(qindices, keys) if key not in _MDF_CACHE))
+        if missing:
+            # Read the block of q-points containing the missing ones with one hyperslab.
+            start, stop = missing[0], missing[-1] + 1
+            data = np.asarray(self.read_variable(varname)[start:stop])
+            block = data[..., 0] + 1j * data[..., 1]
+            for iq in missing:
+                _MDF_CACHE[self._cache_key + (varname, iq)] = block[iq - start].copy()
+
+        # Mark the entries as recently used.
+        emacros = np.empty((len(keys), len(self.wmesh)), dtype=np.complex128)
+        for i, key in enumerate(keys):
+            _MDF_CACHE[key] = _MDF_CACHE.pop(key)
+            emacros[i] = _MDF_CACHE[key]
+
+        _trim_mdf_cache()
+        return emacros
+
+    def read_mdf_imag_avg(self, varname):
+        """
+        Return the imaginary part of the MDF averaged over the q-points.
+        The q-points are processed one at a time and only the imaginary part is read from file
+        (cached values are used if available).
+        """
+        im_avg = np.zeros(len(self.wmesh))
+        var = None
+        for iq in range(len(self.qpoints)):
+            key = self._cache_key + (varname, iq)
+            if key in _MDF_CACHE:
+                im_avg += _MDF_CACHE[key].imag
+            else:
+                if var is None: var = self.read_variable(varname)
+                im_avg += np.asarray(var[iq, :, 1])
+
+        return im_avg / len(self.qpoints)
+
+    def read_mdf_summary(self, mdf_type="exc"):
+        """
+        Return dictionary with quantities computed from the q-averaged Im[MDF]:
+        position and height of the main peak, integrated spectral weight (int Im[MDF] dw)
+        and first moment (int w Im[MDF] dw).
+        """
+        wmesh = self.wmesh
+        im_avg = self.read_mdf_imag_avg(self.MDF_VARNAMES[mdf_type])
+        imax = np.argmax(im_avg)
+        dw = np.diff(wmesh)
+
+        return dict(
+            peak_energy=wmesh[imax],
+            peak_height=im_avg[imax],
+            weight=np.sum(0.5 * (im_avg[1:] + im_avg[:-1]) * dw),
+            fsum=np.sum(0.5 * (wmesh[1:] * im_avg[1:] + wmesh[:-1] * im_avg[:-1]) * dw),
+        )
+
     def _read_mdf(self, mdf_type):
         """Read the MDF from file, returns numpy complex array."""
-        return self.read_value(mdf_type, cmode="c")
+        return self.read_mdf_qslice(mdf_type)
 
     def read_exc_mdf(self):
         """Returns the excitonic MDF."""
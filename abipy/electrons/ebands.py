@@ -15,7 +15,7 @@ from monty.collections import AttrDict
 from monty.functools import lazy_property
 from monty.bisect import find_le, find_gt
 from pymatgen.util.plotting_utils import add_fig_kwargs, get_ax_fig_plt
-from abipy.core.func1d import Function1D
+from abipy.core.func1d import Function1D, Function1DStack
 from abipy.core.kpoints import Kpoint, Kpath, IrredZone, KpointsReaderMixin, kmesh_from_mpdivs
 from abipy.iotools import ETSF_Reader, Visualizer, bxsf_write
 from abipy.tools import gaussian
@@ -306,8 +306,8 @@ class ElectronBands(object):
         # We'll use _auto_klabels to label the point in the matplotlib plot
         # if klabels are not specified by the user.
         _auto_klabels = OrderedDict()
-        for idx, kpoint in enumerate(self.kpoints):
-            name = self.structure.findname_in_hsym_stars(kpoint)
+        names = self.structure.findnames_in_hsym_stars(self.kpoints)
+        for idx, (kpoint, name) in enumerate(zip(self.kpoints, names)):
             if name is not None:
                 _auto_klabels[idx] = name
                 if kpoint.name is None:
@@ -1092,18 +1092,12 @@ class ElectronBands(object):
         qp_energies = np.zeros(self.shape)
 
         # Calculate Quasi-particle energies with the scissors operator.
+        # All the (k, band) states of the spin are corrected in one call.
+        nband_sk = np.reshape(self.nband_sk, (self.nsppol, self.nkpt))
         for spin in self.spins:
-            sciss = scissors[spin]
-            for k in self.kidxs:
-                for band in range(self.nband_sk[spin,k]):
-                    e0 = self.eigens[spin,k,band]
-                    try:
-                        qp_ene = e0 + sciss.apply(e0)
-                    except sciss.Error:
-                        raise
-
-                    # Update the energy.
-                    qp_energies[spin,k,band] = qp_ene
+            mask = np.arange(self.mband) < nband_sk[spin][:, None]
+            e0 = self.eigens[spin][mask]
+            qp_energies[spin][mask] = e0 + scissors[spin].apply(e0)
 
         # Change the energies (NB: occupations and fermie are left unchanged).
         return ElectronBands(
@@ -2014,19 +2008,14 @@ class ElectronDOS(object):
         spin_dos = np.atleast_2d(spin_dos)
         self.nsppol = len(spin_dos)
 
-        # Save DOS and IDOS for each spin.
-        sumv = np.zeros(len(mesh))
-        self.spin_dos, self.spin_idos = [], []
-        for values in spin_dos:
-            sumv += values
-            f = Function1D(mesh, values)
-            self.spin_dos.append(f)
-            self.spin_idos.append(f.integral())
-
-        # Total DOS and IDOS.
+        # Save DOS and IDOS for each spin and the total DOS/IDOS (last row of the stack).
+        sumv = spin_dos.sum(axis=0)
         if self.nsppol == 1: sumv = 2 * sumv
-        self.tot_dos = Function1D(mesh, sumv)
-        self.tot_idos = self.tot_dos.integral()
+        stack = Function1DStack(mesh, np.vstack((spin_dos, sumv)))
+        idos_stack = stack.integral()
+
+        self.spin_dos, self.spin_idos = list(stack[:-1]), list(idos_stack[:-1])
+        self.tot_dos, self.tot_idos = stack[-1], idos_stack[-1]
 
     def dos_idos(self, spin=None):
         """
@@ -2043,21 +2032,20 @@ class ElectronDOS(object):
 
         # Cannot use bisection because DOS might be negative due to smearing.
         # This one is safer albeit slower.
-        for i, (ene, intg) in enumerate(idos):
-            if intg > nelect:
-                break
-        else:
+        above = np.nonzero(idos.values > nelect)[0]
+        if len(above) == 0:
             raise ValueError("Cannot find I(e) such that I(e) > nelect")
+        i = above[0]
 
         # Now use spline to get a more accurate mu (useful if mesh is coarse)
-        e0, e1 = idos.mesh[i-1], idos.mesh[i]
-        idos_spline = idos.spline
-        for mu in np.linspace(e0, e1, num=num):
-            if abs(idos_spline(mu) - nelect) < atol:
-                return mu
-        else:
+        # The spline is evaluated on all the points of the interval at once.
+        mus = np.linspace(idos.mesh[i-1], idos.mesh[i], num=num)
+        ok = np.nonzero(np.abs(idos.spline(mus) - nelect) < atol)[0]
+        if len(ok) == 0:
             raise RuntimeError("Cannot find mu, try to increase num and/or atol")
 
+        return mus[ok[0]]
+
     def plot_ax(self, ax, spin=None, what="d", exchange_xy=False, *args, **kwargs):
         """
         Helper function to plot the data on the axis ax.
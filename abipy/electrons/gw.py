@@ -148,70 +148,11 @@ class QPState(namedtuple("QPState", "spin kpoint band e0 qpe qpe_diago vxcme sig
             return _TIPS
 
 
-class QPList(list):
-    """A list of quasiparticle corrections for a given spin."""
-    def __init__(self, *args, **kwargs):
-        super(QPList, self).__init__(*args)
-        self.is_e0sorted = kwargs.get("is_e0sorted", False)
-
-    def __repr__(self):
-        return "<%s at %s, len=%d>" % (self.__class__.__name__, id(self), len(self))
-
-    def __str__(self):
-        """String representation."""
-        table = self.to_table()
-        strio = cStringIO()
-        print(table, file=strio)
-        strio.write("\n")
-        strio.seek(0)
-
-        return "".join(strio)
-
-    def copy(self):
-        """Copy of self."""
-        return self.__class__([qp.copy() for qp in self], is_e0sorted=self.is_e0sorted)
-
-    def sort_by_e0(self):
-        """Return a new object with the E0 energies sorted in ascending order."""
-        return QPList(sorted(self, key=lambda qp: qp.e0), is_e0sorted=True)
-
-    def get_e0mesh(self):
-        """Return the E0 energies."""
-        if not self.is_e0sorted:
-            raise ValueError("QPState corrections are not sorted. Use sort_by_e0")
-
-        return np.array([qp.e0 for qp in self])
-
-    def get_field(self, field):
-        """`ndarray` containing the values of field."""
-        return np.array([getattr(qp, field) for qp in self])
-
-    def get_value(self, skb_tup, field):
-        """Return the value of field for the given spin kp band tuple, None if not found"""
-        for qp in self:
-            if qp.skb == skb_tup:
-                return getattr(qp, field)
-        return None
-
-    def get_qpenes(self):
-        """Return an array with the :class:`QPState` energies."""
-        return self.get_field("qpe")
-
-    def get_qpeme0(self):
-        """Return an arrays with the :class:`QPState` corrections."""
-        return self.get_field("qpeme0")
-
-    def to_table(self):
-        """Return a table (list of list of strings)."""
-        header = QPState.get_fields(exclude=["spin", "kpoint"])
-        table = PrettyTable(header)
-
-        for qp in self:
-            d = qp.to_strdict(fmt=None)
-            table.add_row([d[k] for k in header])
-
-        return table
-
+class QPListMixin(object):
+    """
+    Methods shared by :class:`QPList` and :class:`QPTable`.
+    Subclasses must implement `sort_by_e0`, `get_e0mesh`, `get_field` and `get_qpeme0`.
+    """
     @add_fig_kwargs
     def plot_qps_vs_e0(self, with_fields="all", exclude_fields=None, **kwargs):
         """
@@ -308,7 +249,7 @@ class QPList(list):
             scissors = qplist_spin[0].build_scissors(domains)
 
             # Compute list of interpolated QP energies.
-            qp_enes = [scissors.apply(e0) for e0 in ks_energies]
+            qp_enes = scissors.apply(ks_energies)
         """
         # Sort QP corrections according to the initial KS energy.
         qps = self.sort_by_e0()
@@ -360,7 +301,7 @@ class QPList(list):
             for dom in domains[:]:
                 plt.plot(2*[dom[0]], [min(qpcorrs), max(qpcorrs)])
                 plt.plot(2*[dom[1]], [min(qpcorrs), max(qpcorrs)])
-            intp_qpc = [sciss.apply(e0) for e0 in e0mesh]
+            intp_qpc = sciss.apply(e0mesh)
             plt.plot(e0mesh, intp_qpc, label="scissor")
             plt.legend(bbox_to_anchor=(0.9, 0.2))
             plt.show()
@@ -368,6 +309,71 @@ class QPList(list):
         # Return the object.
         return sciss
 
+
+class QPList(list, QPListMixin):
+    """A list of quasiparticle corrections for a given spin."""
+    def __init__(self, *args, **kwargs):
+        super(QPList, self).__init__(*args)
+        self.is_e0sorted = kwargs.get("is_e0sorted", False)
+
+    def __repr__(self):
+        return "<%s at %s, len=%d>" % (self.__class__.__name__, id(self), len(self))
+
+    def __str__(self):
+        """String representation."""
+        table = self.to_table()
+        strio = cStringIO()
+        print(table, file=strio)
+        strio.write("\n")
+        strio.seek(0)
+
+        return "".join(strio)
+
+    def copy(self):
+        """Copy of self."""
+        return self.__class__([qp.copy() for qp in self], is_e0sorted=self.is_e0sorted)
+
+    def sort_by_e0(self):
+        """Return a new object with the E0 energies sorted in ascending order."""
+        return QPList(sorted(self, key=lambda qp: qp.e0), is_e0sorted=True)
+
+    def get_e0mesh(self):
+        """Return the E0 energies."""
+        if not self.is_e0sorted:
+            raise ValueError("QPState corrections are not sorted. Use sort_by_e0")
+
+        return np.array([qp.e0 for qp in self])
+
+    def get_field(self, field):
+        """`ndarray` containing the values of field."""
+        return np.array([getattr(qp, field) for qp in self])
+
+    def get_value(self, skb_tup, field):
+        """Return the value of field for the given spin kp band tuple, None if not found"""
+        for qp in self:
+            if qp.skb == skb_tup:
+                return getattr(qp, field)
+        return None
+
+    def get_qpenes(self):
+        """Return an array with the :class:`QPState` energies."""
+        return self.get_field("qpe")
+
+    def get_qpeme0(self):
+        """Return an arrays with the :class:`QPState` corrections."""
+        return self.get_field("qpeme0")
+
+    def to_table(self):
+        """Return a table (list of list of strings)."""
+        header = QPState.get_fields(exclude=["spin", "kpoint"])
+        table = PrettyTable(header)
+
+        for qp in self:
+            d = qp.to_strdict(fmt=None)
+            table.add_row([d[k] for k in header])
+
+        return table
+
     def merge(self, other, copy=False):
         """
         Merge self with other. Return new :class:`QPList` object
@@ -388,6 +394,263 @@ class QPList(list):
         return self.__class__(qps)
 
 
+class QPTable(QPListMixin):
+    """
+    Columnar storage for the quasiparticle corrections.
+
+    Each field of :class:`QPState` is stored in a numpy array so that 
+    operations such as sorting, merging and extracting energies act on whole arrays.
+    :class:`QPState` objects are built on the fly when the table is indexed with an integer 
+    or iterated over. The object provides the same API as :class:`QPList`.
+    """
+    def __init__(self, data, is_e0sorted=False):
+        """
+        Args:
+            data: dictionary mapping the names of the fields of :class:`QPState` to arrays.
+                data["kpoint"] is an array of :class:`Kpoint` objects (dtype=object).
+            is_e0sorted: True if the states are sorted by e0.
+        """
+        self._data = OrderedDict()
+        for f in QPState._fields:
+            self._data[f] = np.asarray(data[f])
+
+        n = len(self._data["band"])
+        if any(len(a) != n for a in self._data.values()):
+            raise ValueError("All the columns must have the same length")
+
+        self.is_e0sorted = is_e0sorted
+
+    @classmethod
+    def from_qps(cls, qps, is_e0sorted=False):
+        """Build the table from a sequence of :class:`QPState` objects."""
+        qps = list(qps)
+        data = {f: np.array([getattr(qp, f) for qp in qps]) for f in QPState._fields if f != "kpoint"}
+        data["kpoint"] = _objarray([qp.kpoint for qp in qps])
+        return cls(data, is_e0sorted=is_e0sorted)
+
+    def __len__(self):
+        return len(self._data["band"])
+
+    def __repr__(self):
+        return "<%s at %s, len=%d>" % (self.__class__.__name__, id(self), len(self))
+
+    def __str__(self):
+        """String representation."""
+        table = self.to_table()
+        strio = cStringIO()
+        print(table, file=strio)
+        strio.write("\n")
+        strio.seek(0)
+
+        return "".join(strio)
+
+    def _row(self, i):
+        # Use python scalars so that QPState.to_strdict handles ints correctly.
+        return QPState(**{f: (a[i] if a.dtype == object else a[i].item()) for f, a in self._data.items()})
+
+    def __getitem__(self, index):
+        """Integer index returns a :class:`QPState`, slices and arrays return a new table."""
+        if isinstance(index, (int, np.integer)):
+            return self._row(index)
+
+        return self.__class__({f: a[index] for f, a in self._data.items()})
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def get_kcoords(self):
+        """(len(self), 3) array with the reduced coordinates of the k-points."""
+        if len(self) == 0: return np.empty((0, 3))
+        return np.array([k.frac_coords for k in self._data["kpoint"]])
+
+    def get_kindex(self, kpoints):
+        """
+        Return the index of the k-point of each state in the :class:`KpointList` kpoints. 
+        The search is done only once for each distinct :class:`Kpoint` object.
+        """
+        kcol = self._data["kpoint"]
+        ids = np.array([id(k) for k in kcol])
+        _, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+        return np.array([kpoints.index(kcol[i]) for i in first], dtype=int)[inverse]
+
+    def _skb_keys(self):
+        """Integer keys identifying (spin, kpoint, band). k-points are defined modulo G."""
+        kw = np.mod(np.round(self.get_kcoords(), 6), 1)
+        kw[np.abs(kw - 1) < 1e-6] = 0.0
+        return np.column_stack((self._data["spin"], self._data["band"], np.round(kw * 1e6)))
+
+    def __eq__(self, other):
+        if not isinstance(other, QPTable) or len(self) != len(other): return False
+
+        for f in QPState._fields:
+            if f == "kpoint":
+                if not np.allclose(self._skb_keys(), other._skb_keys()): return False
+            elif not np.array_equal(self._data[f], other._data[f]):
+                return False
+
+        return True
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __contains__(self, qp):
+        mask = (self._data["spin"] == qp.spin) & (self._data["band"] == qp.band)
+        return any(self._row(i) == qp for i in np.flatnonzero(mask))
+
+    def copy(self):
+        """Copy of self."""
+        return self.__class__({f: a.copy() for f, a in self._data.items()}, is_e0sorted=self.is_e0sorted)
+
+    def sort_by_e0(self):
+        """Return a new object with the E0 energies sorted in ascending order."""
+        # Stable sort to preserve the order of degenerate states (as in QPList).
+        isort = np.argsort(self._data["e0"], kind="mergesort")
+        return self.__class__({f: a[isort] for f, a in self._data.items()}, is_e0sorted=True)
+
+    def get_e0mesh(self):
+        """Return the E0 energies."""
+        if not self.is_e0sorted:
+            raise ValueError("QPState corrections are not sorted. Use sort_by_e0")
+
+        return self._data["e0"].copy()
+
+    def get_field(self, field):
+        """`ndarray` containing the values of field."""
+        if field == "qpeme0":
+            return self._data["qpe"] - self._data["e0"]
+
+        return self._data[field].copy()
+
+    def get_value(self, skb_tup, field):
+        """Return the value of field for the given spin kp band tuple, None if not found"""
+        spin, kpoint, band = skb_tup
+        mask = (self._data["spin"] == spin) & (self._data["band"] == band)
+        for i in np.flatnonzero(mask):
+            if self._data["kpoint"][i] == kpoint:
+                return self.get_field(field)[i]
+        return None
+
+    def get_qpenes(self):
+        """Return an array with the :class:`QPState` energies."""
+        return self.get_field("qpe")
+
+    def get_qpeme0(self):
+        """Return an arrays with the :class:`QPState` corrections."""
+        return self.get_field("qpeme0")
+
+    def to_table(self):
+        """Return a table (list of list of strings)."""
+        header = QPState.get_fields(exclude=["spin", "kpoint"])
+        table = PrettyTable(header)
+
+        columns = [_format_column(self.get_field(f)) for f in header]
+        for row in zip(*columns):
+            table.add_row(list(row))
+
+        return table
+
+    def merge(self, other, copy=False):
+        """
+        Merge self with other. Return new :class:`QPTable` object
+
+        Raise:
+            ValueError if merge cannot be done.
+        """
+        if not isinstance(other, QPTable): other = QPTable.from_qps(other)
+
+        # Look for duplicated (s, k, b) with lexsort.
+        keys = np.concatenate((self._skb_keys(), other._skb_keys()))
+        if len(keys):
+            isort = np.lexsort(keys.T[::-1])
+            sorted_keys = keys[isort]
+            dups = np.all(sorted_keys[1:] == sorted_keys[:-1], axis=1)
+            if np.any(dups):
+                i = isort[np.flatnonzero(dups)[0] + 1]
+                qp = self[i] if i < len(self) else other[i - len(self)]
+                raise ValueError("Found duplicated (s,b,k) indexes: %s" % str(qp.skb))
+
+        # np.concatenate always returns new arrays so copy is not needed.
+        return self.__class__({f: np.concatenate((self._data[f], other._data[f])) for f in QPState._fields})
+
+
+def _objarray(objects):
+    """Build 1d numpy array of objects (avoid numpy trying to iterate over the objects)."""
+    arr = np.empty(len(objects), dtype=object)
+    for i, obj in enumerate(objects):
+        arr[i] = obj
+    return arr
+
+
+def _format_column(values):
+    """Convert array with values to array of strings with the format used in :meth:`QPState.to_strdict`."""
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return np.char.mod("%d", values)
+
+    if np.iscomplexobj(values):
+        re_str = np.char.mod("%.2f", values.real)
+        cplx_str = np.char.add(re_str, np.char.mod("%+.2fj", values.imag))
+        return np.where(np.abs(values.imag) < 1.e-3, re_str, cplx_str)
+
+    return np.char.mod("%.2f", values)
+
+
+def _spfunc(wmesh, hhartree, sigxcme, sigcme):
+    """
+    Spectral function A(w) = 1/pi |Im Sigma_c(w)| / ((w - Re H - Re Sigma_xc(w))^2 + (Im Sigma_c(w))^2)
+
+    hhartree has shape (...,), sigxcme and sigcme have shape (..., nomega).
+    """
+    hhartree = np.asarray(hhartree)[..., None]
+    den = (wmesh - hhartree.real - sigxcme.real) ** 2 + sigcme.imag ** 2
+    return 1. / np.pi * np.abs(sigcme.imag) / den
+
+
+def spfunc_peaks(wmesh, values):
+    """
+    Integrated spectral weight and position, height and full width at half maximum
+    of the main peak of the spectral functions values[..., nomega].
+    The width is obtained by linear interpolation of the half-maximum crossings and
+    is set to NaN if the peak is not resolved inside the frequency mesh.
+
+    Returns:
+        dictionary with arrays of shape values.shape[:-1]
+    """
+    wmesh = np.asarray(wmesh)
+    values = np.asarray(values)
+    nw = len(wmesh)
+    shape = values.shape[:-1]
+    values = values.reshape(-1, nw)
+    rows = np.arange(len(values))
+
+    imax = np.argmax(values, axis=1)
+    amax = values[rows, imax]
+    half = amax[:, None] / 2
+    iw = np.arange(nw)
+    below = values < half
+
+    # Last point below half maximum on the left of the peak and first point on the right.
+    il = np.where(below & (iw < imax[:, None]), iw, -1).max(axis=1)
+    ir = np.where(below & (iw > imax[:, None]), iw, nw).min(axis=1)
+    ok = (il >= 0) & (ir < nw)
+    il, ir = np.where(ok, il, 0), np.where(ok, ir, 1)
+
+    def crossing(i0, i1):
+        a0, a1 = values[rows, i0], values[rows, i1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return wmesh[i0] + (half[:, 0] - a0) * (wmesh[i1] - wmesh[i0]) / (a1 - a0)
+
+    width = np.where(ok, crossing(ir - 1, ir) - crossing(il, il + 1), np.nan)
+
+    return dict(
+        weight=(0.5 * (values[:, 1:] + values[:, :-1]) * np.diff(wmesh)).sum(axis=1).reshape(shape),
+        peak_energy=wmesh[imax].reshape(shape),
+        peak_height=amax.reshape(shape),
+        peak_width=width.reshape(shape),
+    )
+
+
 class Sigmaw(object):
     """This object stores the values of the self-energy as function of frequency"""
 
@@ -850,20 +1113,14 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands):
 
         # Add QPState markers to the KS band structure.
         # Each marker is a list of tuple(x,y,value)
-        for qpattr in QPState.get_fields(exclude=("spin", "band", "kpoint",)):
-            x, y, s = [], [], []
-
-            for spin in range(self.nsppol):
-                for qp in qplist_spin[spin]:
-                    ik = self.ebands.kpoints.index(qp.kpoint)
-                    x.append(ik)
-                    y.append(qp.e0)
-                    size = getattr(qp, qpattr)
-                    # Handle complex quantities
-                    if np.iscomplex(size): size = size.real
-                    s.append(size)
+        kidx_spin = [qplist_spin[spin].get_kindex(ebands.kpoints) for spin in range(self.nsppol)]
+        x = np.concatenate(kidx_spin)
+        y = np.concatenate([qplist_spin[spin].get_field("e0") for spin in range(self.nsppol)])
 
-            ebands.set_marker(qpattr, (x, y, s))
+        for qpattr in QPState.get_fields(exclude=("spin", "band", "kpoint",)):
+            # Handle complex quantities
+            s = np.concatenate([qplist_spin[spin].get_field(qpattr).real for spin in range(self.nsppol)])
+            ebands.set_marker(qpattr, (list(x), list(y), list(s)))
 
         # TODO handle the case in which nkptgw < nkibz
         self.qpgaps = reader.read_qpgaps()
@@ -890,7 +1147,7 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands):
 
     @lazy_property
     def qplist_spin(self):
-        """Tuple of :class:`QPList` objects indexed by spin."""
+        """Tuple of :class:`QPTable` objects indexed by spin."""
         return self.reader.read_allqps()
 
     def get_qplist(self, spin, kpoint):
@@ -942,10 +1199,17 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands):
 
         ax, fig, plt = get_ax_fig_plt(ax)
 
+        # Compute A(w) for all the bands at this k-point in one call.
+        spf = self.reader.read_spfunc_all(spin=spin, kpoints=[kpoint])
+
         for band in bands:
-            sigw = self.get_sigmaw(spin, kpoint, band)
+            i = np.flatnonzero(spf.band == band)
+            if len(i) == 0:
+                raise ValueError("Band %s is not included in the GW calculation" % band)
             label = "skb = %s, %s, %s" % (spin, kpoint, band)
-            sigw.plot_ax(ax, label="$A(\omega)$:" + label, **kwargs)
+            Function1D(spf.wmesh, spf.values[i[0]]).plot_ax(ax, label="$A(\omega)$:" + label, **kwargs)
+
+        ax.legend(loc="best")
 
         return fig
 
@@ -1156,7 +1420,14 @@ class SigresReader(ETSF_Reader):
     ! omega4sd(b1gw:b2gw,nkibz,nomega4sd,nsppol).
     ! Frequencies used to evaluate the Derivative of Sigma.
     """
-    def __init__(self, path):
+    def __init__(self, path, max_cache_bytes=32 * 1024**2):
+        """
+        Args:
+            path: Path to the SIGRES file.
+            max_cache_bytes: Maximum number of bytes used to cache the hyperslabs of the large arrays
+                (hhartree, sigcme, sigxcme, eigvec_qp). These arrays are never loaded in memory in full,
+                the (spin, k-point) blocks are read on demand and the last ones are kept in a LRU cache.
+        """
         self.ks_bands = ElectronBands.from_file(path)
         self.nsppol = self.ks_bands.nsppol
 
@@ -1194,37 +1465,89 @@ class SigresReader(ETSF_Reader):
         self.min_gwbstop = np.min(self.gwbstop_sk)
         self.max_gwbstop = np.max(self.gwbstop_sk)
 
-        self._egw = self.read_value("egw", cmode="c")
+        # LRU cache for the hyperslabs of the large arrays.
+        self.max_cache_bytes = max_cache_bytes
+        self._slab_cache = OrderedDict()
 
-        # Read and save important matrix elements.
-        # All these arrays are dimensioned
-        # vxcme(b1gw:b2gw,nkibz,nsppol*nsig_ab))
-        self._vxcme = self.read_value("vxcme")
-        self._sigxme = self.read_value("sigxme")
+    # The diagonal matrix elements are read from file on first access.
+    # All these arrays are dimensioned
+    # vxcme(b1gw:b2gw,nkibz,nsppol*nsig_ab))
+    @lazy_property
+    def _egw(self):
+        return self.read_value("egw", cmode="c")
 
-        self._hhartree = self.read_value("hhartree", cmode="c")
+    @lazy_property
+    def _vxcme(self):
+        return self.read_value("vxcme")
 
-        self._vUme = self.read_value("vUme")
-        #if self.usepawu == 0: self._vUme.fill(0.0)
+    @lazy_property
+    def _sigxme(self):
+        return self.read_value("sigxme")
 
-        # Complex arrays
-        self._sigcmee0 = self.read_value("sigcmee0", cmode="c")
-        self._ze0 = self.read_value("ze0", cmode="c")
+    @lazy_property
+    def _vUme(self):
+        return self.read_value("vUme")
 
-        # Frequencies for the spectral function.
-        if self.has_spfunc:
-            self._omega_r = self.read_value("omega_r")
+    @lazy_property
+    def _sigcmee0(self):
+        return self.read_value("sigcmee0", cmode="c")
 
-            self._sigcme = self.read_value("sigcme", cmode="c")
-            self._sigxcme = self.read_value("sigxcme", cmode="c")
+    @lazy_property
+    def _ze0(self):
+        return self.read_value("ze0", cmode="c")
 
+    @lazy_property
+    def _en_qp_diago(self):
         # Self-consistent case
-        self._en_qp_diago = self.read_value("en_qp_diago")
+        return self.read_value("en_qp_diago")
 
-        # <KS|QPState>
-        self._eigvec_qp = self.read_value("eigvec_qp", cmode="c")
+    @lazy_property
+    def _omega_r(self):
+        # Frequencies for the spectral function.
+        return self.read_value("omega_r")
 
-        #self._mlda_to_qp
+    # Large arrays read by (spin, k-point) blocks with read_slab_sk.
+    # sigcme and sigxcme have shape (nsppol*nsig_ab, nomega_r, nkibz, b1gw:b2gw)
+    # hhartree has shape (nsppol*nsig_ab, nkibz, b1gw:b2gw, b1gw:b2gw)
+    # eigvec_qp has shape (nsppol, nkibz, nbnds, nbnds)
+    _OMEGA_VARS = ("sigcme", "sigxcme")
+
+    @property
+    def cache_nbytes(self):
+        """Number of bytes stored in the cache of hyperslabs."""
+        return sum(a.nbytes for a in self._slab_cache.values())
+
+    def clear_cache(self):
+        """Remove all the hyperslabs from the cache."""
+        self._slab_cache.clear()
+
+    def read_slab_sk(self, varname, spin, ik):
+        """
+        Read the block of the complex array varname for the given spin and k-point index in the IBZ.
+        Only the hyperslab is read from file. Returns complex array with shape:
+
+            - (nomega_r, b1gw:b2gw) for sigcme, sigxcme
+            - (b1gw:b2gw, b1gw:b2gw) for hhartree
+            - (nbnds, nbnds) for eigvec_qp
+        """
+        key = (varname, spin, ik)
+        try:
+            slab = self._slab_cache.pop(key)
+        except KeyError:
+            index = (spin, slice(None), ik) if varname in self._OMEGA_VARS else (spin, ik)
+            data = np.asarray(self.read_variable(varname)[index])
+            slab = data[..., 0] + 1j * data[..., 1]
+
+        # Move to the end (most recently used) and remove the oldest entries if we exceed the budget.
+        # A block larger than the budget is returned without being cached.
+        if slab.nbytes <= self.max_cache_bytes:
+            self._slab_cache[key] = slab
+            nbytes = self.cache_nbytes
+            while nbytes > self.max_cache_bytes:
+                _, old = self._slab_cache.popitem(last=False)
+                nbytes -= old.nbytes
+
+        return slab
 
     #def is_selfconsistent(self, mode):
     #    return self.gwcalctyp
@@ -1268,26 +1591,75 @@ class SigresReader(ETSF_Reader):
     def read_redc_gwkpoints(self):
         return self.read_value("kptgw")
 
-    def read_allqps(self):
-        qps_spin = self.nsppol * [None]
+    @lazy_property
+    def gwk2ibz(self):
+        """Index of the GW k-points in the IBZ (arrays in the file are dimensioned with nkibz)."""
+        return np.array([self.kpt2fileindex(k) for k in self.gwkpoints], dtype=int)
 
-        for spin in range(self.nsppol):
-            qps = []
-            for gwkpoint in self.gwkpoints:
-                ik = self.gwkpt2seqindex(gwkpoint)
-                bands = range(self.gwbstart_sk[spin,ik], self.gwbstop_sk[spin,ik])
-                for band in bands:
-                    qps.append(self.read_qp(spin, gwkpoint, band))
+    def _get_state_indices(self, spin, kpoints=None):
+        """
+        Indices of the (k, b) states computed for the given spin.
 
-            qps_spin[spin] = QPList(qps)
+        Returns:
+            kcol: Object array with the :class:`Kpoint` of each state.
+            bands: Band indices.
+            ik_file: Index of the k-point in the netcdf arrays.
+            ib_file: Band index in the arrays dimensioned with b1gw:b2gw.
+        """
+        if kpoints is None:
+            kseq = np.arange(len(self.gwkpoints))
+            kobjs = list(self.gwkpoints)
+        else:
+            kseq = np.array([self.gwkpt2seqindex(k) for k in kpoints], dtype=int)
+            kobjs = [self.gwkpoints[ik] if isinstance(k, int) else k for ik, k in zip(kseq, kpoints)]
 
-        return tuple(qps_spin)
+        # Build the (k, b) indices of the states: bands are in [gwbstart_sk, gwbstop_sk).
+        bstart, bstop = self.gwbstart_sk[spin, kseq], self.gwbstop_sk[spin, kseq]
+        nb = bstop - bstart
+        ikrep = np.repeat(np.arange(len(kseq)), nb)
+        offsets = np.arange(nb.sum()) - np.repeat(np.cumsum(nb) - nb, nb)
+        bands = np.repeat(bstart, nb) + offsets
+        ik_file = self.gwk2ibz[kseq][ikrep]
+        ib_file = bands - np.repeat(bstart, nb)
 
-    def read_qplist_sk(self, spin, kpoint):
-        ik = self.gwkpt2seqindex(kpoint)
-        bstart, bstop = self.gwbstart_sk[spin, ik], self.gwbstop_sk[spin, ik]
+        kcol = np.empty(len(ikrep), dtype=object)
+        for i, ik in enumerate(ikrep):
+            kcol[i] = kobjs[ik]
+
+        return kcol, bands, ik_file, ib_file
 
-        return QPList([self.read_qp(spin, kpoint, band) for band in range(bstart, bstop)])
+    def read_qptable(self, spin, kpoints=None):
+        """
+        Read the QP corrections for the given spin and return a :class:`QPTable`.
+        All the quantities are gathered from the netcdf arrays with fancy indexing.
+
+        Args:
+            spin: Spin index.
+            kpoints: List of GW k-points (:class:`Kpoint` or integers). None for all k-points.
+        """
+        kcol, bands, ik_file, ib_file = self._get_state_indices(spin, kpoints=kpoints)
+
+        data = dict(
+            spin=np.full(len(bands), spin, dtype=int),
+            kpoint=kcol,
+            band=bands,
+            e0=self.ks_bands.eigens[spin, ik_file, bands],
+            qpe=self._egw[spin, ik_file, bands],
+            qpe_diago=self._en_qp_diago[spin, ik_file, bands],
+            vxcme=self._vxcme[spin, ik_file, ib_file],
+            sigxme=self._sigxme[spin, ik_file, ib_file],
+            sigcmee0=self._sigcmee0[spin, ik_file, ib_file],
+            vUme=self._vUme[spin, ik_file, ib_file],
+            ze0=self._ze0[spin, ik_file, ib_file],
+        )
+
+        return QPTable(data)
+
+    def read_allqps(self):
+        return tuple(self.read_qptable(spin) for spin in range(self.nsppol))
+
+    def read_qplist_sk(self, spin, kpoint):
+        return self.read_qptable(spin, kpoints=[kpoint])
 
     #def read_qpene(self, spin, kpoint, band)
 
@@ -1325,8 +1697,9 @@ class SigresReader(ETSF_Reader):
             raise ValueError("%s does not contain spectral function data" % self.path)
 
         ik = self.kpt2fileindex(kpoint)
+        ib = band - self.gwbstart_sk[spin, self.gwkpt2seqindex(kpoint)]
 
-        return self._omega_r, self._sigxcme[spin,:,ik,band]
+        return self._omega_r, self.read_slab_sk("sigxcme", spin, ik)[:,ib]
 
     def read_spfunc(self, spin, kpoint, band):
         """
@@ -1342,24 +1715,86 @@ class SigresReader(ETSF_Reader):
         ik = self.kpt2fileindex(kpoint)
         ib = band - self.gwbstart_sk[spin, self.gwkpt2seqindex(kpoint)]
 
-        aim_sigc = np.abs(self._sigcme[spin,:,ik,ib].imag)
+        sigcme = self.read_slab_sk("sigcme", spin, ik)[:,ib]
+        sigxcme = self.read_slab_sk("sigxcme", spin, ik)[:,ib]
+        hhartree = self.read_slab_sk("hhartree", spin, ik)[ib,ib]
+
+        return self._omega_r, _spfunc(self._omega_r, hhartree, sigxcme, sigcme)
+
+    def read_spfunc_all(self, spin=None, kpoints=None, with_peaks=False):
+        """
+        Compute the spectral function of all the states computed in the GW run
+        with a single broadcast expression over (state, frequency).
+
+        Args:
+            spin: Spin index. None for all spins.
+            kpoints: List of GW k-points. None for all k-points.
+            with_peaks: True to compute the integrated spectral weight and the position,
+                height and FWHM of the quasiparticle peak of each state.
+
+        Returns:
+            :class:`AttrDict` with the following entries::
+
+                wmesh: Frequency mesh (nomega_r,) in eV.
+                spin, kpoint, band: Arrays with the indices (and :class:`Kpoint` objects) of the states.
+                values: (nstates, nomega_r) array with A(w).
+
+            and, if with_peaks::
 
-        den = np.zeros(self.nomega_r)
-        for (io, omega) in enumerate(self._omega_r):
-            den[io] = (omega - self._hhartree[spin,ik,ib,ib].real - self._sigxcme[spin,io,ik,ib].real) ** 2 + \
-                self._sigcme[spin,io,ik,ib].imag ** 2
+                weight: Integral of A(w) over the frequency mesh.
+                peak_energy, peak_height: Position and height of the maximum of A(w).
+                peak_width: Full width at half maximum (NaN if the peak is not resolved in the mesh).
+        """
+        if not self.has_spfunc:
+            raise ValueError("%s does not contain spectral function data" % self.path)
+
+        spins = range(self.nsppol) if spin is None else [spin]
+        spin_list, kcols, band_list = [], [], []
+        sigc_list, sigxc_list, hh_list = [], [], []
 
-        return self._omega_r, 1./np.pi * (aim_sigc/den)
+        for spin in spins:
+            kcol, bands, ik_file, ib_file = self._get_state_indices(spin, kpoints=kpoints)
+            spin_list.append(np.full(len(bands), spin, dtype=int))
+            kcols.append(kcol)
+            band_list.append(bands)
+
+            sigc = np.empty((len(bands), self.nomega_r), dtype=np.complex128)
+            sigxc = np.empty((len(bands), self.nomega_r), dtype=np.complex128)
+            hh = np.empty(len(bands), dtype=np.complex128)
+
+            # Read each (spin, k) block only once.
+            for ik in np.unique(ik_file):
+                mask = ik_file == ik
+                ibs = ib_file[mask]
+                sigc[mask] = self.read_slab_sk("sigcme", spin, ik)[:,ibs].T
+                sigxc[mask] = self.read_slab_sk("sigxcme", spin, ik)[:,ibs].T
+                hh[mask] = np.diagonal(self.read_slab_sk("hhartree", spin, ik))[ibs]
+
+            sigc_list.append(sigc)
+            sigxc_list.append(sigxc)
+            hh_list.append(hh)
+
+        wmesh = self._omega_r
+        values = _spfunc(wmesh, np.concatenate(hh_list), np.concatenate(sigxc_list), np.concatenate(sigc_list))
+
+        d = AttrDict(wmesh=wmesh, spin=np.concatenate(spin_list), kpoint=np.concatenate(kcols),
+                     band=np.concatenate(band_list), values=values)
+
+        if with_peaks:
+            d.update(spfunc_peaks(wmesh, values))
+
+        return d
 
     def read_eigvec_qp(self, spin, kpoint, band=None):
         """
         Returns <KS|QPState> for the given spin, kpoint and band. If band is None, <KS_b|QP_{b'}> is returned.
         """
         ik = self.kpt2fileindex(kpoint)
+        eigvec_qp = self.read_slab_sk("eigvec_qp", spin, ik)
         if band is not None:
-            return self._eigvec_qp[spin,ik,:,band]
+            return eigvec_qp[:,band]
         else:
-            return self._eigvec_qp[spin,ik,:,:]
+            return eigvec_qp[:,:]
 
     def read_params(self):
         """
@@ -0,0 +1,273 @@
+# coding: utf-8
+"""
+Interpolation of the quasiparticle corrections in k-space with symmetrized star functions
+(Shankland-Koelling-Wood method). The corrections computed on the GW k-points are fitted
+once and then evaluated on dense k-meshes with matrix products over all the (k, band) states.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__all__ = [
+    "StarFunctionInterpolator",
+    "QPInterpolator",
+]
+
+
+class StarFunctionInterpolator(object):
+    """
+    Interpolate periodic functions f(k) (one or more columns) that are invariant under the
+    point group with the smooth star functions:
+
+        S_m(k) = 1/n_m sum_{R in star_m} cos(2 pi k.R)
+
+    The coefficients are obtained with the Shankland algorithm: the interpolant passes
+    through the input points and minimizes the roughness functional.
+    Time-reversal symmetry f(k) = f(-k) is assumed so that the star functions are real.
+
+    .. note::
+
+        Input k-points must be in the irreducible zone (no symmetry-equivalent points).
+    """
+    # Parameters of the roughness functional.
+    C1, C2 = 0.75, 0.75
+
+    def __init__(self, lattice, symrel, kfrac, values, lpratio=5):
+        """
+        Args:
+            lattice: pymatgen :class:`Lattice` of the real-space lattice.
+            symrel: (nsym, 3, 3) array with the rotations in real space (reduced coordinates).
+            kfrac: (nk, 3) array with the reduced coordinates of the input k-points.
+            values: (nk,) or (nk, nvals) array with the values to interpolate.
+            lpratio: Ratio between the number of star functions and the number of input k-points.
+        """
+        kfrac = np.reshape(kfrac, (-1, 3))
+        values = np.asarray(values, dtype=float)
+        self.is_1d = values.ndim == 1
+        values = np.reshape(values, (len(kfrac), -1))
+
+        self.lpratio = lpratio
+        self.symrel = np.reshape(symrel, (-1, 3, 3))
+        nstars = max(lpratio * len(kfrac), 1)
+        self.rpoints, self.rstar, self.rlengths = _find_stars(lattice.matrix, self.symrel, nstars)
+
+        # Weights 1/n_m of the members of each star.
+        self.nstars = self.rstar.max() + 1
+        counts = np.bincount(self.rstar, minlength=self.nstars)
+        self._rweights = 1.0 / counts[self.rstar]
+
+        # Shankland fit.
+        smat = self.get_starfuncs(kfrac)
+        nk = len(kfrac)
+        coeffs = np.zeros((self.nstars, values.shape[1]))
+
+        if nk > 1:
+            rho = _roughness(self.rlengths[1:], self.C1, self.C2)
+            dsmat = smat[:-1, 1:] - smat[-1, 1:]
+            hmat = np.dot(dsmat / rho, dsmat.T)
+            lambdas, _, _, _ = np.linalg.lstsq(hmat, values[:-1] - values[-1], rcond=-1)
+            coeffs[1:] = np.dot(dsmat.T, lambdas) / rho[:, None]
+
+        coeffs[0] = values[-1] - np.dot(smat[-1, 1:], coeffs[1:])
+        self.coeffs = coeffs
+
+        # Fold the coefficients with the star weights so that eval requires a single matrix product.
+        # Since -R belongs to the star of R, only half of the vectors are needed: keep the vectors whose
+        # first non-zero component is positive (and R = 0) and double their weight.
+        rcoeffs = self._rweights[:, None] * coeffs[self.rstar]
+        first_nz = np.choose(np.argmax(self.rpoints != 0, axis=1), self.rpoints.T)
+        keep = first_nz >= 0
+        self._hpoints = self.rpoints[keep]
+        self._hcoeffs = np.where(first_nz[keep, None] > 0, 2, 1) * rcoeffs[keep]
+
+    def get_starfuncs(self, kfrac):
+        """(nk, nstars) array with the star functions evaluated at the k-points kfrac."""
+        kfrac = np.reshape(kfrac, (-1, 3))
+        cosines = np.cos(2 * np.pi * np.dot(kfrac, self.rpoints.T))
+        smat = np.zeros((len(kfrac), self.nstars))
+        np.add.at(smat.T, self.rstar, (cosines * self._rweights).T)
+        return smat
+
+    def eval(self, kfrac, max_nbytes=2**26):
+        """
+        Evaluate the interpolant at the k-points kfrac (reduced coordinates).
+        The k-points are processed in chunks so that the temporary arrays use at most max_nbytes.
+
+        Returns:
+            (nk, nvals) array (or (nk,) if the input values were 1d).
+        """
+        kfrac = np.reshape(kfrac, (-1, 3))
+        chunk = max(1, max_nbytes // (8 * len(self._hpoints)))
+        out = np.empty((len(kfrac), self._hcoeffs.shape[1]))
+
+        for start in range(0, len(kfrac), chunk):
+            stop = start + chunk
+            cosines = np.cos(2 * np.pi * np.dot(kfrac[start:stop], self._hpoints.T))
+            out[start:stop] = np.dot(cosines, self._hcoeffs)
+
+        return out[:, 0] if self.is_1d else out
+
+
+def _roughness(r, c1, c2):
+    """Roughness weights of the Shankland method for stars with lengths r (r[0] != 0)."""
+    x2 = (r / r[0]) ** 2
+    return (1 - c1 * x2) ** 2 + c2 * x2 ** 3
+
+
+def _find_stars(lattice_matrix, symrel, nstars):
+    """
+    Find the first nstars stars of real-space lattice vectors ordered by length.
+
+    Returns:
+        rpoints: (nr, 3) integer array with all the members of the stars.
+        rstar: (nr,) array with the index of the star of each member.
+        rlengths: (nstars,) array with the length of the vectors of each star.
+    """
+    # Use the volume per vector to estimate the radius of the sphere.
+    vol = abs(np.linalg.det(lattice_matrix))
+    nsym_eff = 2 * len(symrel)
+    rmax = (3 * vol * nstars * nsym_eff / (4 * np.pi)) ** (1/3)
+
+    while True:
+        # Max number of cells along each direction (the norms of the columns of A^-1 give
+        # the inverse distances between the lattice planes).
+        nmax = np.ceil(rmax * np.linalg.norm(np.linalg.inv(lattice_matrix), axis=0)).astype(int)
+        grid = np.mgrid[-nmax[0]:nmax[0]+1, -nmax[1]:nmax[1]+1, -nmax[2]:nmax[2]+1].reshape(3, -1).T
+        lengths = np.linalg.norm(np.dot(grid, lattice_matrix), axis=1)
+        keep = lengths <= rmax
+        grid, lengths = grid[keep], lengths[keep]
+
+        # Canonical representative of the star: the image with largest integer key.
+        # Time reversal is included by adding -R.
+        images = np.einsum("sij,nj->nsi", symrel, grid)
+        images = np.concatenate((images, -images), axis=1)
+        base = 2 * np.abs(grid).max() + 1
+        keys = np.dot(images + base // 2, [base * base, base, 1])
+        star_keys = keys.max(axis=1)
+
+        # Sort the stars by length (and key to break ties in a deterministic way).
+        ukeys, first, rstar = np.unique(star_keys, return_index=True, return_inverse=True)
+        order = np.lexsort((ukeys, np.round(lengths[first], 8)))
+
+        # The largest star must be complete: it is inside the sphere only if its length < rmax.
+        if len(order) > nstars and lengths[first[order[nstars - 1]]] < rmax:
+            break
+        rmax *= 1.5
+
+    rank = np.empty(len(order), dtype=int)
+    rank[order] = np.arange(len(order))
+    rstar = rank[rstar]
+    sel = rstar < nstars
+
+    return grid[sel], rstar[sel], lengths[first[order[:nstars]]]
+
+
+class QPInterpolator(object):
+    """
+    Interpolate the QP corrections E_QP - E_KS computed in a GW run with star functions
+    in k-space, independently for each band. The interpolated corrections can be applied
+    to the KS band structure computed on a dense k-mesh or along a k-path.
+
+    Bands that are not included in the GW calculation (or that are not computed at all
+    the GW k-points) are corrected with the interpolant of the closest computed band.
+
+    Usage example:
+
+    .. code-block:: python
+
+        with abiopen("foo_SIGRES.nc") as sigres:
+            qpinterp = QPInterpolator.from_sigres(sigres)
+
+        qp_ebands = qpinterp.interpolate_ebands(ks_ebands)
+        qp_ebands.get_edos().plot()
+    """
+    def __init__(self, structure, qps_spin, lpratio=5):
+        """
+        Args:
+            structure: :class:`Structure` with the spacegroup.
+            qps_spin: List of :class:`QPTable` (or :class:`QPList`) for each spin.
+                The k-points must be in the IBZ.
+            lpratio: Ratio between the number of star functions and the number of GW k-points.
+        """
+        from abipy.electrons.gw import QPTable
+        self.structure = structure
+        symrel = structure.spacegroup.symrel
+        self.bstart_spin, self.interps = [], []
+
+        for qps in qps_spin:
+            if not isinstance(qps, QPTable): qps = QPTable.from_qps(qps)
+
+            # Build the (nk, nband) table with the corrections.
+            kcoords, bands = qps.get_kcoords(), qps.get_field("band")
+            kkeys = np.round(np.mod(kcoords, 1) * 1e6).astype(np.int64) % 1000000
+            _, kfirst, kidx = np.unique(kkeys, axis=0, return_index=True, return_inverse=True)
+            kidx = np.ravel(kidx)
+            nk = len(kfirst)
+
+            # Select the bands computed at all the k-points.
+            ubands, counts = np.unique(bands, return_counts=True)
+            common = ubands[counts == nk]
+            if len(common) == 0:
+                raise ValueError("Cannot find bands computed at all the GW k-points")
+            if np.any(np.diff(common) != 1):
+                raise ValueError("Bands computed at all the GW k-points are not contiguous: %s" % str(common))
+
+            table = np.zeros((nk, len(common)))
+            mask = (bands >= common[0]) & (bands <= common[-1])
+            table[kidx[mask], bands[mask] - common[0]] = qps.get_qpeme0().real[mask]
+
+            self.bstart_spin.append(int(common[0]))
+            self.interps.append(StarFunctionInterpolator(structure.lattice, symrel, kcoords[kfirst], table,
+                                                         lpratio=lpratio))
+
+    @classmethod
+    def from_sigres(cls, sigres, lpratio=5):
+        """Build the object from a :class:`SigresFile`."""
+        return cls(sigres.structure, sigres.qplist_spin, lpratio=lpratio)
+
+    @property
+    def nsppol(self):
+        return len(self.interps)
+
+    def eval_sk(self, spin, kfrac, bands):
+        """
+        Interpolated QP corrections (eV) for the given spin.
+
+        Args:
+            spin: Spin index.
+            kfrac: (nk, 3) array with the reduced coordinates of the k-points.
+            bands: Array with band indices.
+
+        Returns:
+            (nk, len(bands)) array.
+        """
+        interp = self.interps[spin]
+        corrs = interp.eval(kfrac)
+        if corrs.ndim == 1: corrs = corrs[:, None]
+        ib = np.clip(np.asarray(bands) - self.bstart_spin[spin], 0, corrs.shape[1] - 1)
+        return corrs[:, ib]
+
+    def interpolate_ebands(self, ebands):
+        """
+        Apply the interpolated QP corrections to the KS band structure ebands.
+
+        Returns:
+            New instance of :class:`ElectronBands` with the QP energies.
+            Occupations and Fermi level are left unchanged.
+        """
+        from abipy.electrons.ebands import ElectronBands
+        if ebands.nsppol != self.nsppol:
+            raise ValueError("ebands.nsppol %d != %d" % (ebands.nsppol, self.nsppol))
+
+        kfrac = ebands.kpoints.frac_coords
+        qp_energies = ebands.eigens.copy()
+        for spin in range(self.nsppol):
+            qp_energies[spin] += self.eval_sk(spin, kfrac, np.arange(ebands.mband))
+
+        return ElectronBands(
+            ebands.structure, ebands.kpoints, qp_energies, ebands.fermie, ebands.occfacts, ebands.nelect,
+            nband_sk=ebands.nband_sk, smearing=ebands.smearing, markers=ebands.markers)
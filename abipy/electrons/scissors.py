@@ -68,7 +68,8 @@ class Scissors(object):
 
         if blow.lower() == "c":
             try:
-                self.func_low = lambda x: float(bounds[0][1])
+                c_low = float(bounds[0][1])
+                self.func_low = lambda x: c_low
             except:
                 x_low = self.domains[0,0]
                 fx_low = func_list[0](x_low)
@@ -78,44 +79,64 @@ class Scissors(object):
 
         if bhigh.lower() == "c":
             try:
-                self.func_high = lambda x: float(bounds[1][1])
+                c_high = float(bounds[1][1])
+                self.func_high = lambda x: c_high
             except:
-                x_high = self.domains[1, -1]
+                x_high = self.domains[-1, 1]
                 fx_high = func_list[-1](x_high)
                 self.func_high = lambda x: fx_high
         else:
             raise NotImplementedError("Only constant boundaries are implemented")
 
-        # This counter stores the number of points that are out of bounds.
-        self.out_bounds = np.zeros(3, np.int)
+        # This counter stores the number of points that are out of bounds:
+        # [below the first domain, above the last domain, inside a hole]
+        self.out_bounds = np.zeros(3, dtype=int)
 
     def apply(self, eig):
-        """Correct the eigenvalue eig (eV units)."""
-        # Get the list of domains.
+        """
+        Correct the eigenvalues eig (eV units).
+
+        Args:
+            eig: Scalar or array with the eigenvalues.
+
+        Returns:
+            Corrections with the same shape as eig (float if eig is a scalar).
+            The number of eigenvalues outside the domains is recorded in `out_bounds`.
+
+        Raise:
+            `ScissorsError` if one of the eigenvalues falls inside a hole between two domains.
+        """
         domains = self.domains
+        eigs = np.asarray(eig, dtype=float)
+        flat = eigs.ravel()
+
+        # Index of the first domain whose upper bound is >= eig.
+        # The eigenvalue is inside this domain if it is also >= lower bound.
+        idx = np.searchsorted(domains[:,1], flat, side="left")
+        below = flat < domains[0,0]
+        above = flat > domains[-1,1]
+        inside = ~(below | above)
+        inside[inside] = flat[inside] >= domains[idx[inside], 0]
 
-        if eig < domains[0,0]:
-            # Eig is below the first point of the first domain.
-            # Call func_low
-            print("left ", eig, " < ", domains[0,0])
-            self.out_bounds[0] += 1
-            return self.func_low(eig)
+        nholes = flat.size - below.sum() - above.sum() - inside.sum()
+        self.out_bounds += [below.sum(), above.sum(), nholes]
+        if nholes:
+            bad = flat[~(below | above | inside)]
+            raise self.Error("Cannot find location of eigenvalues %s in domains:\n%s" % (bad, domains))
 
-        if eig > domains[-1,1]:
-            # Eig is above the last point of the last domain.
-            # Call func_high
-            print("right ", eig, " > ", domains[-1,1])
-            self.out_bounds[1] += 1
-            return self.func_high(eig)
+        corrs = np.empty(flat.shape)
+        if below.any(): corrs[below] = self.func_low(flat[below])
+        if above.any(): corrs[above] = self.func_high(flat[above])
 
-        # eig is inside the domains: find the domain 
-        # and call the corresponding function.
-        for idx, dms in enumerate(domains):
-            if dms[1] >= eig >= dms[0]:
-                return self.func_list[idx](eig)
+        # Evaluate each function on the subset of eigenvalues in its domain.
+        for i in np.unique(idx[inside]):
+            mask = inside & (idx == i)
+            corrs[mask] = self.func_list[i](flat[mask])
 
-        self.out_bounds[2] += 1
-        raise self.Error("Cannot find location of eigenvalue %s in domains:\n%s" % (eig, domains))
+        if eigs.ndim == 0:
+            return float(corrs[0])
+
+        return corrs.reshape(eigs.shape)
 
 
 class ScissorsBuilder(object):
@@ -292,7 +313,7 @@ class ScissorsBuilder(object):
 
             ax.scatter(e0mesh, qpcorrs, label="Input QP corrections, spin %s" % spin)
             scissors = self._scissors_spin[spin]
-            intp_qpc = [scissors.apply(e0) for e0 in e0mesh]
+            intp_qpc = scissors.apply(e0mesh)
             ax.plot(e0mesh, intp_qpc, label="Scissors operator, spin %s" % spin)
         
         ax.grid(True)
@@ -350,16 +371,17 @@ class ScissorsBuilder(object):
         #qp_marker = 50
         if qp_marker is not None:
             # Compute correspondence between the k-points in qp_list and the k-path in qp_bands.
-            # TODO
-            # WARNING: strictly speaking one should check if qp_kpoint is in the star of k-point.
-            # but compute_star is too slow if written in pure python.
+            # A QP k-point is associated to all the points of the path belonging to its star.
+            spacegroup = ks_bands.structure.spacegroup
+            path_keys = spacegroup.analyze_kpoints(qp_bands.kpoints.frac_coords).star_keys
+            qp_keys_spin = [spacegroup.analyze_kpoints([qp.kpoint.frac_coords for qp in qps]).star_keys
+                            for qps in self._qps_spin]
+
             x, y, s = [], [], []
-            for ik_path, kpoint in enumerate(qp_bands.kpoints):
-                #kstar = kpoint.compute_star(structure.fm_symmops)
+            for ik_path, path_key in enumerate(path_keys):
                 for spin in range(self.nsppol):
-                    for ik_qp, qp in enumerate(self._qps_spin[spin]):
-                        if qp.kpoint == kpoint:
-                        #if qp.kpoint in kstar:
+                    for qp, qp_key in zip(self._qps_spin[spin], qp_keys_spin[spin]):
+                        if qp_key == path_key:
                             x.append(ik_path)
                             y.append(np.real(qp.qpe))
                             s.append(qp_marker)
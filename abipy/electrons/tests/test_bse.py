@@ -1,6 +1,7 @@
 """Tests for electrons.bse module"""
 from __future__ import print_function, division
 
+import numpy as np
 import abipy.data as data
 
 from abipy.electrons.bse import *
@@ -30,6 +31,45 @@ class TestMDF_Reader(AbipyTest):
             plotter.add_mdf("GW-RPA", gwnlf_mdf)
             #plotter.plot()
 
+    def test_lazy_reading(self):
+        """Test partial reads of the MDF and summaries."""
+        mdf_file = data.ref_file("tbs_4o_DS2_MDF.nc")
+        clear_mdf_cache()
+
+        with MdfReader(mdf_file) as r:
+            emacros = r.read_mdf_qslice("exc_mdf", qindices=[3, 1])
+            full = r.read_value("exc_mdf", cmode="c")
+            self.assert_almost_equal(emacros, full[[3, 1]])
+            self.assert_almost_equal(r.read_mdf_qslice("exc_mdf"), full)
+
+            # Summary computed from Im[MDF] averaged over q.
+            wmesh, im_avg = r.wmesh, full.imag.mean(axis=0)
+            summary = r.read_mdf_summary("exc")
+            self.assertAlmostEqual(summary["peak_energy"], wmesh[np.argmax(im_avg)])
+            self.assertAlmostEqual(summary["peak_height"], im_avg.max())
+            weight = np.sum(0.5 * (im_avg[1:] + im_avg[:-1]) * np.diff(wmesh))
+            self.assertAlmostEqual(summary["weight"], weight)
+
+        with MdfFile(mdf_file) as mdf:
+            with MdfReader(mdf_file) as r:
+                assert mdf.get_mdf_summary("rpa") == r.read_mdf_summary("rpa")
+            with self.assertRaises(ValueError): mdf.get_mdf_summary("foo")
+
+    def test_kramers_kronig(self):
+        """Test Kramers-Kronig and effective number of electrons."""
+        with MdfFile(data.ref_file("tbs_4o_DS2_MDF.nc")) as mdf_file:
+            exc_mdf = mdf_file.get_mdf("exc")
+            nq, nw = exc_mdf.num_qpoints, len(exc_mdf.wmesh)
+
+            kk = mdf_file.get_kramers_kronig()
+            assert list(kk.keys()) == ["exc", "rpa", "gwrpa"]
+            self.assert_almost_equal(kk["exc"], exc_mdf.kramers_kronig())
+            self.assertTrue(kk["rpa"].shape == (nq, nw))
+
+            neff = mdf_file.get_neff(mdf_types=["exc"])["exc"]
+            self.assert_almost_equal(neff, exc_mdf.get_neff())
+            assert np.all(neff[:, -1] > 0)
+
     def test_TSR(self):
         """Test the computation of Tensor"""
         mdf_file = MdfFile(data.ref_file("tbs_4o_DS2_MDF.nc"))
@@ -38,6 +78,18 @@ class TestMDF_Reader(AbipyTest):
         rpa_tsr = mdf_file.get_tensor("rpa")
         gw_tsr = mdf_file.get_tensor("gwrpa")
 
+        nw = len(mdf_file.get_mdf("exc").wmesh)
+        red = exc_tsr.to_array()
+        self.assertTrue(red.shape == (nw, 3, 3))
+        self.assert_almost_equal(red, np.transpose(red, (0, 2, 1)))
+        self.assertTrue(len(exc_tsr.to_func1d()) == 9)
+
+        # Symmetrization is a projection.
+        exc_tsr.symmetrize(mdf_file.structure)
+        sym_cart = exc_tsr.to_array(red_coords=False)
+        exc_tsr.symmetrize(mdf_file.structure)
+        self.assert_almost_equal(exc_tsr.to_array(red_coords=False), sym_cart)
+
         #exc_tsr.plot()
 
 if __name__ == "__main__":
@@ -7,7 +7,7 @@ import abipy.data as data
 
 from abipy.abilab import abiopen
 from abipy.electrons.gw import *
-from abipy.electrons.gw import SigresReader
+from abipy.electrons.gw import SigresReader, QPList, QPTable
 from abipy.core.testing import *
 
 class TestQPList(AbipyTest):
@@ -57,6 +57,31 @@ class TestQPList(AbipyTest):
         self.assertAlmostEqual(qp.sigxme, -16.549383605401)
 
 
+    def test_qptable(self):
+        """Test QPTable against QPList."""
+        sigres = self.sigres
+        qptab = sigres.qplist_spin[0]
+        self.assertTrue(isinstance(qptab, QPTable))
+
+        # Build the QPList with the per-state API.
+        qplist = QPList([sigres.get_qpcorr(qp.spin, qp.kpoint, qp.band) for qp in qptab])
+        self.assertTrue(len(qplist) == len(qptab))
+        for qp_tab, qp_list in zip(qptab, qplist):
+            self.assertTrue(qp_tab == qp_list)
+
+        self.assert_equal(qptab.get_qpeme0(), qplist.get_qpeme0())
+        self.assert_equal(qptab.sort_by_e0().get_e0mesh(), qplist.sort_by_e0().get_e0mesh())
+        self.assertTrue(str(qptab.to_table()) == str(qplist.to_table()))
+        self.assertTrue(QPTable.from_qps(qplist) == qptab)
+
+        qp = qplist[3]
+        self.assertTrue(qptab.get_value(qp.skb, "sigxme") == qp.sigxme)
+        self.assertTrue(qptab.get_value((0, qp.kpoint, 1000), "sigxme") is None)
+
+        sub = qptab[qptab.get_field("band") == qp.band]
+        self.assertTrue(isinstance(sub, QPTable) and len(sub) == len(sigres.gwkpoints))
+
+
 class TestSigresFile(AbipyTest):
 
     def test_readall(self):
@@ -93,6 +118,48 @@ class TestSigresFile(AbipyTest):
         self.assert_almost_equal(sigres.qpgaps, np.reshape(qpgaps, (1,6)))
 
 
+    def test_lazy_reader(self):
+        """Test the hyperslabs read by SigresReader."""
+        reader = SigresReader(data.ref_file("al_g0w0_sigmaw_SIGRES.nc"), max_cache_bytes=10000)
+        self.assertTrue(reader.cache_nbytes == 0)
+
+        kpoint = reader.gwkpoints[0]
+        band = reader.gwbstart_sk[0, 0]
+        omegas, spfunc = reader.read_spfunc(spin=0, kpoint=kpoint, band=band)
+        self.assertTrue(len(omegas) == len(spfunc) == reader.nomega_r)
+        self.assertTrue(np.all(spfunc >= 0))
+        self.assertTrue(0 < reader.cache_nbytes <= 10000)
+
+        ik = reader.kpt2fileindex(kpoint)
+        sigxcme = reader.read_slab_sk("sigxcme", 0, ik)
+        self.assertTrue(sigxcme.shape == (reader.nomega_r, reader.gwbstop_sk[0, 0] - band))
+        self.assert_equal(reader.read_sigmaw(0, kpoint, band)[1], sigxcme[:, 0])
+
+        eigvec = reader.read_eigvec_qp(0, kpoint)
+        self.assert_equal(reader.read_eigvec_qp(0, kpoint, band=band), eigvec[:, band])
+        self.assertTrue(reader.cache_nbytes <= 10000)
+
+        reader.clear_cache()
+        self.assertTrue(reader.cache_nbytes == 0)
+        reader.close()
+
+
+    def test_spfunc_all(self):
+        """Test the batched evaluation of the spectral functions."""
+        reader = SigresReader(data.ref_file("al_g0w0_sigmaw_SIGRES.nc"))
+        spf = reader.read_spfunc_all(with_peaks=True)
+        self.assertTrue(spf.values.shape == (len(spf.band), reader.nomega_r))
+
+        for i, (spin, kpoint, band) in enumerate(zip(spf.spin, spf.kpoint, spf.band)):
+            wmesh, values = reader.read_spfunc(spin, kpoint, band)
+            self.assert_almost_equal(spf.values[i], values)
+            self.assertAlmostEqual(spf.peak_energy[i], wmesh[np.argmax(values)])
+
+        self.assertTrue(np.all(spf.weight > 0))
+        self.assertTrue(spf.peak_width.shape == spf.band.shape)
+        reader.close()
+
+
 if __name__ == "__main__":
     import unittest
     unittest.main()
@@ -0,0 +1,47 @@
+"""Tests for electrons.qpinterp module"""
+from __future__ import print_function, division
+
+import numpy as np
+import abipy.data as data
+
+from abipy.abilab import abiopen
+from abipy.electrons.qpinterp import StarFunctionInterpolator, QPInterpolator
+from abipy.core.testing import *
+
+
+class QPInterpolatorTest(AbipyTest):
+
+    def test_starfunctions(self):
+        """Star-function interpolation of a function with cubic symmetry."""
+        sigres = abiopen(data.ref_file("tgw1_9o_DS4_SIGRES.nc"))
+        structure = sigres.structure
+        kfrac = sigres.ibz.frac_coords
+
+        # Sum of cosines over the vectors of the first star.
+        interp = StarFunctionInterpolator(structure.lattice, structure.spacegroup.symrel, kfrac, np.zeros(len(kfrac)))
+        rvecs = interp.rpoints[interp.rstar == 1]
+        func = lambda k: np.cos(2 * np.pi * np.dot(k, rvecs.T)).sum(axis=1)
+
+        interp = StarFunctionInterpolator(structure.lattice, structure.spacegroup.symrel, kfrac, func(kfrac))
+        self.assert_almost_equal(interp.eval(kfrac), func(kfrac))
+        self.assert_almost_equal(interp.eval(-kfrac), func(kfrac))
+        sigres.close()
+
+    def test_qpinterpolator(self):
+        """Interpolation of the QP corrections."""
+        sigres = abiopen(data.ref_file("tgw1_9o_DS4_SIGRES.nc"))
+        qpinterp = QPInterpolator.from_sigres(sigres)
+        self.assertTrue(qpinterp.nsppol == sigres.nsppol)
+
+        # The interpolant must reproduce the ab-initio corrections at the GW k-points (here kptgw == IBZ)
+        qp_ebands = qpinterp.interpolate_ebands(sigres.ebands)
+        for qp in sigres.qplist_spin[0]:
+            ik = sigres.ebands.kpoints.index(qp.kpoint)
+            self.assertAlmostEqual(qp_ebands.eigens[0, ik, qp.band], qp.e0 + qp.qpeme0.real)
+
+        sigres.close()
+
+
+if __name__ == "__main__":
+    import unittest
+    unittest.main()
@@ -0,0 +1,44 @@
+"""Tests for electrons.scissors module"""
+from __future__ import print_function, division
+
+import numpy as np
+import abipy.data as data
+
+from abipy.electrons.ebands import ElectronBands
+from abipy.electrons.scissors import Scissors
+from abipy.core.testing import *
+
+
+class ScissorsTest(AbipyTest):
+
+    def test_apply(self):
+        """Test Scissors.apply with scalars and arrays."""
+        func_list = [lambda x: 0.1 * x, lambda x: 1 + 0.2 * x]
+        sciss = Scissors(func_list, domains=[[-5, 0], [0, 3]], residues=[0, 0])
+
+        eigs = np.array([-6, -5, -1, 0, 1, 3, 4.])
+        ref = [-0.5, -0.5, -0.1, 0.0, 1.2, 1.6, 1.6]
+        self.assert_almost_equal(sciss.apply(eigs), ref)
+        self.assert_almost_equal(sciss.apply(eigs.reshape(7, 1)), np.reshape(ref, (7, 1)))
+        self.assertAlmostEqual(sciss.apply(-1.0), -0.1)
+        self.assert_equal(sciss.out_bounds, [1, 1, 0])
+
+        # Eigenvalues in the hole between two domains.
+        sciss = Scissors(func_list, domains=[[-5, -1], [0, 3]], residues=[0, 0])
+        with self.assertRaises(sciss.Error):
+            sciss.apply([-0.5, 1])
+        self.assert_equal(sciss.out_bounds, [0, 0, 1])
+
+    def test_apply_scissors(self):
+        """Test ElectronBands.apply_scissors."""
+        ebands = ElectronBands.from_file(data.ref_file("si_scf_WFK-etsf.nc"))
+        emin, emax = ebands.eigens.min(), ebands.eigens.max()
+        sciss = Scissors([lambda x: 0.5 + 0 * x], domains=[[emin, emax]], residues=[0])
+
+        qp_ebands = ebands.apply_scissors(sciss)
+        self.assert_almost_equal(qp_ebands.eigens, ebands.eigens + 0.5)
+
+
+if __name__ == "__main__":
+    import unittest
+    unittest.main()
@@ -0,0 +1,41 @@
+# coding: utf-8
+"""Tools to distribute independent tasks over a pool of workers."""
+from __future__ import print_function, division, unicode_literals
+
+from monty.dev import get_ncpus
+
+__all__ = [
+    "map_parallel",
+]
+
+
+def map_parallel(func, args, num_cpus=None, threads=False):
+    """
+    Apply func to each item in args using a pool of num_cpus workers.
+    Returns the list of results in the same order as args.
+
+    Args:
+        func: Callable. Must be picklable (module-level function) unless threads is True.
+        args: List of arguments passed to func.
+        num_cpus: Number of workers. Autodetected if None.
+        threads: Use a pool of threads instead of processes. Threads are enough
+            when the heavy lifting is done by external processes (e.g. anaddb).
+    """
+    num_cpus = get_ncpus() if num_cpus is None else num_cpus
+    if num_cpus is None or num_cpus <= 0: num_cpus = 1
+    num_cpus = min(num_cpus, len(args))
+
+    if num_cpus <= 1:
+        return [func(arg) for arg in args]
+
+    if threads:
+        from multiprocessing.pool import ThreadPool as Pool
+    else:
+        from multiprocessing import Pool
+
+    pool = Pool(processes=num_cpus)
+    try:
+        return pool.map(func, args)
+    finally:
+        pool.close()
+        pool.join()
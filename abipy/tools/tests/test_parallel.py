@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""Tests for parallel module."""
+from __future__ import print_function, division
+
+from abipy.tools.parallel import map_parallel
+from abipy.core.testing import *
+
+
+def _square(x):
+    return x * x
+
+
+class TestMapParallel(AbipyTest):
+    """Test map_parallel."""
+
+    def test_map_parallel(self):
+        """Testing map_parallel"""
+        args = list(range(7))
+        expected = [x * x for x in args]
+        self.assertEqual(map_parallel(_square, args, num_cpus=1), expected)
+        self.assertEqual(map_parallel(_square, args, num_cpus=2), expected)
+        self.assertEqual(map_parallel(_square, [], num_cpus=2), [])
+
+        # Threads accept closures.
+        offset = 1
+        self.assertEqual(map_parallel(lambda x: x * x + offset, args, num_cpus=3, threads=True),
+                         [e + 1 for e in expected])
+
+
+if __name__ == "__main__":
+    import unittest
+    unittest.main()
@@ -59,6 +59,32 @@ class TestWFKFile(AbipyTest):
             if self.which("xcrysden") is not None:
                 wave.export_ur2(".xsf", structure)
 
+    def test_classify_ebands(self):
+        """Classification of the bands of silicon with the irreps of the little group."""
+        wfk = WfkFile(data.ref_file("si_nscf_WFK-etsf.nc"))
+
+        # Gamma point: Gamma_1, Gamma_25', Gamma_15, Gamma_2'
+        kgamma = [k for k, kpt in enumerate(wfk.kpoints) if np.allclose(kpt.frac_coords, 0)][0]
+        dmats = wfk.classify_ebands(0, kgamma, range(8))
+        self.assertEqual(dmats.kgroup.sch_symbol, "Oh")
+        self.assertEqual(dmats.classify(), ["A1g", "T2g", "T1u", "A2u"])
+        self.assert_almost_equal(dmats.all_traces(0), np.ones(48))
+        self.assertEqual(dmats.decompose()[1], {"T2g": 1})
+
+        # D(R) of the spatial operations are unitary.
+        for dmat in dmats.dmats:
+            prods = np.einsum("sab,sac->sbc", dmat.conj(), dmat)
+            self.assert_almost_equal(prods, np.tile(np.eye(dmat.shape[1]), (len(dmat), 1, 1)))
+
+        # All the k-points of the path, serial and parallel runs must agree.
+        table = wfk.classify_ebands_kpath(0, range(8))
+        self.assertEqual(set(table["kidx"]), set(range(wfk.nkpt)))
+        self.assertEqual(list(table[table["kidx"] == kgamma]["label"]), ["A1g", "T2g", "T1u", "A2u"])
+        same = wfk.classify_ebands_kpath(0, range(8), num_cpus=2)
+        self.assertEqual(list(table["label"]), list(same["label"]))
+
+        wfk.close()
+
 
 if __name__ == "__main__":
    import unittest
@@ -12,6 +12,9 @@ from abipy.iotools import ETSF_Reader, Visualizer
 from abipy.electrons import ElectronsReader
 from abipy.waves.pwwave import PWWaveFunction
 
+import logging
+logger = logging.getLogger(__name__)
+
 __all__ = [
     "WfkFile",
 ]
@@ -201,7 +204,13 @@ class WfkFile(AbinitNcFile, Has_Structure, Has_ElectronBands):
             kpoint: K-point index or :class:`Kpoint` object 
             bands_range: Range of band indices to analyze.
             tol_ediff: Tolerance on the energy difference (in eV)
+
+        Returns:
+            :class:`DMatrices` object with the D(R) matrices of the degenerate sets.
         """
+        if self.nspinor != 1:
+            raise NotImplementedError("Classification of spinor wavefunctions is not implemented")
+
         # Extract the k-point index to speed up the calls belows
         k = self.kindex(kpoint)
         kpoint = self.kpoints[k]
@@ -209,21 +218,85 @@ class WfkFile(AbinitNcFile, Has_Structure, Has_ElectronBands):
         # Find the set of degenerate states at the given spin and k-point.
         deg_ebands = self.ebands.degeneracies(spin, k, bands_range, tol_ediff=tol_ediff)
 
-        # Create list of tuples (energy, waves) for each degenerate set.
-        deg_ewaves = []
-        for e, bands in deg_ebands:
-            deg_ewaves.append((e, [self.get_wave(spin, k, band) for band in bands])) 
+        # Find the little group of the k-point and extract the spatial operations
+        # (same order as in ltk.kgroup, time-reversal is not included).
+        ltk = self.structure.spacegroup.find_little_group(kpoint)
+        ops_g0 = [(op, g0) for (op, g0) in ltk.iter_symmop_g0() if not op.has_timerev]
+        rot_g = np.array([op.rot_g for (op, _) in ops_g0])
+        tau = np.array([op.tau for (op, _) in ops_g0])
+        g0vecs = np.array([g0 for (_, g0) in ops_g0])
+
+        # Compute D(R) for all the bands in the window with a single read and take the diagonal blocks.
+        bands = [band for (_, bs) in deg_ebands for band in bs]
+        ug = self.reader.read_ug_block(spin, k, bands)[:, 0, :]
+        dmats_all = compute_dmats(ug, self.gspheres[k].gvecs, rot_g, tau, g0vecs)
 
-        print("degeneracies detected:", deg_ebands)
-        #print(deg_ewaves)
+        dmats, start = [], 0
+        for (_, bs) in deg_ebands:
+            stop = start + len(bs)
+            dmats.append(dmats_all[:, start:stop, start:stop])
+            start = stop
 
-        # Find the little group of the k-point
-        ltk = self.structure.spacegroup.find_little_group(kpoint)
-        #assert ltk.is_group()
+        return DMatrices(ltk, deg_ebands, dmats)
+
+    def classify_ebands_kpath(self, spin, bands_range, kpoints=None, tol_ediff=1e-3, num_cpus=1):
+        """
+        Classify the bands at several k-points e.g. along a high-symmetry path.
+        The k-points are distributed over num_cpus worker processes. Each process opens the WFK file
+        (read-only) and reads only the wavefunctions of its k-points.
+
+        Args:
+            spin: Spin index.
+            bands_range: Range of band indices to analyze.
+            kpoints: List of k-points (indices or :class:`Kpoint` objects). None for all the k-points in the file.
+            tol_ediff: Tolerance on the energy difference (in eV)
+            num_cpus: Number of worker processes. None to use all the CPUs.
+
+        Returns:
+            pandas DataFrame with one row per degenerate set and columns:
+            kidx, kpoint, ptgroup, bands, energy, label.
+            label is None if the character cannot be decomposed (e.g. zone-border k-points in
+            non-symmorphic groups).
+        """
+        import pandas as pd
+        from abipy.tools.parallel import map_parallel
+
+        kinds = list(range(self.nkpt)) if kpoints is None else [self.kindex(k) for k in kpoints]
+        bands_range = list(bands_range)
 
-        # Compute the D(R) matrices for each degenerate subset.
-        dmats = DMatrices(ltk, deg_ewaves)
-        return dmats
+        if num_cpus == 1:
+            rows = [row for k in kinds for row in self._classify_rows(spin, k, bands_range, tol_ediff)]
+        else:
+            num_chunks = len(kinds) if num_cpus is None else min(num_cpus, len(kinds))
+            args = [(self.filepath, spin, [int(k) for k in chunk], bands_range, tol_ediff)
+                    for chunk in np.array_split(kinds, num_chunks) if len(chunk)]
+            rows = [row for rows in map_parallel(_classify_kpoints, args, num_cpus=num_cpus) for row in rows]
+
+        return pd.DataFrame(rows, columns=["kidx", "kpoint", "ptgroup", "bands", "energy", "label"])
+
+    def _classify_rows(self, spin, k, bands_range, tol_ediff):
+        """List of dictionaries with the classification of the bands at the k-point with index k."""
+        kpoint = self.kpoints[k]
+        try:
+            dmats = self.classify_ebands(spin, k, bands_range, tol_ediff=tol_ediff)
+            ptgroup, labels, deg_ebands = dmats.kgroup.sch_symbol, dmats.get_labels(), dmats.deg_ebands
+        except (DMatrices.Error, ValueError):
+            logger.warning("Cannot classify bands at k-point %s:\n%s" % (kpoint, straceback()))
+            deg_ebands = self.ebands.degeneracies(spin, k, bands_range, tol_ediff=tol_ediff)
+            ptgroup, labels = None, len(deg_ebands) * [None]
+
+        return [dict(kidx=k, kpoint=tuple(kpoint.frac_coords), ptgroup=ptgroup, bands=tuple(bands),
+                     energy=e, label=label) for (e, bands), label in zip(deg_ebands, labels)]
+
+
+def _classify_kpoints(args):
+    """
+    Worker function used by :meth:`WfkFile.classify_ebands_kpath`.
+    Opens the WFK file and classifies the bands at the given k-points. Returns a list of dictionaries.
+    """
+    filepath, spin, kinds, bands_range, tol_ediff = args
+    with WfkFile(filepath) as wfk:
+        return [row for k in kinds for row in wfk._classify_rows(spin, k, bands_range, tol_ediff)]
 
 
 class WFK_Reader(ElectronsReader):
@@ -253,12 +326,8 @@ class WFK_Reader(ElectronsReader):
         # Gvectors
         self._kg = self.read_value("reduced_coordinates_of_plane_waves")
 
-        # Wavefunctions (complex array)
-        # TODO use variables to avoid storing the full block.
-        if self.cplex_ug == 2:
-            self.ug_block = self.read_value("coefficients_of_wavefunctions", cmode="c")
-        else:
-            raise NotImplementedError("")
+        if self.cplex_ug != 2:
+            raise NotImplementedError("cplex_ug %s" % self.cplex_ug)
 
     @lazy_property
     def basis_set(self):
@@ -299,12 +368,85 @@ class WFK_Reader(ElectronsReader):
         npw_k, istwfk = self.npwarr[k], self.istwfk[k]
         return self._kg[k, :npw_k, :], istwfk
 
+    @lazy_property
+    def ug_block(self):
+        """
+        Complex array with all the wavefunctions stored in the file.
+        Mainly for debugging: use :meth:`read_ug` and :meth:`read_ug_block` that read only the required slice.
+        """
+        return self.read_value("coefficients_of_wavefunctions", cmode="c")
+
     def read_ug(self, spin, kpoint, band):
         """Read the Fourier components of the wavefunction."""
+        return self.read_ug_block(spin, kpoint, [band])[0]
+
+    def read_ug_block(self, spin, kpoint, bands):
+        """
+        Read the Fourier components of the wavefunctions with the given spin and k-point for a list of bands.
+        Only the hyperslab with the contiguous range of bands [min(bands), max(bands)] is read from file.
+
+        Returns:
+            Complex array of shape [len(bands), nspinor, npw_k].
+        """
         k = self.kindex(kpoint)
-        npw_k, istwfk = self.npwarr[k], self.istwfk[k]
-        # TODO use variables to avoid storing the full block.
-        return self.ug_block[spin, k, band, :, :npw_k]
+        npw_k = self.npwarr[k]
+        bands = np.asarray(bands, dtype=int)
+        bstart, bstop = bands.min(), bands.max() + 1
+
+        var = self.read_variable("coefficients_of_wavefunctions")
+        slab = np.asarray(var[spin, k, bstart:bstop, :, :npw_k, :])[bands - bstart]
+
+        return slab[..., 0] + 1j * slab[..., 1]
+
+
+def compute_dmats(ug, gvecs, rot_g, tau, g0vecs):
+    """
+    Compute the matrices D_ab(R) = <psi_a|R psi_b> for a set of bands and a set of operations
+    of the little group of k. All the operations are treated at once.
+
+    The rotated wavefunction has coefficients c(G) e^{-i(k+G').tau} on G' = S G + G0 where
+    S k = k + G0, the factor e^{-ik.tau} is dropped to get the representation of the point group.
+
+    Args:
+        ug: (nb, npw) complex array with the coefficients of the bands (nspinor == 1).
+        gvecs: (npw, 3) integer array with the reduced coordinates of the G-vectors.
+        rot_g: (nops, 3, 3) array with the rotations in reciprocal space.
+        tau: (nops, 3) array with the fractional translations.
+        g0vecs: (nops, 3) array with the G0 vectors.
+
+    Returns:
+        (nops, nb, nb) complex array.
+
+    Raises:
+        ValueError if the rotated G-vectors are not in gvecs.
+    """
+    ug, gvecs = np.asarray(ug), np.asarray(gvecs, dtype=int)
+    rot_g, tau = np.asarray(rot_g, dtype=int), np.asarray(tau, dtype=float)
+    g0vecs = np.rint(g0vecs).astype(int)
+    nops, (nb, npw) = len(rot_g), ug.shape
+
+    rot_gvecs = np.einsum("sij,gj->sgi", rot_g, gvecs) + g0vecs[:, None, :]
+
+    # Locate the rotated G-vectors with integer keys and a binary search.
+    off = max(np.abs(gvecs).max(), np.abs(rot_gvecs).max())
+    base = 2 * off + 1
+    weights = np.array([base * base, base, 1], dtype=np.int64)
+    gkeys = np.dot(gvecs + off, weights)
+    order = np.argsort(gkeys)
+    sorted_keys = gkeys[order]
+    rkeys = np.dot(rot_gvecs + off, weights)
+    pos = np.minimum(np.searchsorted(sorted_keys, rkeys), npw - 1)
+    if np.any(sorted_keys[pos] != rkeys):
+        raise ValueError("Rotated G-vectors are not in the G-sphere")
+    gidx = order[pos]
+
+    # Coefficients of R psi_b on the G-sphere.
+    phases = np.exp(-2j * np.pi * np.einsum("sgi,si->sg", rot_gvecs, tau))
+    rot_ug = np.empty((nops, nb, npw), dtype=complex)
+    rot_ug[np.arange(nops)[:, None, None], np.arange(nb)[None, :, None], gidx[:, None, :]] = \
+        ug[None, :, :] * phases[:, None, :]
+
+    return np.einsum("ag,sbg->sab", ug.conj(), rot_ug)
 
 
 class DmatsError(Exception):
@@ -362,154 +504,117 @@ class DMatrices(object):
     ClassificationError = DmatsClassificationError
     DecompositionError = DmatsDecompositionError
 
-    def __init__(self, ltk, deg_ewaves):
+    def __init__(self, ltk, deg_ebands, dmats):
         """
-        Compute the D(R) matrices for each degenerate subset.
+        Args:
+            ltk: :class:`LittleGroup` of the k-point.
+            deg_ebands: List of tuples [(e0, bands_e0), (e1, bands_e1), ...] with the degenerate sets.
+            dmats: List with the D(R) matrices of each degenerate set. Each entry is a [nrot, nb, nb] array
+                where nrot runs over the operations of ltk.kgroup (time-reversal is not included).
         """
-        kgroup = ltk.kgroup
-        #print("g0vecs", ltk.g0vecs)
-
-        #The main problem here is represented by the fact 
-        #that the classes in ltk might not have the 
-        #same order as the classes reported in the Bilbao database.
-        #Hence we have to shuffle the last dimension of my_character
-        #so that we can compare the two array correctly
-        #The most robust approach consists in matching class invariants 
-        #such as the trace, the determinant of the rotation matrices.
-        #as well as the order of the rotation and inv_root!
-        #Perhaps I can make LatticeRotation hashable with
-        #__hash__ = return det + 10 * trace + 100 * order + 1000 * inv_root
-        #The pseudo code below computes the table to_bilbao_classes:
+        self.ltk, self.kgroup = ltk, ltk.kgroup
+        self.deg_ebands = deg_ebands
+        self.dmats = dmats
+        self.num_degs = len(dmats)
 
-        # Get the Bilbao entry for this point group
+        # Get the Bilbao entry for this point group.
+        # The classes in kgroup might not have the same order as the classes reported in the Bilbao database.
+        # The mapping is obtained from the class invariants (det, trace, size, class constants).
         from abipy.core.symmetries import bilbao_ptgroup
         try:
-            self.bilbao_ptg = bilbao_ptgroup(kgroup.sch_symbol)
-            #to_bilbao_classes = self.bilbao_ptg.map_rotclasses(kgroup.rotclasses)
-        except:
+            self.bilbao_ptg = bilbao_ptgroup(self.kgroup.sch_symbol)
+            self.class_mappings = self.bilbao_ptg.find_class_mappings(self.kgroup)
+        except Exception:
             raise self.Error(straceback())
 
-        # Number of degeneracies, 
-        # number of spatial rotation in the group of k, number of classes in kgroup.
-        self.num_degs = num_degs = len(deg_ewaves)
-        num_rotk, num_classes = len(kgroup), kgroup.num_classes
-
-        # Allocate D(R) for each set of degenerated bands.
-        # Init them with np.inf. If everything goes well 
-        # only the diagonal element for the first operation 
-        # in each class has to be computed.
-        dmats = self.num_degs * [None]
-        for idg, (e, waves) in enumerate(deg_ewaves):
-            nb = len(waves)
-            dr_bbp = np.empty((num_rotk, nb, nb), dtype=np.complex)
-            dr_bbp[:,:,:] = np.inf
-            dmats[idg] = dr_bbp
-
-        # FIXME
-        # Here there's a problem since I have to exclude time_rev and afm.
-        #ltk_symmops = ltk.symmops[:48]
-        ltk_symmops = ltk.symmops[:8]
-
-        for idg, (e, waves) in enumerate(deg_ewaves):
-            nb = len(waves)
-            for isym, symmop in enumerate(ltk_symmops):
-                for (ii, wave) in enumerate(waves):
-                    rot_wave = wave.rotate(symmop)
-                    prod = wave.braket(rot_wave)
-                    # Update the entry
-                    dmats[idg][isym,ii,ii] = prod
-            print("idg", idg, "shape", dmats[idg].shape)
+    def __str__(self):
+        lines = ["Little group: %s, k-point: %s" % (self.kgroup.sch_symbol, self.ltk.kpoint)]
+        app = lines.append
+        for (e, bands), label in zip(self.deg_ebands, self.get_labels()):
+            app("  bands: %s, energy: %.4f, irrep: %s" % (bands, e, label))
+        return "\n".join(lines)
 
-        self.dmats = dmats
+    def all_traces(self, idg):
+        """Return the traces of D(R) for all the operations given the degeneracy index."""
+        return np.trace(self.dmats[idg], axis1=1, axis2=2)
 
-        for idg in range(num_degs):
-            if idg != 2: continue
-            print(self.all_traces(idg))
-        
-        #my_character[idg] = my_character[idg][to_bilbao_classes]
-        #from pymatgen.util.num_utils import iuptri
-        # Loop over the set of degenerate states.
-        # For each degenerate set compute the full D_(R)
-        # mats = [None] * num_degs 
-
-        #for idg, (e, waves) in enumerate(deg_ewaves):
-        #    nb = len(waves)
-        #    for icl, symmops in enumerate(ltk.groupby_class())
-        #        op = symmops[0]
-        #        row = -1
-        #        for (ii,jj), (wave1, wave2) in iuptri(waves):
-        #            if ii != row:
-        #               ii = row
-        #               rot_wave1 = wave1.rotate(op)
-        #            prod = wave2.product(rot_wave1)
-        #            # Update the entry
-        #            mats[idg][icl][ii,jj] = prod
-        #self.mats = mats
-
-        # Locate the D(R) in the lookup table.
-        #deg_labels = None
-        #for trace_atol in [0.001, 0.01, 0.01]:
-        #    try:
-        #       deg_labels = dmats.classify(trace_atol)
-        #    except dmats.ClassificationError:
-        #       pass
-
-        #if deg_labels is not None:
-        #    self.deg_labels = deg_labels
-        #    return
-
-        # Case with accidental degeneraties. 
-        # Try to decompose the reducible representations
-        #try:
-        #    dmats.decompose()
-        #    return dmats
-        #except dmats.DecompositionError:
-        #    raise 
-
-    #def __str__(self):
-    #    lines = []
-    #    app = lines.append
-    #    return "\n".join(lines)
-
-    #def _compute_diagonal_per_class(self):
-    #def _compute_all_dmats(self):
+    def my_character(self, idg):
+        """Return the calculated character (classes ordered as in kgroup) given the degeneracy index."""
+        traces = self.all_traces(idg)
+        return np.array([traces[inds].mean() for inds in self.kgroup.class_indices])
 
-    def all_traces(self, idg):
-        """Return the calculated character given the degeneracy index."""
-        ds = self.dmats[idg]
-        return [d.trace() for d in ds]
+    def _multiplicities(self, atol):
+        """
+        Decompose all the degenerate sets with the class mapping that gives the largest number
+        of valid decompositions (ties are broken by the number of irreducible sets).
 
-    #def my_character(self, idg):
-    #    """Return the calculated character given the degeneracy index."""
-    #    ds = self.dmats[idg]
-    #    return ds[isym,:,:].trace() for isym in class_ids
+        Returns:
+            List with the integer multiplicities of each set (None if the decomposition failed).
+        """
+        chars = np.array([self.my_character(idg) for idg in range(self.num_degs)])
+        dims = np.array(self.bilbao_ptg.irrep_dims)
+        best, best_score = None, None
+
+        for mapping in self.class_mappings:
+            mults = self.bilbao_ptg.decompose_character(chars, mapping)
+            imults = np.rint(mults).astype(int)
+            ok = (np.all(np.abs(mults - imults) < atol, axis=1) & np.all(imults >= 0, axis=1) &
+                  (np.dot(imults, dims) == [len(bands) for (_, bands) in self.deg_ebands]))
+            # Check the reconstructed character.
+            ok &= np.all(np.abs(np.dot(imults, self.bilbao_ptg.character_array) - chars[:, mapping]) < atol, axis=1)
+            score = (ok.sum(), (ok & (imults.sum(axis=1) == 1)).sum())
+            if best_score is None or score > best_score:
+                best, best_score = [m if isok else None for m, isok in zip(imults, ok)], score
+
+        return best
+
+    def _label(self, mults):
+        """String with the decomposition e.g. "A1", "A1+E", "2T2"."""
+        if mults is None: return None
+        tokens = []
+        for irrep, m in zip(self.bilbao_ptg.irreps, mults):
+            if m == 0: continue
+            tokens.append(irrep.name if m == 1 else "%d%s" % (m, irrep.name))
+        return "+".join(tokens)
+
+    def get_labels(self, atol=1e-2):
+        """
+        List with the labels of the degenerate sets. Reducible representations (accidental degeneracies)
+        are reported as sum of irreps e.g. "A1+E". None if the character cannot be decomposed.
+        """
+        return [self._label(m) for m in self._multiplicities(atol)]
 
-    def classify(self, trace_rtol=1e-05, trace_atol=1e-08):
+    def classify(self, atol=1e-2):
         """
+        Return the list with the names of the irreps of the degenerate sets.
+
         Raises:
-            ClassificationError
-        """
-        # Now my_character has the same ordered as in the Bilbao database.
-        # The remaining part is trivial and we only have to deal with possible
-        # failures due to numerical errors and accidental degeneracies.
-        num_degs = self.num_degs
-        deg_labels = [None] * num_degs
-
-        for idg in range(self.num_degs):
-            mychar = self.my_character(idg)
-            for irrep in self.bilbao_ptg.irreps:
-                if np.allclose(irrep.character, mychar, rtol=trace_rtol, atol=trace_atol):
-                    deg_labels[idg] = irrep.name
-                    break
-                                                                                  
-        if any(label is None for label in deg_labels):
-            raise ClassificationError()
+            ClassificationError if one of the sets is not classified by a single irrep.
+        """
+        deg_labels = []
+        for idg, mults in enumerate(self._multiplicities(atol)):
+            if mults is None or mults.sum() != 1:
+                raise self.ClassificationError("Cannot classify degenerate set %s with character %s" % (
+                    self.deg_ebands[idg][1], self.my_character(idg)))
+            deg_labels.append(self._label(mults))
 
         return deg_labels
 
-    def decompose(self):
+    def decompose(self, atol=1e-2):
         """
+        Decompose the (possibly reducible) representations of the degenerate sets.
+
+        Returns:
+            List of dictionaries {irrep_name: multiplicity}.
+
         Raises:
-            DecompositionError
+            DecompositionError if the character of one of the sets cannot be decomposed.
         """
-        raise NotImplementedError()
+        decs = []
+        for idg, mults in enumerate(self._multiplicities(atol)):
+            if mults is None:
+                raise self.DecompositionError("Cannot decompose degenerate set %s with character %s" % (
+                    self.deg_ebands[idg][1], self.my_character(idg)))
+            decs.append({irrep.name: int(m) for irrep, m in zip(self.bilbao_ptg.irreps, mults) if m})
+
+        return decs
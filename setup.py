@@ -111,6 +111,7 @@ def find_package_data():
             "si_ebands/*",
             "si_g0w0/*",
             ],
+        'abipy.core': ["irrepsdb.npz"],
         'abipy.htc': ["*.json"],
         'abipy.gui.awx' : ['images/*'],
         'abipy.lessons': ["*.man"],